@@ -1,15 +1,63 @@
 """Build a single cross-channel daily summary table from six fact tables and dim_date.
 
 Reads from data_warehouse/ only. Writes analysis/output/cross_channel_daily.csv.
+The facts are aggregated in SQL over the warehouse views (``warehouse_db``);
+``summarize_pandas`` keeps the in-memory groupby path for benchmarking.
 """
 
 import pathlib
 import pandas as pd
 
+from analysis import warehouse_db
+
 PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
 WAREHOUSE = PROJECT_ROOT / "data_warehouse"
 OUTPUT = PROJECT_ROOT / "analysis" / "output"
 
+SPINE_COLUMNS = ["date", "day_of_week", "season_flag", "is_weekend",
+                 "month", "quarter", "year"]
+
+# Daily aggregates per fact table: output column -> (fact column, function),
+# in output order.
+DAILY_AGGREGATES = {
+    "fact_paid_social_daily": {
+        "paid_social_spend": ("spend", "sum"),
+        "paid_social_impressions": ("impressions", "sum"),
+        "paid_social_clicks": ("clicks", "sum"),
+        "paid_social_video_views": ("video_views", "sum"),
+    },
+    "fact_web_analytics_daily": {
+        "web_pageviews": ("pageviews", "sum"),
+        "web_sessions": ("sessions", "sum"),
+        "web_users": ("users", "sum"),
+    },
+    "fact_ecommerce_daily": {
+        "ecomm_revenue": ("gross_revenue", "sum"),
+        "ecomm_orders": ("orders", "sum"),
+        "ecomm_units": ("total_quantity", "sum"),
+        "ecomm_discount": ("total_discount", "sum"),
+    },
+    "fact_organic_social_daily": {
+        "followers_eod": ("followers_eod", "first"),
+        "organic_impressions": ("impressions", "sum"),
+        "organic_likes": ("likes", "sum"),
+        "organic_shares": ("shares", "sum"),
+        "organic_comments": ("comments", "sum"),
+    },
+    "fact_podcast_daily": {
+        "podcast_mentions": ("mentions", "sum"),
+        "podcast_impressions": ("estimated_impressions", "sum"),
+    },
+    "fact_ooh_daily": {
+        "ooh_spend": ("spend", "sum"),
+        "ooh_impressions": ("impressions", "sum"),
+    },
+}
+
+# OOH facts are already daily after the Phase 2 expansion; older builds
+# named the expanded measures *_daily.
+COLUMN_FALLBACKS = {"spend": "spend_daily", "impressions": "impressions_daily"}
+
 
 def _read(path):
     df = pd.read_csv(path, parse_dates=["date"])
@@ -17,69 +65,84 @@ def _read(path):
     return df
 
 
-def build_summary():
-    """Build 547-row cross-channel daily summary and write to CSV."""
+def resolve_column(column, available):
+    alt = COLUMN_FALLBACKS.get(column)
+    return alt if alt in available else column
 
-    # ----- dim_date spine -----
-    dim_date = _read(WAREHOUSE / "dimensions" / "dim_date.csv")
-    spine = dim_date[["date", "day_of_week", "season_flag", "is_weekend",
-                       "month", "quarter", "year"]].copy()
-
-    # ----- paid social -----
-    ps = _read(WAREHOUSE / "fact_paid_social" / "fact_paid_social_daily.csv")
-    ps_daily = (ps.groupby("date", as_index=False)
-                .agg(paid_social_spend=("spend", "sum"),
-                     paid_social_impressions=("impressions", "sum"),
-                     paid_social_clicks=("clicks", "sum"),
-                     paid_social_video_views=("video_views", "sum")))
-
-    # ----- web analytics -----
-    wa = _read(WAREHOUSE / "fact_web_analytics" / "fact_web_analytics_daily.csv")
-    wa_daily = (wa.groupby("date", as_index=False)
-                .agg(web_pageviews=("pageviews", "sum"),
-                     web_sessions=("sessions", "sum"),
-                     web_users=("users", "sum")))
-
-    # ----- ecommerce -----
-    ec = _read(WAREHOUSE / "fact_ecommerce" / "fact_ecommerce_daily.csv")
-    ec_daily = (ec.groupby("date", as_index=False)
-                .agg(ecomm_revenue=("gross_revenue", "sum"),
-                     ecomm_orders=("orders", "sum"),
-                     ecomm_units=("total_quantity", "sum"),
-                     ecomm_discount=("total_discount", "sum")))
-
-    # ----- organic social -----
-    org = _read(WAREHOUSE / "fact_organic_social" / "fact_organic_social_daily.csv")
-    org_daily = (org.groupby("date", as_index=False)
-                 .agg(followers_eod=("followers_eod", "first"),
-                      organic_impressions=("impressions", "sum"),
-                      organic_likes=("likes", "sum"),
-                      organic_shares=("shares", "sum"),
-                      organic_comments=("comments", "sum")))
-
-    # ----- podcast -----
-    pod = _read(WAREHOUSE / "fact_podcast" / "fact_podcast_daily.csv")
-    pod_daily = (pod.groupby("date", as_index=False)
-                 .agg(podcast_mentions=("mentions", "sum"),
-                      podcast_impressions=("estimated_impressions", "sum")))
-
-    # ----- out-of-home -----
-    ooh = _read(WAREHOUSE / "fact_ooh" / "fact_ooh_daily.csv")
-    # Column names from exploration: spend, impressions (already daily after Phase 2 expansion)
-    spend_col = "spend_daily" if "spend_daily" in ooh.columns else "spend"
-    imp_col = "impressions_daily" if "impressions_daily" in ooh.columns else "impressions"
-    ooh_daily = (ooh.groupby("date", as_index=False)
-                 .agg(ooh_spend=(spend_col, "sum"),
-                      ooh_impressions=(imp_col, "sum")))
-
-    # ----- left-join everything onto spine -----
-    summary = spine.copy()
-    for df in [ps_daily, wa_daily, ec_daily, org_daily, pod_daily, ooh_daily]:
-        summary = summary.merge(df, on="date", how="left")
-
-    # fill nulls with 0 for numeric columns
+
+def _fill_missing(summary):
+    """Zero-fill numeric gaps (days with no activity in a channel)."""
     num_cols = summary.select_dtypes(include="number").columns
     summary[num_cols] = summary[num_cols].fillna(0)
+    return summary
+
+
+# ---------------------------------------------------------------------------
+# SQL path
+# ---------------------------------------------------------------------------
+
+def _sql_aggregate(out, column, how, col_type):
+    if how == "first":
+        # One row per date on the grain of the tables this is used for
+        # (organic); the ORDER BY keeps the pick deterministic under
+        # parallel scans should a date ever repeat.
+        return (f"first({column} ORDER BY {column}) FILTER (WHERE {column} IS NOT NULL) "
+                f"AS {out}")
+    return f"{warehouse_db.sum_expr(column, col_type)} AS {out}"
+
+
+def summary_sql(con):
+    """SELECT that aggregates every fact by date and left-joins the results
+    onto the dim_date spine."""
+    ctes, selects, joins = [], [], []
+    for i, (table, aggs) in enumerate(DAILY_AGGREGATES.items()):
+        types = warehouse_db.column_types(con, table)
+        exprs = []
+        for out, (column, how) in aggs.items():
+            column = resolve_column(column, types)
+            exprs.append(_sql_aggregate(out, column, how, types[column]))
+        ctes.append(f"f{i} AS (SELECT date, {', '.join(exprs)} "
+                    f"FROM {table} GROUP BY date)")
+        selects += [f"f{i}.{out}" for out in aggs]
+        joins.append(f"LEFT JOIN f{i} USING (date)")
+    return (f"WITH {', '.join(ctes)}\n"
+            f"SELECT {', '.join('d.' + c for c in SPINE_COLUMNS)}, {', '.join(selects)}\n"
+            f"FROM dim_date d\n" + "\n".join(joins) + "\nORDER BY d.date")
+
+
+def summarize_sql(con=None):
+    """Cross-channel daily summary aggregated in SQL over the warehouse views."""
+    con = con or warehouse_db.connect()
+    summary = warehouse_db.query(summary_sql(con), con)
+    # A pandas left merge turns a gappy integer column into float; keep the
+    # same CSV representation.
+    for c in summary.columns[len(SPINE_COLUMNS):]:
+        if summary[c].isna().any():
+            summary[c] = summary[c].astype("float64")
+    return _fill_missing(summary)
+
+
+# ---------------------------------------------------------------------------
+# pandas path
+# ---------------------------------------------------------------------------
+
+def summarize_pandas():
+    """Same summary built by loading each fact table into pandas."""
+    dim_date = _read(WAREHOUSE / "dimensions" / "dim_date.csv")
+    summary = dim_date[SPINE_COLUMNS].copy()
+    for table, aggs in DAILY_AGGREGATES.items():
+        fact = _read(WAREHOUSE / warehouse_db.CONTRACTS[table]["path"])
+        daily = fact.groupby("date", as_index=False).agg(**{
+            out: (resolve_column(column, fact.columns), how)
+            for out, (column, how) in aggs.items()
+        })
+        summary = summary.merge(daily, on="date", how="left")
+    return _fill_missing(summary)
+
+
+def build_summary():
+    """Build 547-row cross-channel daily summary and write to CSV."""
+    summary = summarize_sql()
 
     # ----- write -----
     OUTPUT.mkdir(parents=True, exist_ok=True)
@@ -0,0 +1,201 @@
+"""Vectorized deseasonalization of daily signals.
+
+Each method splits every signal into trend + seasonal + residual in one pass
+over a (T, N) array of all signals:
+
+    moving_average  trend = centered rolling mean of ``window`` days (NaN at
+                    the edges, as ``utils.add_residual_columns`` always did);
+                    no seasonal term
+    day_of_week     seasonal = mean of each weekday (less the overall mean);
+                    trend = overall mean
+    stl             STL-like: local-linear loess trend (tricube weights,
+                    ``window``-day span) and a weekly seasonal term of
+                    weekday means of the detrended series, alternated
+                    ``STL_ITERATIONS`` times; defined to the edges
+
+NaNs are masked rather than filled: they get no weight in the weekday means
+or the loess fit and stay NaN in the output. The loess fit for all signals
+at once is five products with (T, T) tricube weight matrices.
+
+Decompositions are cached in memory per (method, window, signal), so
+repeated calls within one process (e.g. a session running several analyses
+on the same summary) only compute signals not seen yet.
+The cache is per process: ``rebuild_all`` runs each analysis module as its
+own subprocess, so nothing is shared between modules. It keeps the
+``CACHE_SIZE`` most recently used signals; ``clear_cache()`` empties it.
+
+Run:     python -m analysis.deseasonalize   (compare methods and windows)
+"""
+
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+METHODS = ("moving_average", "day_of_week", "stl")
+WINDOW = 14
+STL_ITERATIONS = 2
+COMPARE_WINDOWS = (7, 14, 28)
+
+CACHE_SIZE = 256
+
+_CACHE = OrderedDict()   # (method, window, signal digest) -> (trend, seasonal, resid)
+
+
+# ---------------------------------------------------------------------------
+# Components
+# ---------------------------------------------------------------------------
+
+def centered_mean(values, window):
+    """Centered rolling mean of every column; NaN where the window is not
+    complete (pandas ``rolling(window, center=True, min_periods=window)``)."""
+    return (pd.DataFrame(values)
+            .rolling(window, center=True, min_periods=window)
+            .mean()
+            .to_numpy())
+
+
+def weekday_means(values, weekday):
+    """(T, N) mean of each column over the days sharing t's weekday."""
+    mask = ~np.isnan(values)
+    onehot = np.eye(7)[weekday]                                # (T, 7)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = (onehot.T @ np.where(mask, values, 0)) / (onehot.T @ mask)
+    return onehot @ np.nan_to_num(means)
+
+
+def loess_weights(length, window):
+    """Tricube weights W[t, s] and the (s - t) offsets of a ``window``-day
+    local fit."""
+    half = window / 2 + 0.5
+    offset = np.arange(length)[None, :] - np.arange(length)[:, None]
+    w = np.clip(1 - (np.abs(offset) / half) ** 3, 0, None) ** 3
+    return w, offset.astype(np.float64)
+
+
+def loess_trend(values, window):
+    """Local-linear loess fit of every column, evaluated at each day."""
+    mask = ~np.isnan(values)
+    m = mask.astype(np.float64)
+    y = np.where(mask, values, 0)
+    w, offset = loess_weights(len(values), window)
+    w1, w2 = w * offset, w * offset ** 2
+    a0, a1, a2 = w @ m, w1 @ m, w2 @ m
+    b0, b1 = w @ y, w1 @ y
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (a2 * b0 - a1 * b1) / (a0 * a2 - a1 ** 2)
+
+
+# ---------------------------------------------------------------------------
+# Methods
+# ---------------------------------------------------------------------------
+
+def _moving_average(values, weekday, window):
+    trend = centered_mean(values, window)
+    return trend, np.zeros_like(values), values - trend
+
+
+def _day_of_week(values, weekday, window):
+    with np.errstate(invalid="ignore"):
+        level = np.nanmean(values, axis=0, keepdims=True)
+    seasonal = weekday_means(values, weekday) - level
+    trend = np.broadcast_to(level, values.shape).copy()
+    return trend, seasonal, values - trend - seasonal
+
+
+def _stl(values, weekday, window):
+    seasonal = np.zeros_like(values)
+    for _ in range(STL_ITERATIONS):
+        trend = loess_trend(values - seasonal, window)
+        detrended = values - trend
+        seasonal = weekday_means(detrended, weekday)
+        with np.errstate(invalid="ignore"):
+            seasonal -= np.nanmean(np.where(np.isnan(values), np.nan, seasonal),
+                                   axis=0, keepdims=True)
+    return trend, seasonal, values - trend - seasonal
+
+
+_METHODS = {"moving_average": _moving_average, "day_of_week": _day_of_week, "stl": _stl}
+
+
+def _digest(column, weekday):
+    return hashlib.sha1(column.tobytes() + weekday.tobytes()).hexdigest()
+
+
+def decompose(values, dates, method="moving_average", window=WINDOW):
+    """Trend, seasonal and residual (each (T, N)) of every column of
+    ``values`` (rows in date order, one per day of ``dates``)."""
+    if method not in _METHODS:
+        raise ValueError(f"unknown method {method!r}; expected one of {list(_METHODS)}")
+    values = np.asarray(values, dtype=np.float64)
+    weekday = pd.DatetimeIndex(dates).dayofweek.to_numpy()
+    keys = [(method, window, _digest(np.ascontiguousarray(values[:, j]), weekday))
+            for j in range(values.shape[1])]
+    found = {key: _CACHE[key] for key in keys if key in _CACHE}
+    todo = [j for j, key in enumerate(keys) if key not in found]
+    if todo:
+        parts = _METHODS[method](values[:, todo], weekday, window)
+        for pos, j in enumerate(todo):
+            found[keys[j]] = tuple(part[:, pos].copy() for part in parts)
+    for key in keys:
+        _CACHE[key] = found[key]
+        _CACHE.move_to_end(key)
+    while len(_CACHE) > CACHE_SIZE:
+        _CACHE.popitem(last=False)
+    return tuple(np.column_stack([found[key][i] for key in keys]) for i in range(3))
+
+
+def clear_cache():
+    """Drop every cached decomposition."""
+    _CACHE.clear()
+
+
+def residuals(df, cols, methods=METHODS, windows=(WINDOW,)):
+    """Residuals of ``cols`` for every (method, window), as
+    {(method, window): (T, N) array}; ``df`` must be in date order."""
+    values = df[cols].to_numpy(dtype=np.float64)
+    out = {}
+    for method in methods:
+        # day_of_week does not use the window
+        for window in (windows if method != "day_of_week" else windows[:1]):
+            out[(method, window)] = decompose(values, df["date"], method, window)[2]
+    return out
+
+
+def compare(df, cols, methods=METHODS, windows=COMPARE_WINDOWS):
+    """One row per (signal, method, window): share of variance removed, the
+    residual's lag-1 and lag-7 autocorrelation (weekly structure left over)
+    and the number of days without a residual."""
+    df = df.sort_values("date")
+    values = df[cols].to_numpy(dtype=np.float64)
+    rows = []
+    for (method, window), resid in residuals(df, cols, methods, windows).items():
+        for j, col in enumerate(cols):
+            r = pd.Series(resid[:, j])
+            rows.append({
+                "signal": col, "method": method,
+                "window": window if method != "day_of_week" else None,
+                "variance_removed": 1 - r.var() / np.nanvar(values[:, j], ddof=1),
+                "acf_1": r.autocorr(1), "acf_7": r.autocorr(7),
+                "missing_days": int(r.isna().sum()),
+            })
+    out = pd.DataFrame(rows).round(4)
+    out["window"] = out["window"].astype("Int64")
+    return out
+
+
+def main():
+    from analysis.lag_analysis import OUTPUT, RESID_COLS, _read
+
+    print("=" * 80)
+    print("DESEASONALIZATION METHODS")
+    print("=" * 80)
+    summary = _read(OUTPUT / "cross_channel_daily.csv")
+    table = compare(summary, RESID_COLS)
+    print(table.sort_values(["signal", "method", "window"], kind="stable")
+          .to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,223 @@
+"""Lagged cross-correlations per DMA.
+
+Paid social, web and ecommerce all carry ``dma_name``, so the lag_analysis
+pairs between them can be run per DMA to expose geographic differences that
+the national totals average away (e.g. Atlanta vs Savannah).
+
+All DMAs go through one batched computation rather than a loop:
+
+* the daily x DMA panel (``analysis.panel``) is stacked into a (G, T, N)
+  array and ``xcorr.lagged_correlations`` computes every DMA's lags 0..14
+  in one FFT pass;
+* residuals (14-day centered moving average) for every DMA and signal are a
+  single ``deseasonalize.decompose`` call over the side-by-side columns;
+* circular-shift p-values (as in ``analysis.significance``) come from one
+  circular FFT pass over the same stack: per lag (unadjusted) and for each
+  DMA's peak, against the max |r| over lags 0..14 at each far shift
+  (``significance.peak_null``), since the peak is picked from those lags.
+
+There is no per-DMA Python work, so cost grows only with array size.
+``--benchmark`` times ``analyze`` on equal terms: about 0.02s for the
+national series, 0.04s for the 5 real DMAs and 1.4s with the panel tiled to
+210 DMAs (roughly linear in the number of DMAs).
+
+The summary calls a DMA's peak ``lagged`` or ``same-day`` only when it is
+positive and its peak p-value is below ``ALPHA``; a significant
+negative peak is ``inverse`` and anything else ``not significant``. DMAs are
+ranked by that structure, then by peak strength.
+
+Outputs: analysis/output/lag_correlations_dma.csv (long: dma x series x pair x lag)
+         analysis/output/lag_dma_summary.csv (peak lag and strength per DMA, ranked)
+Run:     python -m analysis.dma_lag_analysis
+         python -m analysis.dma_lag_analysis --benchmark
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from analysis.deseasonalize import decompose
+from analysis.lag_analysis import OUTPUT, MAX_LAG, SIGNAL_PAIRS
+from analysis.significance import BLOCK_LENGTH, CONFIDENCE, peak_null, permutation_pvalues
+from analysis.xcorr import lagged_correlations
+
+WINDOW = 14
+BENCHMARK_DMAS = 210
+ALPHA = round(1 - CONFIDENCE, 10)
+STRUCTURES = ["lagged", "same-day", "inverse", "not significant"]
+
+
+def dma_pairs(columns):
+    """The lag_analysis pairs whose signals both exist at DMA level."""
+    return [(x, y, label) for x, y, label in SIGNAL_PAIRS if x in columns and y in columns]
+
+
+def dma_stack(panel, columns):
+    """(G, T, N) array of ``columns`` per DMA, and the DMA names."""
+    panel = panel.sort_values(["geo", "period_start"])
+    groups = list(panel["geo"].unique())
+    stack = panel[columns].to_numpy(dtype=np.float64).reshape(len(groups), -1, len(columns))
+    return stack, groups, panel.loc[panel["geo"] == groups[0], "period_start"]
+
+
+def residualize(stack, dates, window=WINDOW):
+    """Moving-average residuals of every DMA and signal in one pass."""
+    G, T, N = stack.shape
+    side_by_side = stack.transpose(1, 0, 2).reshape(T, G * N)
+    resid = decompose(side_by_side, dates, "moving_average", window)[2]
+    return resid.reshape(T, G, N).transpose(1, 0, 2)
+
+
+def group_lags(stack, x_idx, y_idx, max_lag=MAX_LAG, block=BLOCK_LENGTH):
+    """r, overlap and unadjusted circular-shift p-values, each
+    (G, lags, pairs), and the p-value of each peak |r|, (G, pairs)."""
+    G, T, _ = stack.shape
+    r, n = lagged_correlations(stack, max_lag)
+    r, n = r[:, :, x_idx, y_idx], n[:, :, x_idx, y_idx]
+
+    # Circular shifts need no gap handling beyond the mask; residual edges
+    # are NaN and simply drop out of each shift's overlap.
+    shifts, _ = lagged_correlations(stack, T - 1, circular=True)
+    shifts = shifts[:, :, x_idx, y_idx]                                # (G, T, P)
+    far = np.minimum(np.arange(T), T - np.arange(T)) > max_lag + block
+    null = shifts[:, far]                                              # (G, S, P)
+    P = len(x_idx)
+    p = permutation_pvalues(r.transpose(1, 0, 2).reshape(max_lag + 1, G * P),
+                            null.transpose(1, 0, 2).reshape(-1, G * P))
+    peak = np.fmax.reduce(np.abs(r), axis=1).reshape(1, G * P)
+    peak_p = permutation_pvalues(peak, peak_null(shifts, max_lag, block)
+                                 .transpose(1, 0, 2).reshape(-1, G * P))
+    return r, n, p.reshape(max_lag + 1, G, P).transpose(1, 0, 2), peak_p.reshape(G, P)
+
+
+def long_table(r, n, p, groups, pairs, series):
+    """Tidy rows: dma, series, signal_pair, lag_days, pearson_r,
+    p_value_unadjusted, n_obs."""
+    G, L, P = r.shape
+    g, k, j = np.meshgrid(np.arange(G), np.arange(L), np.arange(P), indexing="ij")
+    labels = [label for _, _, label in pairs]
+    out = pd.DataFrame({
+        "dma": np.asarray(groups)[g.ravel()], "series": series,
+        "signal_pair": pd.Categorical(np.asarray(labels)[j.ravel()], categories=labels,
+                                      ordered=True),
+        "lag_days": k.ravel(),
+        "pearson_r": r.ravel().round(6), "p_value_unadjusted": p.ravel().round(4),
+        "n_obs": n.ravel(),
+    })
+    return out.sort_values(["dma", "signal_pair", "lag_days"], kind="stable", ignore_index=True)
+
+
+def peak_table(peak_p, groups, pairs, series):
+    """Rows: dma, series, signal_pair, peak_p_value."""
+    G, P = peak_p.shape
+    return pd.DataFrame({
+        "dma": np.repeat(np.asarray(groups), P), "series": series,
+        "signal_pair": np.tile([label for _, _, label in pairs], G),
+        "peak_p_value": peak_p.ravel().round(4),
+    })
+
+
+def summarize(table, peaks, alpha=ALPHA):
+    """Per (series, pair, DMA): lag-0 r, the peak |r| lag, its r and
+    p-value (from ``peaks``), and its structure (``STRUCTURES``,
+    significance at ``alpha``); DMAs ranked within each pair by structure
+    and then peak strength."""
+    keys = ["series", "signal_pair", "dma"]
+    top = table.loc[table["pearson_r"].abs().groupby([table[k] for k in keys], sort=False,
+                                                     observed=True).idxmax()]
+    lag0 = table[table["lag_days"] == 0].set_index(keys)["pearson_r"]
+    out = top.rename(columns={"lag_days": "peak_lag_days", "pearson_r": "peak_r"}).drop(
+        columns=["p_value_unadjusted", "n_obs"])
+    index = pd.MultiIndex.from_frame(out[keys].astype({"signal_pair": str}))
+    out.insert(3, "lag0_r", lag0.reindex(pd.MultiIndex.from_frame(out[keys])).to_numpy())
+    out["peak_p_value"] = peaks.set_index(keys)["peak_p_value"].reindex(index).to_numpy()
+    significant = out["peak_p_value"] < alpha
+    structure = np.select(
+        [~significant, out["peak_r"] < 0, out["peak_lag_days"] > 0],
+        ["not significant", "inverse", "lagged"], "same-day")
+    out["structure"] = pd.Categorical(structure, categories=STRUCTURES, ordered=True)
+    out = (out.assign(_strength=out["peak_r"].abs())
+           .sort_values(["series", "signal_pair", "structure", "_strength"],
+                        ascending=[True, True, True, False], kind="stable")
+           .drop(columns="_strength"))
+    out["rank"] = out.groupby(["series", "signal_pair"], sort=False, observed=True).cumcount() + 1
+    return out.reset_index(drop=True)
+
+
+def analyze(panel, max_lag=MAX_LAG):
+    """Long table of raw and residualized lagged correlations for every DMA,
+    and the p-value of every DMA's peak (``peak_table``)."""
+    from analysis.panel import metric_columns
+
+    columns = metric_columns("dma")
+    pairs = dma_pairs(columns)
+    used = list(dict.fromkeys(c for x, y, _ in pairs for c in (x, y)))
+    x_idx = np.array([used.index(x) for x, _, _ in pairs])
+    y_idx = np.array([used.index(y) for _, y, _ in pairs])
+    stack, groups, dates = dma_stack(panel, used)
+    frames, peaks = [], []
+    for series, values in [("raw", stack), ("residualized", residualize(stack, dates))]:
+        r, n, p, peak_p = group_lags(values, x_idx, y_idx, max_lag)
+        frames.append(long_table(r, n, p, groups, pairs, series))
+        peaks.append(peak_table(peak_p, groups, pairs, series))
+    return pd.concat(frames, ignore_index=True), pd.concat(peaks, ignore_index=True)
+
+
+def benchmark(n_dmas=BENCHMARK_DMAS):
+    """Time the national run, the real DMA panel, and the DMA panel tiled
+    (with noise) to ``n_dmas`` DMAs."""
+    from analysis.panel import panel
+
+    rows = []
+    national = panel("day", "national").assign(geo="US")
+    dma = panel("day", "dma")
+    rng = np.random.default_rng(0)
+    reps = -(-n_dmas // dma["geo"].nunique())
+    tiled = pd.concat([dma.assign(geo=dma["geo"] + f" #{i}",
+                                  **{c: dma[c] * rng.uniform(0.5, 1.5, len(dma))
+                                     for c in ("paid_social_spend", "web_sessions",
+                                               "ecomm_revenue")})
+                       for i in range(reps)], ignore_index=True)
+    for name, df in [("national", national), ("dma", dma), ("dma tiled", tiled)]:
+        start = time.perf_counter()
+        analyze(df)
+        rows.append({"run": name, "groups": df["geo"].nunique(),
+                     "seconds": round(time.perf_counter() - start, 3)})
+    return pd.DataFrame(rows)
+
+
+def run():
+    """Write the per-DMA lag table and the ranked summary."""
+    from analysis.panel import panel
+
+    start = time.perf_counter()
+    table, peaks = analyze(panel("day", "dma"))
+    print(f"Per-DMA lag analysis: {table['dma'].nunique()} DMAs x "
+          f"{table['signal_pair'].nunique()} pairs x lags 0-{MAX_LAG} (raw + residualized) "
+          f"in {time.perf_counter() - start:.2f}s")
+    path = OUTPUT / "lag_correlations_dma.csv"
+    table.to_csv(path, index=False)
+    print(f"  Written {path} ({len(table):,} rows)")
+
+    summary = summarize(table, peaks)
+    path = OUTPUT / "lag_dma_summary.csv"
+    summary.to_csv(path, index=False)
+    print(f"  Written {path} ({len(summary)} rows)\n")
+    print(summary[summary["series"] == "residualized"].to_string(index=False))
+    return table, summary
+
+
+def main():
+    if "--benchmark" in sys.argv[1:]:
+        print("=" * 80)
+        print("PER-DMA LAG ANALYSIS BENCHMARK")
+        print("=" * 80)
+        print(benchmark().to_string(index=False))
+    else:
+        run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+"""Materialized lag / rolling / adstock features of the media columns.
+
+For every media column of ``cross_channel_daily.csv`` (``MEDIA_COLUMNS``)
+the store holds the transforms configured in ``TRANSFORMS``:
+
+    lag           x(t - k)                                (NaN for t < k)
+    rolling_sum   x(t - w + 1) + ... + x(t)                (NaN for t < w - 1)
+    adstock       a(t) = x(t) + decay * a(t - 1)           (geometric carryover)
+
+Each transform is applied to all media columns at once, along the time axis
+of a (T, C) array. Rolling sums are an FIR filter and adstock is the
+recursive IIR filter 1 / (1 - decay z^-1), both ``scipy.signal.lfilter``
+calls, so there is no Python loop over days or columns.
+
+Storage (output/features/):
+
+    features.npy   float32, (features, T) C-order: each feature is one
+                   contiguous row, so a column read touches only its bytes
+    dates.npy      datetime64[D] of the T days
+    catalog.json   one entry per feature (name, source, transform, param,
+                   row) plus the fingerprints of the source CSV and of the
+                   feature config (MEDIA_COLUMNS, TRANSFORMS, DTYPE)
+
+``load()`` memory-maps features.npy, so ``column()`` returns a zero-copy
+view. The store is rebuilt when the source CSV's size or mtime changes
+(same rule as ``analysis.panel``) or when the feature config changes.
+
+Run:     python -m analysis.feature_store
+"""
+
+import hashlib
+import json
+import pathlib
+
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+SOURCE = PROJECT_ROOT / "analysis" / "output" / "cross_channel_daily.csv"
+STORE_DIR = PROJECT_ROOT / "output" / "features"
+
+MEDIA_COLUMNS = [
+    "paid_social_spend", "paid_social_impressions", "paid_social_clicks",
+    "paid_social_video_views", "ooh_spend", "ooh_impressions",
+    "podcast_impressions", "organic_impressions",
+]
+
+TRANSFORMS = {
+    "lag": (1, 2, 3, 7, 14),
+    "rolling_sum": (7, 14, 28),
+    "adstock": (0.3, 0.5, 0.7, 0.9),
+}
+
+DTYPE = np.float32
+
+
+# ---------------------------------------------------------------------------
+# Transforms (vectorized over columns, along axis 0)
+# ---------------------------------------------------------------------------
+
+def lag(x, k):
+    out = np.full_like(x, np.nan)
+    out[k:] = x[:len(x) - k]
+    return out
+
+
+def rolling_sum(x, window):
+    out = lfilter(np.ones(window), [1.0], x, axis=0)
+    out[:window - 1] = np.nan
+    return out
+
+
+def adstock(x, decay):
+    return lfilter([1.0], [1.0, -decay], x, axis=0)
+
+
+_TRANSFORMS = {"lag": lag, "rolling_sum": rolling_sum, "adstock": adstock}
+
+
+def feature_name(column, transform, param):
+    return f"{column}__{transform}_{param}"
+
+
+def build_features(summary, columns=MEDIA_COLUMNS, transforms=TRANSFORMS):
+    """(features, T) float32 matrix and catalog entries for ``columns``."""
+    unknown = set(transforms) - set(_TRANSFORMS)
+    if unknown:
+        raise ValueError(f"unknown transforms {sorted(unknown)}; expected {list(_TRANSFORMS)}")
+    x = summary[columns].to_numpy(dtype=np.float64)
+    blocks, catalog = [], []
+    for transform, params in transforms.items():
+        for param in params:
+            blocks.append(_TRANSFORMS[transform](x, param).T)
+            catalog += [{"name": feature_name(c, transform, param), "source": c,
+                         "transform": transform, "param": param} for c in columns]
+    matrix = np.ascontiguousarray(np.concatenate(blocks), dtype=DTYPE)
+    for row, entry in enumerate(catalog):
+        entry["row"] = row
+    return matrix, catalog
+
+
+# ---------------------------------------------------------------------------
+# Store
+# ---------------------------------------------------------------------------
+
+def source_fingerprint(path=SOURCE):
+    st = pathlib.Path(path).stat()
+    return hashlib.sha256(json.dumps([st.st_size, st.st_mtime_ns]).encode()).hexdigest()
+
+
+def config_fingerprint():
+    """Hash of the current feature configuration (read at call time)."""
+    config = {"columns": list(MEDIA_COLUMNS), "dtype": np.dtype(DTYPE).name,
+              "transforms": {t: list(p) for t, p in TRANSFORMS.items()}}
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+def materialize(store=STORE_DIR, source=SOURCE):
+    """Build every feature from ``source`` and write the store."""
+    summary = pd.read_csv(source, parse_dates=["date"]).sort_values("date")
+    matrix, catalog = build_features(summary, MEDIA_COLUMNS, TRANSFORMS)
+    store = pathlib.Path(store)
+    store.mkdir(parents=True, exist_ok=True)
+    np.save(store / "features.npy", matrix)
+    np.save(store / "dates.npy", summary["date"].to_numpy().astype("datetime64[D]"))
+    (store / "catalog.json").write_text(json.dumps({
+        "source": str(pathlib.Path(source).relative_to(PROJECT_ROOT)),
+        "fingerprint": source_fingerprint(source),
+        "config": config_fingerprint(),
+        "dtype": np.dtype(DTYPE).name,
+        "shape": list(matrix.shape),
+        "features": catalog,
+    }, indent=2))
+    return matrix, catalog
+
+
+def _read_catalog(store):
+    try:
+        return json.loads((pathlib.Path(store) / "catalog.json").read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def load(refresh=False, store=STORE_DIR, source=SOURCE):
+    """Memory-mapped store: ``(matrix, catalog, dates)``.
+
+    ``matrix`` is a read-only (features, T) memmap; ``catalog`` a DataFrame
+    indexed by feature name with the row of each feature. Rebuilds first if
+    the store is missing, was built from another source or feature config,
+    or ``refresh`` is set.
+    """
+    meta = _read_catalog(store)
+    if (refresh or meta is None or meta["fingerprint"] != source_fingerprint(source)
+            or meta.get("config") != config_fingerprint()):
+        materialize(store, source)
+        meta = _read_catalog(store)
+    matrix = np.load(pathlib.Path(store) / "features.npy", mmap_mode="r")
+    dates = np.load(pathlib.Path(store) / "dates.npy")
+    catalog = pd.DataFrame(meta["features"]).set_index("name")
+    return matrix, catalog, dates
+
+
+def column(name, store=None):
+    """One feature as a zero-copy float32 view of the memmap."""
+    matrix, catalog, _ = store or load()
+    return matrix[catalog.loc[name, "row"]]
+
+
+def frame(names=None, store=None):
+    """Selected features (all by default) as a date-indexed DataFrame; the
+    rows are gathered once, in store order."""
+    matrix, catalog, dates = store or load()
+    rows = catalog["row"] if names is None else catalog.loc[list(names), "row"]
+    return pd.DataFrame(matrix[rows.to_numpy()].T, index=pd.DatetimeIndex(dates, name="date"),
+                        columns=rows.index)
+
+
+def main():
+    print("=" * 80)
+    print("FEATURE STORE")
+    print("=" * 80)
+    matrix, catalog = materialize()
+    size = (STORE_DIR / "features.npy").stat().st_size
+    print(f"  {len(MEDIA_COLUMNS)} media columns x "
+          f"{sum(len(p) for p in TRANSFORMS.values())} transforms = {matrix.shape[0]} features "
+          f"x {matrix.shape[1]} days ({size / 1e6:.1f} MB {np.dtype(DTYPE).name})")
+    for transform, params in TRANSFORMS.items():
+        print(f"    {transform:<12} {', '.join(str(p) for p in params)}")
+    print(f"  Written {STORE_DIR}/features.npy, dates.npy, catalog.json")
+
+
+if __name__ == "__main__":
+    main()
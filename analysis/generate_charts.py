@@ -1,6 +1,8 @@
 """Generate four time-series charts from the cross-channel summary and fact tables.
 
-Charts saved as PNGs at 300 DPI to analysis/output/.
+Charts saved as PNGs at 300 DPI to analysis/output/. Per-platform and
+per-source breakdowns are aggregated in SQL over the warehouse views
+(``warehouse_db``) rather than by loading the fact tables.
 """
 
 import pathlib
@@ -11,6 +13,8 @@ import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import matplotlib.ticker as mticker
 
+from analysis import warehouse_db
+
 PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
 WAREHOUSE = PROJECT_ROOT / "data_warehouse"
 OUTPUT = PROJECT_ROOT / "analysis" / "output"
@@ -34,6 +38,27 @@ def _read(path):
     return df
 
 
+def daily_by(table, by, measure, con=None):
+    """Daily ``measure`` totals of a fact table, one column per ``by`` value
+    (date index, missing days 0)."""
+    con = con or warehouse_db.connect()
+    total = warehouse_db.sum_expr(measure, warehouse_db.column_types(con, table)[measure])
+    long = warehouse_db.query(
+        f"SELECT date, {by}, {total} AS {measure} FROM {table} GROUP BY date, {by}", con)
+    return (long.pivot(index="date", columns=by, values=measure)
+            .fillna(0)
+            .sort_index())
+
+
+def daily_by_pandas(table, by, measure):
+    """``daily_by`` computed by loading the fact table into pandas."""
+    df = _read(WAREHOUSE / warehouse_db.CONTRACTS[table]["path"])
+    return (df.groupby(["date", by], as_index=False)[measure].sum()
+            .pivot(index="date", columns=by, values=measure)
+            .fillna(0)
+            .sort_index())
+
+
 def _setup_ax(ax, title, ylabel, figsize=None):
     ax.set_title(title, fontsize=FONT_TITLE, fontweight="bold", pad=10)
     ax.set_ylabel(ylabel, fontsize=FONT_LABEL)
@@ -130,11 +155,7 @@ def chart_spend_vs_revenue(summary):
 
 def chart_paid_by_platform(summary):
     """Chart 3: Paid social spend by platform (7-day rolling avg)."""
-    ps = _read(WAREHOUSE / "fact_paid_social" / "fact_paid_social_daily.csv")
-    by_channel = (ps.groupby(["date", "channel"], as_index=False)["spend"].sum()
-                  .pivot(index="date", columns="channel", values="spend")
-                  .fillna(0)
-                  .sort_index())
+    by_channel = daily_by("fact_paid_social_daily", "channel", "spend")
 
     fig, ax = plt.subplots(figsize=(12, 6))
     channel_colors = {"Instagram": COLORS["coral"], "Pinterest": COLORS["sage"],
@@ -153,11 +174,7 @@ def chart_paid_by_platform(summary):
 
 def chart_web_traffic_sources(summary):
     """Chart 4: Web sessions by traffic source (7-day rolling avg)."""
-    wa = _read(WAREHOUSE / "fact_web_analytics" / "fact_web_analytics_daily.csv")
-    by_source = (wa.groupby(["date", "traffic_source"], as_index=False)["sessions"].sum()
-                 .pivot(index="date", columns="traffic_source", values="sessions")
-                 .fillna(0)
-                 .sort_index())
+    by_source = daily_by("fact_web_analytics_daily", "traffic_source", "sessions")
 
     fig, ax = plt.subplots(figsize=(12, 6))
     palette = list(COLORS.values())
@@ -174,8 +191,6 @@ def chart_web_traffic_sources(summary):
 
 def chart_web_traffic_grouped(summary):
     """Web sessions by grouped channel (paid social, search, non-paid)."""
-    wa = _read(WAREHOUSE / "fact_web_analytics" / "fact_web_analytics_daily.csv")
-
     groups = {
         "Paid Social": ["instagram", "tiktok", "facebook", "pinterest"],
         "Search": ["google", "bing", "yahoo"],
@@ -187,12 +202,19 @@ def chart_web_traffic_grouped(summary):
         "Non-Paid (Direct + Email)": COLORS["steel_blue"],
     }
 
+    con = warehouse_db.connect()
+    con.register("source_groups", pd.DataFrame(
+        [(s, g) for g, sources in groups.items() for s in sources],
+        columns=["traffic_source", "channel_group"]))
+    con.execute("CREATE TEMP VIEW web_grouped AS SELECT * FROM fact_web_analytics_daily "
+                "JOIN source_groups USING (traffic_source)")
+    # a group with no rows has no pivot column; plot it as zero
+    by_group = daily_by("web_grouped", "channel_group", "sessions", con).reindex(
+        columns=list(groups), fill_value=0)
+
     fig, ax = plt.subplots(figsize=(12, 6))
-    for group_name, sources in groups.items():
-        daily = (wa[wa["traffic_source"].isin(sources)]
-                 .groupby("date", as_index=False)["sessions"].sum()
-                 .set_index("date").sort_index())
-        rolled = daily["sessions"].rolling(7, min_periods=1).mean()
+    for group_name in groups:
+        rolled = by_group[group_name].rolling(7, min_periods=1).mean()
         ax.plot(rolled.index, rolled.values, linewidth=2, label=group_name,
                 color=group_colors[group_name])
 
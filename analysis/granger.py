@@ -0,0 +1,309 @@
+"""Batched Granger-causality F tests.
+
+For a pair X -> Y and lag order p, compares
+
+    restricted:    y(t) ~ 1 + y(t-1..t-p)
+    unrestricted:  y(t) ~ 1 + y(t-1..t-p) + x(t-1..t-p)
+
+with F = ((RSS_r - RSS_u) / p) / (RSS_u / (n - 2p - 1)).
+
+Every pair's regressors are a subset of one shared lag matrix — a constant
+plus lags 1..p of every signal — so for each lag order a single Gram matrix
+of that lag matrix (one per panel group) contains every pair's normal
+equations as a sub-block. The blocks of all pairs and groups are gathered
+into (pairs, k, k) stacks, both models are solved in one batched
+``np.linalg.solve`` each, and F and p-values are computed on whole arrays.
+Rows with a missing value in the target or any regressor (residualization
+edges, gaps) are dropped from that pair's fit; pairs with the same usable
+rows share a Gram matrix. Fits whose
+design is rank deficient (a constant or duplicated signal) are reported as
+NaN.
+
+Outputs: analysis/output/granger_causality.csv (raw and residualized pairs)
+         analysis/output/granger_causality_dma.csv (all pairs, daily x DMA)
+Run:     python -m analysis.granger
+         python -m analysis.granger --benchmark   (batched vs per-pair loop)
+"""
+
+import pathlib
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from analysis.utils import add_residual_columns
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+OUTPUT = PROJECT_ROOT / "analysis" / "output"
+
+LAG_ORDERS = range(1, 15)
+RANK_TOL = 1e-12
+
+
+def lag_matrix(values, order):
+    """Shared regressors of every pair at one lag order.
+
+    ``values`` is (G, T, N). Returns ``(design, target, lag_ok, now_ok)``:
+    ``design`` (G, n, 1 + N * order) holds a constant and lags 1..order of
+    every signal (signal j's lag k in column 1 + j * order + k - 1),
+    ``target`` (G, n, N) the signals at t, n = T - order; NaNs are zeroed and
+    flagged in ``lag_ok`` (all lags present) and ``now_ok`` (value at t present).
+    """
+    G, T, N = values.shape
+    n = T - order
+    lags = np.stack([values[:, order - k:T - k] for k in range(1, order + 1)], axis=-1)
+    lag_ok = ~np.isnan(lags).any(axis=-1)                          # (G, n, N)
+    design = np.concatenate([np.ones((G, n, 1)), lags.reshape(G, n, N * order)], axis=-1)
+    target = values[:, order:]
+    now_ok = ~np.isnan(target)
+    return np.nan_to_num(design), np.nan_to_num(target), lag_ok, now_ok
+
+
+def pair_columns(x_idx, y_idx, order):
+    """(P, 1 + 2 * order) design columns of each pair's unrestricted model;
+    the first 1 + order are the restricted model."""
+    k = np.arange(order)
+    return np.column_stack([np.zeros(len(x_idx), dtype=int),
+                            1 + y_idx[:, None] * order + k,
+                            1 + x_idx[:, None] * order + k])
+
+
+def solve_rss(gram, xty, yty):
+    """Residual sums of squares from stacked normal equations (P, k, k),
+    (P, k), (P,); NaN where the design is rank deficient."""
+    d = np.sqrt(np.diagonal(gram, axis1=-2, axis2=-1))
+    d = np.where(d > 0, d, 1.0)
+    gram = gram / (d[:, :, None] * d[:, None, :])
+    xty = xty / d
+    eig = np.linalg.eigvalsh(gram)
+    singular = eig[:, 0] <= RANK_TOL * eig[:, -1]
+    gram[singular] = np.eye(gram.shape[-1])
+    coef = np.linalg.solve(gram, xty[..., None])[..., 0]
+    rss = yty - (coef * xty).sum(axis=-1)
+    rss[singular] = np.nan
+    return rss
+
+
+def granger_tests(values, x_idx, y_idx, orders=LAG_ORDERS):
+    """F tests for every (pair, lag order).
+
+    ``values`` is (T, N) or (G, T, N), NaN where missing; the pairs are
+    applied within every group. Returns a dict of (orders, [G,] P) arrays:
+    f_stat, p_value, df_num, df_den, n_obs.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    single = x.ndim == 2
+    x = x[None] if single else x
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # F is invariant to affine rescaling; standardizing keeps the sums
+        # well conditioned.
+        x = x - np.nanmean(x, axis=-2, keepdims=True)
+        scale = np.nanstd(x, axis=-2, keepdims=True)
+        x = x / np.where(scale > 0, scale, 1.0)
+    x_idx, y_idx = np.asarray(x_idx), np.asarray(y_idx)
+    G, P = len(x), len(x_idx)
+    out = {k: [] for k in ("f_stat", "p_value", "df_num", "df_den", "n_obs")}
+    for order in orders:
+        design, target, lag_ok, now_ok = lag_matrix(x, order)
+        mask = now_ok[:, :, y_idx] & lag_ok[:, :, y_idx] & lag_ok[:, :, x_idx]   # (G, n, P)
+        # Pairs with the same usable rows (usually all pairs of a group) share
+        # one Gram matrix of the lag matrix; ``which`` maps pairs to them.
+        grams, xtys, ytys, which = [], [], [], []
+        for g in range(G):
+            packed = np.ascontiguousarray(np.packbits(mask[g].T, axis=-1))
+            _, first, inverse = np.unique(packed.view(f"V{packed.shape[1]}")[:, 0],
+                                          return_index=True, return_inverse=True)
+            which.append(len(grams) + inverse)
+            for pair in first:
+                m = mask[g, :, pair].astype(np.float64)
+                weighted = design[g] * m[:, None]
+                grams.append(weighted.T @ design[g])
+                xtys.append(weighted.T @ target[g])
+                ytys.append(m @ target[g] ** 2)
+        grams, xtys, ytys = np.array(grams), np.array(xtys), np.array(ytys)
+
+        cols = np.tile(pair_columns(x_idx, y_idx, order), (G, 1))            # (G*P, k)
+        targets = np.tile(y_idx, G)
+        u = np.concatenate(which)
+        gram = grams[u[:, None, None], cols[:, :, None], cols[:, None, :]]
+        xty = xtys[u[:, None], cols, targets[:, None]]
+        yty = ytys[u, targets]
+        rss_r = solve_rss(gram[:, :order + 1, :order + 1], xty[:, :order + 1], yty)
+        rss_u = solve_rss(gram, xty, yty)
+
+        n_obs = mask.sum(axis=1).ravel()
+        df_den = n_obs - cols.shape[1]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            f = ((rss_r - rss_u) / order) / (rss_u / df_den)
+            f[df_den <= 0] = np.nan
+            f = np.maximum(f, 0.0)
+        shape = (P,) if single else (G, P)
+        out["f_stat"].append(f.reshape(shape))
+        out["p_value"].append(stats.f.sf(f, order, np.maximum(df_den, 1)).reshape(shape))
+        out["df_num"].append(np.full(shape, order))
+        out["df_den"].append(df_den.reshape(shape))
+        out["n_obs"].append(n_obs.reshape(shape))
+    return {k: np.array(v) for k, v in out.items()}
+
+
+def pair_table(df, pairs, orders=LAG_ORDERS):
+    """Results for (x_col, y_col, label) pairs of ``df`` columns, one row per
+    (pair, lag order)."""
+    columns = list(dict.fromkeys(c for x, y, _ in pairs for c in (x, y)))
+    x_idx = [columns.index(x) for x, _, _ in pairs]
+    y_idx = [columns.index(y) for _, y, _ in pairs]
+    res = granger_tests(df[columns].to_numpy(dtype=np.float64), x_idx, y_idx, orders)
+    rows = []
+    for j, (_, _, label) in enumerate(pairs):
+        for i, order in enumerate(orders):
+            rows.append({"signal_pair": label, "lag_order": order,
+                         "f_stat": round(float(res["f_stat"][i, j]), 6),
+                         "p_value": round(float(res["p_value"][i, j]), 6),
+                         "df_num": int(res["df_num"][i, j]),
+                         "df_den": int(res["df_den"][i, j]),
+                         "n_obs": int(res["n_obs"][i, j])})
+    return pd.DataFrame(rows)
+
+
+def panel_granger(panel, columns, orders=LAG_ORDERS, by="geo", time_col="period_start"):
+    """Every ordered pair of ``columns`` in every ``by`` group of a panel
+    (``analysis.panel``); all groups share each batched solve."""
+    panel = panel.sort_values([by, time_col])
+    groups = list(dict.fromkeys(panel[by]))
+    stack = np.stack([panel.loc[panel[by] == g, columns].to_numpy(dtype=np.float64)
+                      for g in groups])
+    size = len(columns)
+    x_idx, y_idx = [a.ravel() for a in np.meshgrid(np.arange(size), np.arange(size),
+                                                   indexing="ij")]
+    keep = x_idx != y_idx
+    x_idx, y_idx = x_idx[keep], y_idx[keep]
+    res = granger_tests(stack, x_idx, y_idx, orders)
+    cols = np.asarray(columns)
+    frames = []
+    for i, order in enumerate(orders):
+        frames.append(pd.DataFrame({
+            by: np.repeat(groups, len(x_idx)),
+            "source": np.tile(cols[x_idx], len(groups)),
+            "target": np.tile(cols[y_idx], len(groups)),
+            "lag_order": order,
+            "f_stat": res["f_stat"][i].ravel(), "p_value": res["p_value"][i].ravel(),
+            "n_obs": res["n_obs"][i].ravel(),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+# ---------------------------------------------------------------------------
+# Reference implementation and benchmark
+# ---------------------------------------------------------------------------
+
+def granger_loop(values, x_idx, y_idx, orders=LAG_ORDERS):
+    """Per-pair, per-order ``np.linalg.lstsq`` fits on NaN-dropped rows; used
+    to check and time the batched path. Returns F as (orders, P)."""
+    x = np.asarray(values, dtype=np.float64)
+    f = np.full((len(orders), len(x_idx)), np.nan)
+    for i, order in enumerate(orders):
+        for j, (a, b) in enumerate(zip(x_idx, y_idx)):
+            y = x[order:, b]
+            y_lags = np.column_stack([x[order - k:len(x) - k, b] for k in range(1, order + 1)])
+            x_lags = np.column_stack([x[order - k:len(x) - k, a] for k in range(1, order + 1)])
+            restricted = np.column_stack([np.ones(len(y)), y_lags])
+            unrestricted = np.column_stack([restricted, x_lags])
+            ok = ~(np.isnan(y) | np.isnan(unrestricted).any(axis=1))
+            rss = []
+            for design in (restricted[ok], unrestricted[ok]):
+                coef, _, rank, _ = np.linalg.lstsq(design, y[ok], rcond=None)
+                rss.append(((y[ok] - design @ coef) ** 2).sum() if rank == design.shape[1]
+                           else np.nan)
+            df_den = ok.sum() - unrestricted.shape[1]
+            if df_den > 0:
+                f[i, j] = max(((rss[0] - rss[1]) / order) / (rss[1] / df_den), 0.0)
+    return f
+
+
+def benchmark(orders=LAG_ORDERS):
+    """Time batched vs loop on every ordered pair of the national daily
+    signals (raw and residualized)."""
+    from analysis.panel import panel, metric_columns
+
+    daily = panel("day", "national").rename(columns={"period_start": "date"})
+    columns = metric_columns("national")
+    resid = add_residual_columns(daily, columns, window=14)
+    size = len(columns)
+    x_idx = [i for i in range(size) for j in range(size) if i != j]
+    y_idx = [j for i in range(size) for j in range(size) if i != j]
+    rows = []
+    for name, values in [("raw", daily[columns]),
+                         ("residualized", resid[[f"{c}__resid" for c in columns]])]:
+        values = values.to_numpy(dtype=np.float64)
+        start = time.perf_counter()
+        f_batch = granger_tests(values, x_idx, y_idx, orders)["f_stat"]
+        batch_s = time.perf_counter() - start
+        start = time.perf_counter()
+        f_loop = granger_loop(values, x_idx, y_idx, orders)
+        loop_s = time.perf_counter() - start
+        both = ~(np.isnan(f_batch) | np.isnan(f_loop))
+        rows.append({
+            "signals": name, "pairs": len(x_idx), "orders": len(orders),
+            "loop_seconds": round(loop_s, 3), "batched_seconds": round(batch_s, 4),
+            "speedup": round(loop_s / batch_s, 1),
+            "max_rel_diff": float((np.abs(f_batch[both] - f_loop[both])
+                                   / np.maximum(np.abs(f_loop[both]), 1.0)).max()),
+            "nan_agree": bool((np.isnan(f_batch) == np.isnan(f_loop)).all()),
+        })
+    return pd.DataFrame(rows)
+
+
+# ---------------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------------
+
+def run(residualized=True):
+    """Granger tests for the lag_analysis signal pairs (raw, and on the
+    14-day residuals unless ``residualized`` is False) and for every pair of
+    metrics in every DMA."""
+    from analysis.lag_analysis import SIGNAL_PAIRS, RESID_PAIRS, RESID_COLS, _read
+    from analysis.panel import panel, metric_columns
+
+    summary = _read(OUTPUT / "cross_channel_daily.csv")
+    tables = [pair_table(summary, SIGNAL_PAIRS).assign(series="raw")]
+    if residualized:
+        resid = add_residual_columns(summary, RESID_COLS, window=14)
+        tables.append(pair_table(resid, RESID_PAIRS).assign(series="residualized"))
+    result = pd.concat(tables, ignore_index=True)
+    result = result[["series", *[c for c in result.columns if c != "series"]]]
+
+    path = OUTPUT / "granger_causality.csv"
+    result.to_csv(path, index=False)
+    print(f"Granger causality: {len(result)} tests written to {path}")
+    for series, sub in result.groupby("series", sort=False):
+        print(f"\n  {series}: smallest p-value per pair")
+        best = sub.loc[sub.groupby("signal_pair", sort=False)["p_value"].idxmin()]
+        for _, row in best.iterrows():
+            print(f"    {row['signal_pair']}: F = {row['f_stat']:.2f} at order "
+                  f"{row['lag_order']}, p = {row['p_value']:.4g}")
+
+    start = time.perf_counter()
+    dma = panel_granger(panel("day", "dma"), metric_columns("dma"))
+    dma[["f_stat", "p_value"]] = dma[["f_stat", "p_value"]].round(6)
+    print(f"\nDMA: {dma['geo'].nunique()} DMAs, {len(dma):,} (DMA, pair, order) tests "
+          f"in {time.perf_counter() - start:.2f}s")
+    path = OUTPUT / "granger_causality_dma.csv"
+    dma.to_csv(path, index=False)
+    print(f"  Written {path}")
+    return result, dma
+
+
+def main():
+    if "--benchmark" in sys.argv[1:]:
+        print("=" * 80)
+        print("BATCHED GRANGER BENCHMARK")
+        print("=" * 80)
+        print(benchmark().to_string(index=False))
+    else:
+        run()
+
+
+if __name__ == "__main__":
+    main()
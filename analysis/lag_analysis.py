@@ -1,11 +1,12 @@
 """Compute lagged Pearson cross-correlations for five signal pairs.
 
 Reads cross_channel_daily.csv. Writes lag_correlations.csv, lag_correlations_resid.csv,
-lag_analysis_notes.md, and four correlogram charts (raw + residualized).
+lag_analysis_notes.md, and four correlogram charts (raw + residualized). Each
+correlation carries a 95% block-bootstrap CI and a circular-shift p-value
+(``analysis.significance``); the correlograms shade the CI.
 """
 
 import pathlib
-import numpy as np
 import pandas as pd
 import matplotlib
 matplotlib.use("Agg")
@@ -13,6 +14,8 @@ import matplotlib.pyplot as plt
 import matplotlib.ticker as mticker
 
 from analysis.utils import add_residual_columns
+from analysis.xcorr import pair_correlations
+from analysis.significance import significance, BLOCK_LENGTH, N_BOOT
 
 PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
 OUTPUT = PROJECT_ROOT / "analysis" / "output"
@@ -61,22 +64,19 @@ def _read(path):
 def compute_lag_correlations(df, pairs):
     """Compute Pearson r at lags 0-14 for each signal pair.
 
-    For pair (X, Y), correlate X(t) with Y(t+k) for k = 0..14.
-    Drops NaN rows per pair before computing correlations.
+    For pair (X, Y), correlate X(t) with Y(t+k) for k = 0..14, over the days
+    where both are present (residual NaNs at the window edges are skipped).
+    All pairs and lags come from one batched FFT pass (``analysis.xcorr``).
     """
-    rows = []
-    for x_col, y_col, label in pairs:
-        valid = df[[x_col, y_col]].dropna()
-        x = valid[x_col].values
-        y = valid[y_col].values
-        for lag in range(MAX_LAG + 1):
-            if lag == 0:
-                r = np.corrcoef(x, y)[0, 1]
-            else:
-                r = np.corrcoef(x[:-lag], y[lag:])[0, 1]
-            rows.append({"signal_pair": label, "lag_days": lag, "pearson_r": round(r, 6)})
+    return pair_correlations(df, pairs, MAX_LAG)
 
-    return pd.DataFrame(rows)
+
+def add_significance(lag_df, df, pairs):
+    """Append ci_low, ci_high and p_value_unadjusted to
+    ``compute_lag_correlations`` output; also returns the bootstrap peak-lag
+    range and the peak p-value per pair."""
+    per_lag, peaks = significance(df, pairs, MAX_LAG)
+    return lag_df.merge(per_lag, on=["signal_pair", "lag_days"], how="left"), peaks
 
 
 def _setup_ax(ax, title):
@@ -94,9 +94,15 @@ def _plot_correlogram(lag_df, pair_labels, colors, title, filename):
     fig, ax = plt.subplots(figsize=(12, 6))
     for label, color in zip(pair_labels, colors):
         sub = lag_df[lag_df["signal_pair"] == label]
+        if "ci_low" in sub:
+            ax.fill_between(sub["lag_days"], sub["ci_low"], sub["ci_high"],
+                            color=color, alpha=0.15, linewidth=0)
         ax.plot(sub["lag_days"], sub["pearson_r"], marker="o", markersize=4,
                 linewidth=2, label=label, color=color)
     _setup_ax(ax, title)
+    if "ci_low" in lag_df:
+        ax.text(0.0, -0.12, "Shaded bands: 95% moving-block bootstrap CI",
+                transform=ax.transAxes, fontsize=8, color="gray")
     ax.legend(fontsize=9, loc="best", framealpha=0.9)
     ax.axhline(0, color="gray", linewidth=0.5, linestyle="--")
     path = OUTPUT / filename
@@ -141,25 +147,29 @@ def chart_earned_owned_resid(lag_df):
                       "chart_lag_earned_owned_resid.png")
 
 
-def _build_notes(raw_df, resid_df):
+def _peak_line(sub, peaks):
+    """Notes line: lag-0 r, peak r with its CI and p-value (adjusted for
+    picking the peak among lags 0-14), peak-lag range."""
+    label = sub["signal_pair"].iloc[0]
+    peak = sub.loc[sub["pearson_r"].abs().idxmax()]
+    lag0 = sub[sub["lag_days"] == 0]["pearson_r"].values[0]
+    line = (f"- {label}: r = {lag0:.2f} at lag 0, "
+            f"peak |r| = {peak['pearson_r']:.2f} at lag {int(peak['lag_days'])}d")
+    if peaks is not None:
+        rng = peaks.set_index("signal_pair").loc[label]
+        lo, hi = int(rng["peak_lag_low"]), int(rng["peak_lag_high"])
+        line += (f" (95% CI {peak['ci_low']:.2f} to {peak['ci_high']:.2f}, "
+                 f"p = {rng['peak_p_value']:.3f}; peak lag range "
+                 f"{f'{lo}d' if lo == hi else f'{lo}-{hi}d'})")
+    return line
+
+
+def _build_notes(raw_df, resid_df, raw_peaks=None, resid_peaks=None):
     """Build analysis notes with actual computed values."""
-    # gather peak values for raw
-    raw_lines = []
-    for label in raw_df["signal_pair"].unique():
-        sub = raw_df[raw_df["signal_pair"] == label]
-        peak = sub.loc[sub["pearson_r"].abs().idxmax()]
-        lag0 = sub[sub["lag_days"] == 0]["pearson_r"].values[0]
-        raw_lines.append(f"- {label}: r = {lag0:.2f} at lag 0, "
-                         f"peak |r| = {peak['pearson_r']:.2f} at lag {int(peak['lag_days'])}d")
-
-    # gather peak values for resid
-    resid_lines = []
-    for label in resid_df["signal_pair"].unique():
-        sub = resid_df[resid_df["signal_pair"] == label]
-        peak = sub.loc[sub["pearson_r"].abs().idxmax()]
-        lag0 = sub[sub["lag_days"] == 0]["pearson_r"].values[0]
-        resid_lines.append(f"- {label}: r = {lag0:.2f} at lag 0, "
-                           f"peak |r| = {peak['pearson_r']:.2f} at lag {int(peak['lag_days'])}d")
+    raw_lines = [_peak_line(raw_df[raw_df["signal_pair"] == label], raw_peaks)
+                 for label in raw_df["signal_pair"].unique()]
+    resid_lines = [_peak_line(resid_df[resid_df["signal_pair"] == label], resid_peaks)
+                   for label in resid_df["signal_pair"].unique()]
 
     # compare paid social → web sessions
     raw_ps_ws = raw_df[(raw_df["signal_pair"].str.contains("Paid Social Spend.*Web Sessions"))
@@ -215,6 +225,22 @@ without over-smoothing. Percent-change residuals were considered but rejected
 due to division-by-zero risk on sparse signals (podcast mentions). Pearson
 correlation is scale-invariant, making absolute residuals appropriate for
 cross-signal comparison.
+
+## Note on Uncertainty
+
+Confidence intervals come from {N_BOOT:,} circular moving-block bootstrap
+replicates ({BLOCK_LENGTH}-day blocks, which keep weekly structure intact).
+p-values come from a circular-shift permutation test: one signal is rotated
+against the other by every offset more than {MAX_LAG + BLOCK_LENGTH} days away
+from the real alignment, which keeps each signal's autocorrelation. The
+smallest attainable p-value is therefore about 1 / (number of days). The
+p-value quoted for a peak accounts for choosing the peak: the largest |r| over
+lags 0-{MAX_LAG} is compared with the largest |r| over the same {MAX_LAG + 1}
+lags at each rotation. The per-lag p-values in the CSVs
+(`p_value_unadjusted`) do not account for that choice. The peak
+lag range is the central 95% of the bootstrap replicates' peak lags. When that
+range spans several lags, the reported peak lag is not distinguishable from
+its neighbours.
 """
 
 
@@ -225,6 +251,7 @@ def run():
     # --- raw correlations ---
     print("Computing raw lagged cross-correlations (lags 0-14 days)...")
     raw_df = compute_lag_correlations(summary, SIGNAL_PAIRS)
+    raw_df, raw_peaks = add_significance(raw_df, summary, SIGNAL_PAIRS)
 
     csv_path = OUTPUT / "lag_correlations.csv"
     raw_df.to_csv(csv_path, index=False)
@@ -242,6 +269,7 @@ def run():
     print("\nComputing residualized cross-correlations (14-day trend removed)...")
     summary_resid = add_residual_columns(summary, RESID_COLS, window=14)
     resid_df = compute_lag_correlations(summary_resid, RESID_PAIRS)
+    resid_df, resid_peaks = add_significance(resid_df, summary_resid, RESID_PAIRS)
 
     resid_csv_path = OUTPUT / "lag_correlations_resid.csv"
     resid_df.to_csv(resid_csv_path, index=False)
@@ -256,7 +284,7 @@ def run():
     chart_earned_owned_resid(resid_df)
 
     # --- notes ---
-    notes = _build_notes(raw_df, resid_df)
+    notes = _build_notes(raw_df, resid_df, raw_peaks, resid_peaks)
     notes_path = OUTPUT / "lag_analysis_notes.md"
     notes_path.write_text(notes)
     print(f"  Written {notes_path}")
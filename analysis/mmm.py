@@ -0,0 +1,337 @@
+"""Media mix model: adstock + Hill saturation + ridge, grid-searched by
+time-series cross-validation.
+
+Daily national ecommerce revenue is regressed on transformed media and on
+controls (linear trend, day of week, season_flag):
+
+    media       paid social spend per platform (Instagram, Pinterest,
+                TikTok), OOH spend, podcast impressions, organic impressions
+    adstock     geometric (weights decay^k) or Weibull (normalized Weibull
+                pdf at k + 1, which allows a delayed peak), over
+                ``ADSTOCK_LENGTH`` days
+    saturation  Hill: a^s / (a^s + (h * m)^s), where m is the channel's
+                mean adstocked value over the days before the first CV
+                validation block and h the half-saturation grid value
+
+Every grid point is applied to all channels at once: one einsum of the
+lagged inputs with the (kernels x lags) weight matrix gives every adstock
+variant, and broadcasting gives every Hill variant, as a (grid, T, channels)
+array. For each time-series CV fold (expanding window, ``HORIZON``-day
+validation blocks) the ridge fits of all grid points and all penalties are
+one batched ``np.linalg.solve``. Folds run in a process pool. The Hill
+reference m comes from that fixed pre-sample window, which every fold
+trains on, so no fold's transform is scaled with its own validation days.
+
+The shared grid is a starting point. One coordinate sweep then re-selects
+each channel's own adstock and saturation: every grid value for that channel
+is tried with the others held at the current best, again as one batched
+CV pass. With the transforms fixed, the penalty is the largest in
+``RIDGE_LAMBDAS`` whose CV error is within one standard error (across
+folds) of the best penalty's (the one-standard-error rule); the CV error
+alone keeps falling as the penalty goes to zero.
+
+Media coefficients are constrained to be non-negative (a channel cannot
+reduce revenue), so a channel the data gives no lift gets zero contribution.
+Contributions are coefficient x transformed media; ROI (contribution per $
+of spend) is reported for spend channels, contribution per 1,000
+impressions for the others. Revenue here is small against spend, so ROI is
+far below 1; compare channels with each other rather than with break-even.
+
+Outputs: analysis/output/mmm_channel_summary.csv
+         analysis/output/mmm_decomposition.csv (daily contribution per channel)
+Run:     python -m analysis.mmm
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from analysis.generate_charts import daily_by
+from analysis.lag_analysis import OUTPUT, _read
+
+TARGET = "ecomm_revenue"
+SPEND_CHANNELS = ["ooh_spend"]              # plus one column per paid social platform
+VOLUME_CHANNELS = ["podcast_impressions", "organic_impressions"]
+
+ADSTOCK_LENGTH = 28
+GEOMETRIC_DECAYS = np.round(np.arange(0.0, 1.0, 0.1), 2)
+WEIBULL_SHAPES = (0.5, 1.0, 2.0)
+WEIBULL_SCALES = (1.0, 3.0, 7.0, 14.0)
+HALF_SATURATION = (0.25, 0.5, 1.0, 2.0, 4.0)
+HILL_SLOPES = (1.0, 2.0)
+RIDGE_LAMBDAS = (0.0001, 0.001, 0.01, 0.1, 1.0, 10.0)   # ascending
+
+N_FOLDS = 5
+HORIZON = 28
+SWEEPS = 1
+
+
+# ---------------------------------------------------------------------------
+# Transforms
+# ---------------------------------------------------------------------------
+
+def adstock_grid(length=ADSTOCK_LENGTH):
+    """(kernels, length) normalized adstock weights and a table describing
+    each kernel."""
+    k = np.arange(length, dtype=np.float64)
+    rows, kernels = [], []
+    for decay in GEOMETRIC_DECAYS:
+        kernels.append(decay ** k)
+        rows.append({"adstock": "geometric", "decay": decay, "shape": np.nan, "scale": np.nan})
+    for shape in WEIBULL_SHAPES:
+        for scale in WEIBULL_SCALES:
+            t = (k + 1) / scale
+            kernels.append(shape / scale * t ** (shape - 1) * np.exp(-t ** shape))
+            rows.append({"adstock": "weibull", "decay": np.nan, "shape": shape, "scale": scale})
+    kernels = np.array(kernels)
+    return kernels / kernels.sum(axis=1, keepdims=True), pd.DataFrame(rows)
+
+
+def adstock(values, kernels):
+    """Adstocked (kernels, T, C) series of (T, C) inputs."""
+    x = np.asarray(values, dtype=np.float64)
+    T, length = len(x), kernels.shape[1]
+    lags = np.zeros((length, T, x.shape[1]))
+    for k in range(length):
+        lags[k, k:] = x[:T - k]
+    return np.einsum("dl,ltc->dtc", kernels, lags)
+
+
+def hill(adstocked, half, slope, ref_end=None):
+    """Hill saturation of (D, T, C) adstocked series for every (half,
+    slope), as (D, H, S, T, C); ``half`` is relative to each series' mean
+    over its first ``ref_end`` days (all days if None)."""
+    ref = adstocked[:, :ref_end].mean(axis=1, keepdims=True)       # (D, 1, C)
+    ref = np.where(ref > 0, ref, 1.0)
+    a = adstocked[:, None, None]                                   # (D, 1, 1, T, C)
+    k = np.asarray(half)[None, :, None, None, None] * ref[:, None, None]   # (D, H, 1, 1, C)
+    s = np.asarray(slope)[None, None, :, None, None]               # (1, 1, S, 1, 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        an, kn = a ** s, k ** s
+        return np.nan_to_num(an / (an + kn))
+
+
+def transform_grid(media, ref_end=None):
+    """All (adstock x half-saturation x slope) transforms of (T, C) media as
+    (G, T, C), with the grid table; ``ref_end`` as in ``hill``."""
+    kernels, table = adstock_grid()
+    feats = hill(adstock(media, kernels), HALF_SATURATION, HILL_SLOPES, ref_end)
+    D, H, S, T, C = feats.shape
+    grid = table.loc[np.repeat(np.arange(D), H * S)].reset_index(drop=True)
+    grid["half_saturation"] = np.tile(np.repeat(HALF_SATURATION, S), D)
+    grid["slope"] = np.tile(HILL_SLOPES, D * H)
+    return feats.reshape(D * H * S, T, C), grid
+
+
+# ---------------------------------------------------------------------------
+# Batched ridge and cross-validation
+# ---------------------------------------------------------------------------
+
+def controls(summary):
+    """(T, K) control matrix: trend, day-of-week and season dummies."""
+    dow = pd.get_dummies(summary["date"].dt.dayofweek, prefix="dow", drop_first=True)
+    season = pd.get_dummies(summary["season_flag"], prefix="season").drop(
+        columns="season_regular", errors="ignore")
+    trend = pd.Series(np.arange(len(summary), dtype=np.float64), name="trend",
+                      index=summary.index)
+    return pd.concat([trend, dow, season], axis=1).astype(np.float64)
+
+
+def ridge_fit(features, base, y, lambdas=RIDGE_LAMBDAS):
+    """Ridge fits of y on [base, features[g]] for every grid point and
+    penalty; columns standardized, intercept unpenalized.
+
+    Media coefficients are kept non-negative with a batched active-set
+    pass: any negative media coefficient is fixed at zero and the remaining
+    system re-solved, until none is negative (at most one pass per channel).
+
+    Returns ``(coef, intercept, mu, sd)`` with coef (L, G, K) in
+    standardized units.
+    """
+    G = len(features)
+    X = np.concatenate([np.broadcast_to(base, (G, *base.shape)), features], axis=-1)
+    mu = X.mean(axis=1, keepdims=True)
+    sd = X.std(axis=1, keepdims=True)
+    sd = np.where(sd > 0, sd, 1.0)
+    Z = (X - mu) / sd
+    n, K = len(y), X.shape[-1]
+    eye = np.eye(K)
+    gram = Z.transpose(0, 2, 1) @ Z                                    # (G, K, K)
+    zty = Z.transpose(0, 2, 1) @ (y - y.mean())                       # (G, K)
+    system = gram[None] + np.asarray(lambdas)[:, None, None, None] * n * eye
+    rhs = np.broadcast_to(zty, (len(lambdas), G, K))
+    media = np.arange(K) >= base.shape[1]
+    active = np.ones((len(lambdas), G, K), dtype=bool)
+    for _ in range(features.shape[-1] + 1):
+        both = active[..., :, None] & active[..., None, :]
+        coef = np.linalg.solve(np.where(both, system, eye),
+                               np.where(active, rhs, 0.0)[..., None])[..., 0]
+        negative = (coef < 0) & media & active
+        if not negative.any():
+            break
+        active &= ~negative
+    return coef, y.mean(), mu, sd
+
+
+def ridge_predict(coef, intercept, mu, sd, features, base):
+    """(L, G, T) predictions of ``ridge_fit`` coefficients."""
+    G = len(features)
+    X = np.concatenate([np.broadcast_to(base, (G, *base.shape)), features], axis=-1)
+    Z = (X - mu) / sd
+    return intercept + np.einsum("gtk,lgk->lgt", Z, coef)
+
+
+def cv_folds(length, n_folds=N_FOLDS, horizon=HORIZON):
+    """Expanding-window (train_end, valid_end) pairs, last fold at the end."""
+    return [(length - (n_folds - i) * horizon, length - (n_folds - i - 1) * horizon)
+            for i in range(n_folds)]
+
+
+def _fold_error(features, base, y, train_end, valid_end, lambdas):
+    tr, va = slice(0, train_end), slice(train_end, valid_end)
+    fit = ridge_fit(features[:, tr], base[tr], y[tr], lambdas)
+    pred = ridge_predict(*fit, features[:, va], base[va])
+    return ((pred - y[va]) ** 2).mean(axis=-1)                       # (L, G)
+
+
+def cv_fold_errors(features, base, y, lambdas=RIDGE_LAMBDAS, workers=None):
+    """Validation MSE of every fold, (F, L, G); folds run in parallel."""
+    jobs = [(features, base, y, a, b, lambdas) for a, b in cv_folds(len(y))]
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    if workers <= 1:
+        errors = [_fold_error(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            errors = list(pool.map(_fold_error, *zip(*jobs)))
+    return np.array(errors)
+
+
+def cv_error(features, base, y, lambdas=RIDGE_LAMBDAS, workers=None):
+    """Mean validation MSE over the folds, (L, G)."""
+    return cv_fold_errors(features, base, y, lambdas, workers).mean(axis=0)
+
+
+def select_penalty(features, base, y, lambdas=RIDGE_LAMBDAS, workers=None):
+    """One-standard-error rule for one set of (1, T, C) features: the largest
+    of the ascending ``lambdas`` whose mean CV MSE is within one standard
+    error of the minimum. Returns ``(lambda, mse)``."""
+    errors = cv_fold_errors(features, base, y, lambdas, workers)[:, :, 0]   # (F, L)
+    mean = errors.mean(axis=0)
+    best = np.argmin(mean)
+    se = errors[:, best].std(ddof=1) / np.sqrt(len(errors))
+    l = np.flatnonzero(mean <= mean[best] + se).max()
+    return lambdas[l], mean[l]
+
+
+def search(media, base, y, sweeps=SWEEPS, workers=None):
+    """Shared-grid search, then ``sweeps`` per-channel coordinate sweeps,
+    then the penalty for the chosen transforms (``select_penalty``).
+
+    Returns ``(choice, lam, rmse, grid, feats)``: the grid index chosen for
+    each channel, the penalty, its CV RMSE, the grid table and all
+    transformed features (G, T, C).
+    """
+    feats, grid = transform_grid(media, ref_end=cv_folds(len(y))[0][0])
+    G, _, C = feats.shape
+    err = cv_error(feats, base, y, workers=workers)
+    l, g = np.unravel_index(np.argmin(err), err.shape)
+    choice = np.full(C, g)
+    best = err[l, g]
+    for _ in range(sweeps):
+        for c in range(C):
+            current = feats[choice, :, np.arange(C)].T                     # (T, C)
+            trial = np.broadcast_to(current, (G, *current.shape)).copy()
+            trial[:, :, c] = feats[:, :, c]
+            err = cv_error(trial, base, y, workers=workers)
+            l_c, g_c = np.unravel_index(np.argmin(err), err.shape)
+            if err[l_c, g_c] < best:
+                best, choice[c] = err[l_c, g_c], g_c
+    chosen = feats[choice, :, np.arange(C)].T[None]                        # (1, T, C)
+    lam, mse = select_penalty(chosen, base, y, workers=workers)
+    return choice, lam, float(np.sqrt(mse)), grid, feats
+
+
+# ---------------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------------
+
+def load_inputs():
+    """Daily summary with one spend column per paid social platform."""
+    summary = _read(OUTPUT / "cross_channel_daily.csv").sort_values("date").reset_index(drop=True)
+    platforms = daily_by("fact_paid_social_daily", "channel", "spend")
+    platforms.columns = [f"paid_social_{c.lower()}_spend" for c in platforms.columns]
+    platforms.index = pd.to_datetime(platforms.index)
+    summary = summary.merge(platforms, left_on="date", right_index=True, how="left")
+    summary[list(platforms.columns)] = summary[list(platforms.columns)].fillna(0)
+    return summary, list(platforms.columns) + SPEND_CHANNELS + VOLUME_CHANNELS
+
+
+def fit(summary, channels, sweeps=SWEEPS, workers=None):
+    """Selected model: per-channel summary table and daily decomposition."""
+    media = summary[channels].to_numpy(dtype=np.float64)
+    base = controls(summary).to_numpy()
+    y = summary[TARGET].to_numpy(dtype=np.float64)
+
+    choice, lam, rmse, grid, feats = search(media, base, y, sweeps, workers)
+    chosen = feats[choice, :, np.arange(len(channels))].T[None]            # (1, T, C)
+    coef, intercept, mu, sd = ridge_fit(chosen, base, y, (lam,))
+    beta = (coef[0, 0] / sd[0, 0])[base.shape[1]:]                          # per unit feature
+    contrib = chosen[0] * beta                                              # (T, C)
+    fitted = ridge_predict(coef, intercept, mu, sd, chosen, base)[0, 0]
+    r2 = 1 - ((y - fitted) ** 2).sum() / ((y - y.mean()) ** 2).sum()
+
+    spend = set(channels) - set(VOLUME_CHANNELS)
+    rows = []
+    for c, channel in enumerate(channels):
+        params = grid.loc[choice[c]]
+        total = media[:, c].sum()
+        rows.append({
+            "channel": channel,
+            "input": "spend" if channel in spend else "impressions",
+            "total_input": round(total, 2),
+            "adstock": params["adstock"], "decay": params["decay"],
+            "weibull_shape": params["shape"], "weibull_scale": params["scale"],
+            "half_saturation": params["half_saturation"], "hill_slope": params["slope"],
+            "contribution": round(contrib[:, c].sum(), 2),
+            "contribution_share": round(contrib[:, c].sum() / y.sum(), 4),
+            "roi": round(contrib[:, c].sum() / total, 6) if channel in spend and total else np.nan,
+            "per_1k_impressions": (round(1000 * contrib[:, c].sum() / total, 4)
+                                   if channel not in spend and total else np.nan),
+        })
+    table = pd.DataFrame(rows)
+    table.attrs.update(ridge_lambda=lam, cv_rmse=rmse, r2=r2)
+    decomposition = pd.DataFrame(contrib.round(4), columns=channels)
+    decomposition.insert(0, "date", summary["date"].to_numpy())
+    decomposition.insert(1, TARGET, y)
+    decomposition.insert(2, "fitted", fitted.round(4))
+    decomposition.insert(3, "baseline", (fitted - contrib.sum(axis=1)).round(4))
+    return table, decomposition
+
+
+def run():
+    summary, channels = load_inputs()
+    start = time.perf_counter()
+    table, decomposition = fit(summary, channels)
+    kernels, _ = adstock_grid()
+    grid_size = len(kernels) * len(HALF_SATURATION) * len(HILL_SLOPES)
+    print(f"MMM: {len(channels)} channels, {grid_size} transform grid points x "
+          f"{len(RIDGE_LAMBDAS)} ridge penalties, {N_FOLDS}-fold time-series CV "
+          f"in {time.perf_counter() - start:.2f}s")
+    print(f"  ridge lambda = {table.attrs['ridge_lambda']}, CV RMSE = "
+          f"{table.attrs['cv_rmse']:.2f}, in-sample R^2 = {table.attrs['r2']:.3f}")
+
+    path = OUTPUT / "mmm_channel_summary.csv"
+    table.to_csv(path, index=False)
+    print(f"  Written {path}")
+    path = OUTPUT / "mmm_decomposition.csv"
+    decomposition.to_csv(path, index=False)
+    print(f"  Written {path} ({len(decomposition)} rows)\n")
+    print(table.to_string(index=False))
+    return table, decomposition
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,215 @@
+"""Multi-grain cross-channel panel: period x geography.
+
+``cross_channel_daily.csv`` is one national row per day. ``panel()`` builds
+the same metrics at any grain:
+
+    time:       day | week (ISO, Monday start) | month
+    geography:  national | state | dma
+
+The spine is dense — every period in dim_date crossed with every member of
+the level in dim_geography — so a DMA with no activity in a week still gets
+a zero row. Facts are aggregated per (period, geo) in SQL over the warehouse
+views, joined through dim_date so periods follow the conformed calendar, and
+each aggregate is placed on the spine with one vectorized ``reindex``.
+
+Metrics only appear at levels the fact can resolve: paid social, web and
+ecommerce carry DMA and state; OOH carries state (airport) only; organic
+social and podcast are national. Stocks (``followers_eod``) take the last
+value in the period; everything else is summed.
+
+Panels are materialized on first request, kept in memory and written to
+output/panels/. A cached panel is reused until the fingerprint (size and
+mtime) of one of its source files changes.
+
+Run:     python -m analysis.panel
+"""
+
+import hashlib
+import json
+import pathlib
+import time
+
+import pandas as pd
+
+from analysis import warehouse_db
+from analysis.cross_channel_summary import DAILY_AGGREGATES, resolve_column
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+CACHE_DIR = PROJECT_ROOT / "output" / "panels"
+CACHE_INDEX = CACHE_DIR / "index.json"
+
+# Period start for each time grain, from dim_date (alias d)
+TIME_GRAINS = {
+    "day": "d.date",
+    "week": "d.week_start_date",
+    "month": "make_date(d.year, d.month, 1)",
+}
+
+NATIONAL = "US"
+
+# Geography members of each level, from dim_geography
+GEO_LEVELS = {
+    "national": None,
+    "state": "state",
+    "dma": "dma_name",
+}
+
+# Fact -> geography column per level (national is always available)
+FACT_GEO = {
+    "fact_paid_social_daily": {"state": "state", "dma": "dma_name"},
+    "fact_web_analytics_daily": {"state": "state", "dma": "dma_name"},
+    "fact_ecommerce_daily": {"state": "state", "dma": "dma_name"},
+    "fact_organic_social_daily": {},
+    "fact_podcast_daily": {},
+    "fact_ooh_daily": {"state": "state"},
+}
+
+SOURCE_TABLES = ["dim_date", "dim_geography", *FACT_GEO]
+
+_MEMORY = {}   # grain key -> (fingerprint, panel)
+
+
+def grain_key(time_grain, geo_level):
+    if time_grain not in TIME_GRAINS:
+        raise ValueError(f"unknown time grain {time_grain!r}; expected one of {list(TIME_GRAINS)}")
+    if geo_level not in GEO_LEVELS:
+        raise ValueError(f"unknown geo level {geo_level!r}; expected one of {list(GEO_LEVELS)}")
+    return f"{time_grain}_{geo_level}"
+
+
+def metric_columns(geo_level):
+    """Output metric columns available at ``geo_level``, in output order."""
+    return [out for table, aggs in DAILY_AGGREGATES.items()
+            if geo_level == "national" or geo_level in FACT_GEO[table]
+            for out in aggs]
+
+
+# ---------------------------------------------------------------------------
+# Build
+# ---------------------------------------------------------------------------
+
+def spine(con, time_grain, geo_level):
+    """Dense (period_start, geo) index plus calendar days per period."""
+    periods = warehouse_db.query(
+        f"SELECT {TIME_GRAINS[time_grain]} AS period_start, count(*) AS days "
+        f"FROM dim_date d GROUP BY ALL ORDER BY period_start", con)
+    col = GEO_LEVELS[geo_level]
+    if col is None:
+        members = [NATIONAL]
+    else:
+        members = [r[0] for r in con.execute(
+            f"SELECT DISTINCT {col} FROM dim_geography WHERE {col} IS NOT NULL ORDER BY 1"
+        ).fetchall()]
+    index = pd.MultiIndex.from_product([periods["period_start"], members],
+                                       names=["period_start", "geo"])
+    days = periods.set_index("period_start")["days"].reindex(index.get_level_values(0))
+    return index, days.to_numpy()
+
+
+def _aggregate_sql(table, aggs, types, time_grain, geo_col):
+    exprs = []
+    for out, (column, how) in aggs.items():
+        column = resolve_column(column, types)
+        if how == "first":
+            exprs.append(f"arg_max(f.{column}, d.date) FILTER (WHERE f.{column} IS NOT NULL) "
+                         f"AS {out}")
+        else:
+            exprs.append(f"{warehouse_db.sum_expr('f.' + column, types[column])} AS {out}")
+    geo = f"f.{geo_col}" if geo_col else f"'{NATIONAL}'"
+    return (f"SELECT {TIME_GRAINS[time_grain]} AS period_start, {geo} AS geo, "
+            f"{', '.join(exprs)} FROM {table} f JOIN dim_date d USING (date) GROUP BY ALL")
+
+
+def build_panel(time_grain="day", geo_level="national", con=None):
+    """Materialize one panel grain from the warehouse (no caching)."""
+    grain_key(time_grain, geo_level)
+    con = con or warehouse_db.connect()
+    index, days = spine(con, time_grain, geo_level)
+    blocks = []
+    for table, aggs in DAILY_AGGREGATES.items():
+        if geo_level != "national" and geo_level not in FACT_GEO[table]:
+            continue
+        geo_col = FACT_GEO[table].get(geo_level)
+        sql = _aggregate_sql(table, aggs, warehouse_db.column_types(con, table),
+                             time_grain, geo_col)
+        agg = warehouse_db.query(sql, con).set_index(["period_start", "geo"])
+        outside = agg.index.difference(index)
+        if len(outside):
+            print(f"  WARNING: {table}: {len(outside)} (period, geo) groups outside "
+                  f"the {geo_level} spine (e.g. {outside[0]}) are not in the panel")
+        blocks.append(agg.reindex(index, fill_value=0))
+    panel = pd.concat(blocks, axis=1)
+    panel.insert(0, "days", days)
+    return panel.reset_index()
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+
+def source_fingerprint(warehouse=warehouse_db.WAREHOUSE):
+    """Hash of the size and mtime of every source file of the panel."""
+    stats = []
+    for table in SOURCE_TABLES:
+        path = pathlib.Path(warehouse) / warehouse_db.CONTRACTS[table]["path"]
+        st = path.stat()
+        stats.append([table, st.st_size, st.st_mtime_ns])
+    return hashlib.sha256(json.dumps(stats).encode()).hexdigest()
+
+
+def _load_index(path=CACHE_INDEX):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def cache_path(key):
+    return CACHE_DIR / f"panel_{key}.csv"
+
+
+def panel(time_grain="day", geo_level="national", refresh=False, con=None):
+    """Panel at the requested grain, from memory, disk or a fresh build.
+
+    Returns a DataFrame with ``period_start``, ``geo``, ``days`` (calendar
+    days in the period) and one column per metric available at the level.
+    ``refresh`` forces a rebuild.
+    """
+    key = grain_key(time_grain, geo_level)
+    fingerprint = source_fingerprint()
+    hit = _MEMORY.get(key)
+    if hit and hit[0] == fingerprint and not refresh:
+        return hit[1].copy()
+
+    index = _load_index()
+    path = cache_path(key)
+    if not refresh and index.get(key) == fingerprint and path.exists():
+        df = pd.read_csv(path, parse_dates=["period_start"])
+    else:
+        df = build_panel(time_grain, geo_level, con)
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        df.to_csv(path, index=False)
+        index[key] = fingerprint
+        CACHE_INDEX.write_text(json.dumps(index, indent=2, sort_keys=True))
+    _MEMORY[key] = (fingerprint, df)
+    return df.copy()
+
+
+def main():
+    print("=" * 80)
+    print("CROSS-CHANNEL PANELS")
+    print("=" * 80)
+    con = warehouse_db.connect()
+    for time_grain in TIME_GRAINS:
+        for geo_level in GEO_LEVELS:
+            key = grain_key(time_grain, geo_level)
+            cached = _load_index().get(key) == source_fingerprint() and cache_path(key).exists()
+            start = time.perf_counter()
+            df = panel(time_grain, geo_level, con=con)
+            print(f"  {key:<16} {len(df):>6,} rows x {len(df.columns):>2} cols  "
+                  f"{'cached' if cached else 'built '}  {time.perf_counter() - start:.3f}s")
+    print(f"\nPanels in {CACHE_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+"""Full partial-correlation matrices from the precision matrix.
+
+The partial correlation of signals i and j given every other signal is
+
+    rho_ij = -P_ij / sqrt(P_ii * P_jj),    P = inverse(covariance)
+
+so one inversion conditions each pair on all other channels at once
+(``executive_outputs`` conditions paid -> revenue on sessions only).
+
+Lagged copies (``{col}__lag{k}``: the signal k days earlier) can be added as
+extra variables, so e.g. today's revenue is conditioned on yesterday's spend
+as well as today's.
+
+The covariance can be shrunk towards a scaled identity with the Ledoit-Wolf
+estimator. It has a closed-form intensity, so it needs no tuning, and it
+keeps the inverse stable when there are many variables relative to days or
+when signals are nearly collinear (pageviews and sessions).
+
+Groups (national plus one per DMA) are stacked into a (G, T, K) array:
+covariances, shrinkage and inverses for all of them are single batched
+calls. A variable a group does not carry — a column of zeros, e.g. podcast
+at DMA level — is decoupled from the others and reported as missing. So is
+a variable that is (numerically) a linear combination of the variables
+before it, e.g. web_sessions and web_users, which are identical to
+web_pageviews: inverting them together only reports shrinkage artifacts and
+splits one signal's partial correlations across its copies.
+Signals are deseasonalized first (14-day centered moving average residuals,
+``analysis.deseasonalize``) unless ``residualize`` is False. Days with any
+missing value in a group are dropped from that group.
+
+Outputs: analysis/output/partial_correlations.csv
+Run:     python -m analysis.partial_correlation
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from analysis.deseasonalize import decompose
+
+LAGS = (1, 7)
+WINDOW = 14
+MIN_OBS = 30
+COLLINEAR_TOL = 1e-8
+
+
+def with_lags(values, columns, lags=LAGS):
+    """(..., T, N) values plus lagged copies, (..., T, N * (1 + len(lags))),
+    and the matching column names."""
+    x = np.asarray(values, dtype=np.float64)
+    blocks, names = [x], list(columns)
+    for k in lags:
+        shifted = np.full_like(x, np.nan)
+        shifted[..., k:, :] = x[..., :x.shape[-2] - k, :]
+        blocks.append(shifted)
+        names += [f"{c}__lag{k}" for c in columns]
+    return np.concatenate(blocks, axis=-1), names
+
+
+def covariance(values):
+    """Per-group covariance over complete days, with the standardized data.
+
+    ``values`` is (G, T, K). Returns ``(cov, z, mask, active)``: the (G, K, K)
+    correlation-scale covariance, the standardized values with dropped days
+    zeroed, the (G, T) mask of complete days, and (G, K) flags of columns
+    with variance.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    mask = ~np.isnan(x).any(axis=-1)
+    n = mask.sum(axis=-1)[:, None, None]
+    x = np.where(mask[..., None], x, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x = x - x.sum(axis=-2, keepdims=True) / n
+        x = np.where(mask[..., None], x, 0.0)
+        scale = np.sqrt((x ** 2).sum(axis=-2, keepdims=True) / n)
+        active = scale[:, 0] > 1e-12 * np.abs(x).max(axis=-2).clip(min=1.0)
+        z = np.where(active[:, None, :], x / np.where(scale > 0, scale, 1.0), 0.0)
+    cov = z.transpose(0, 2, 1) @ z / n
+    return cov, z, mask, active
+
+
+def ledoit_wolf(cov, z, mask):
+    """Ledoit-Wolf shrinkage of each (K, K) covariance towards mu * I.
+
+    Returns the shrunk covariances and the (G,) shrinkage intensities.
+    """
+    n = mask.sum(axis=-1).astype(np.float64)
+    k = cov.shape[-1]
+    eye = np.eye(k)
+    mu = np.trace(cov, axis1=-2, axis2=-1) / k
+    d2 = ((cov - mu[:, None, None] * eye) ** 2).sum(axis=(-2, -1))
+    # mean over days of ||z_t z_t' - S||^2 = sum ||z_t||^4 / n - ||S||^2
+    row_norm4 = ((z ** 2).sum(axis=-1) ** 2).sum(axis=-1)
+    b2 = (row_norm4 / n - (cov ** 2).sum(axis=(-2, -1))) / n
+    with np.errstate(invalid="ignore", divide="ignore"):
+        shrinkage = np.clip(np.minimum(b2, d2) / d2, 0.0, 1.0)
+    shrinkage = np.nan_to_num(shrinkage)
+    s = shrinkage[:, None, None]
+    return s * mu[:, None, None] * eye + (1 - s) * cov, shrinkage
+
+
+def redundant_columns(corr, active, tol=COLLINEAR_TOL):
+    """(G, K) flags of active columns that are linear combinations of the
+    active columns before them.
+
+    Sweeps the correlation matrices one column at a time (batched over
+    groups): after sweeping the kept columns, the diagonal of a column is
+    its residual variance given them, and a column whose residual variance
+    is at most ``tol`` adds nothing and is not kept.
+    """
+    a = np.where(active[:, :, None] & active[:, None, :], corr, 0.0)
+    redundant = np.zeros_like(active)
+    for k in range(a.shape[-1]):
+        pivot = a[:, k, k]
+        keep = active[:, k] & (pivot > tol)
+        redundant[:, k] = active[:, k] & ~keep
+        col = a[:, :, k] / np.where(keep, pivot, 1.0)[:, None]
+        a = np.where(keep[:, None, None], a - col[:, :, None] * a[:, None, k, :], a)
+    return redundant
+
+
+def partial_correlations(values, shrink=True, min_obs=MIN_OBS):
+    """Partial-correlation matrices of a (T, K) or (G, T, K) array.
+
+    Returns ``(partial, corr, n_obs, shrinkage, redundant)``: (…, K, K)
+    partial and marginal correlations (NaN for columns without variance or
+    that are ``redundant_columns``, and for groups with fewer than
+    ``min_obs`` complete days), the complete days per group, the Ledoit-Wolf
+    intensity (0 when ``shrink`` is False) and the (…, K) redundant flags.
+    Without shrinkage a singular covariance uses the pseudo-inverse.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    single = x.ndim == 2
+    x = x[None] if single else x
+    cov, z, mask, active = covariance(x)
+    corr = cov.copy()
+    # Collapse collinear columns before shrinking and inverting.
+    redundant = redundant_columns(corr, active)
+    active = active & ~redundant
+    z = np.where(active[:, None, :], z, 0.0)
+    cov = np.where(active[:, :, None] & active[:, None, :], cov, 0.0)
+    if shrink:
+        cov, shrinkage = ledoit_wolf(cov, z, mask)
+    else:
+        shrinkage = np.zeros(len(x))
+    # Decouple inactive columns: unit variance, no covariance.
+    both = active[:, :, None] & active[:, None, :]
+    eye = np.eye(cov.shape[-1], dtype=bool)
+    cov = np.where(both, cov, 0.0) + np.where(~active[:, :, None] & eye, 1.0, 0.0)
+    precision = np.linalg.inv(cov) if shrink else np.linalg.pinv(cov, hermitian=True)
+    d = np.sqrt(np.diagonal(precision, axis1=-2, axis2=-1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        partial = -precision / (d[:, :, None] * d[:, None, :])
+    partial[:, eye] = 1.0
+    n_obs = mask.sum(axis=-1)
+    invalid = ~both | (n_obs < min_obs)[:, None, None]
+    partial[invalid] = np.nan
+    corr[invalid] = np.nan
+    partial, corr = np.clip(partial, -1, 1), np.clip(corr, -1, 1)
+    if single:
+        return partial[0], corr[0], n_obs[0], shrinkage[0], redundant[0]
+    return partial, corr, n_obs, shrinkage, redundant
+
+
+def tidy(partial, corr, n_obs, shrinkage, columns, groups, by="geo"):
+    """Long table, one row per group and unordered pair (x before y in
+    ``columns``) with a defined partial correlation."""
+    i, j = np.triu_indices(len(columns), k=1)
+    cols = np.asarray(columns)
+    frames = []
+    for g, key in enumerate(groups):
+        frames.append(pd.DataFrame({
+            by: key, "x": cols[i], "y": cols[j],
+            "correlation": corr[g, i, j], "partial_r": partial[g, i, j],
+            "n_obs": n_obs[g], "shrinkage": shrinkage[g],
+        }))
+    out = pd.concat(frames, ignore_index=True).dropna(subset=["partial_r"])
+    return out.round({"correlation": 6, "partial_r": 6, "shrinkage": 4}).reset_index(drop=True)
+
+
+def panel_stack(frames, columns, residualize=True, window=WINDOW):
+    """(G, T, K) array of ``columns`` from per-group daily frames (missing
+    columns as zeros), deseasonalized per group unless ``residualize`` is
+    False."""
+    blocks = []
+    for df in frames:
+        values = np.column_stack([df[c].to_numpy(dtype=np.float64) if c in df
+                                  else np.zeros(len(df)) for c in columns])
+        if residualize:
+            values = decompose(values, df["period_start"], "moving_average", window)[2]
+        blocks.append(values)
+    return np.stack(blocks)
+
+
+def run(lags=LAGS, shrink=True, residualize=True):
+    """National (all metrics) and per-DMA partial correlations in one batched
+    call, with lagged copies."""
+    from analysis.lag_analysis import OUTPUT
+    from analysis.panel import NATIONAL, panel, metric_columns
+
+    columns = metric_columns("national")
+    national = panel("day", "national")
+    dma = panel("day", "dma").sort_values(["geo", "period_start"])
+    groups = [NATIONAL, *dict.fromkeys(dma["geo"])]
+    frames = [national, *[sub for _, sub in dma.groupby("geo", sort=False)]]
+
+    start = time.perf_counter()
+    stack, names = with_lags(panel_stack(frames, columns, residualize), columns, lags)
+    partial, corr, n_obs, shrinkage, redundant = partial_correlations(stack, shrink)
+    table = tidy(partial, corr, n_obs, shrinkage, names, groups)
+    print(f"Partial correlations: {len(groups)} groups x {len(names)} variables "
+          f"in {time.perf_counter() - start:.3f}s")
+    path = OUTPUT / "partial_correlations.csv"
+    table.to_csv(path, index=False)
+    print(f"  Written {path} ({len(table):,} rows)")
+    dropped = [names[k] for k in np.flatnonzero(redundant[0])]
+    if dropped:
+        print(f"  Collinear with earlier variables, left out ({NATIONAL}): {', '.join(dropped)}")
+    print("  Ledoit-Wolf shrinkage: "
+          + ", ".join(f"{g} {s:.3f}" for g, s in zip(groups, shrinkage)))
+
+    key = (table["geo"] == NATIONAL) & (table["x"] == "paid_social_spend") \
+        & (table["y"] == "ecomm_revenue")
+    if key.any():
+        row = table[key].iloc[0]
+        print(f"\n  Paid social spend vs ecomm revenue (national): r = {row['correlation']:.3f}, "
+              f"partial r given all other variables = {row['partial_r']:.3f}")
+    national_rows = table[table["geo"] == NATIONAL]
+    top = national_rows.reindex(national_rows["partial_r"].abs()
+                                .sort_values(ascending=False).index).head(10)
+    print("\nStrongest national partial correlations:")
+    print(top.to_string(index=False))
+    return table
+
+
+if __name__ == "__main__":
+    run()
@@ -1,15 +1,54 @@
 """Promo impact analysis on ecommerce transactions.
 
-Reads fact_ecommerce_transactions.csv. Writes promo_impact_summary.csv.
+Reads fact_ecommerce_transactions.csv (and dim_date for week and
+season_flag). Writes promo_impact_summary.csv and promo_uplift_cube.csv.
+
+The uplift cube compares promo and non-promo line items by product_category,
+size, DMA, week, season_flag and day of week. Every key is integer-coded and
+combined with promo_flag into one int64 cell id, so a single bincount pass
+gives each occupied cell its additive sufficient statistics (line items, and
+sum and sum of squares of each metric in ``UPLIFT_METRICS``). Any coarser
+grouping (``ROLLUPS``) is a sum over those cells, not a rescan of the
+transactions. Per rollup cell the cube reports both means, the
+promo - non-promo delta and its Welch standard error; line items are treated
+as independent draws.
+
+The finest-grain cell statistics are written too, so other rollups can be
+derived without rescanning: ``rollup(pd.read_csv(cells_path), by)``. A
+missing key (null DMA, or a date absent from dim_date) is kept as its own
+``UNKNOWN`` level.
+
+Outputs: analysis/output/promo_impact_summary.csv
+         analysis/output/promo_uplift_cube.csv
+         analysis/output/promo_uplift_cells.csv (sufficient statistics per cell)
+Run:     python -m analysis.promo_analysis
 """
 
 import pathlib
+
+import numpy as np
 import pandas as pd
 
 PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
 WAREHOUSE = PROJECT_ROOT / "data_warehouse"
 OUTPUT = PROJECT_ROOT / "analysis" / "output"
 
+CUBE_DIMENSIONS = ["product_category", "size", "dma_name", "week_start_date",
+                   "season_flag", "day_of_week"]
+UPLIFT_METRICS = ["line_revenue", "quantity"]
+ALL = "ALL"
+UNKNOWN = "UNKNOWN"
+
+# Groupings written to the cube: the overall total, each dimension alone,
+# and the pairs the merchandising and regional reviews read.
+ROLLUPS = [
+    (),
+    *[(d,) for d in CUBE_DIMENSIONS],
+    ("product_category", "size"),
+    ("product_category", "season_flag"),
+    ("dma_name", "season_flag"),
+]
+
 
 def _read(path):
     df = pd.read_csv(path, parse_dates=["date"])
@@ -17,30 +56,129 @@ def _read(path):
     return df
 
 
-def run():
-    """Compute promo vs non-promo metrics and write summary."""
-    txn = _read(WAREHOUSE / "fact_ecommerce" / "fact_ecommerce_transactions.csv")
+def summarize(txn):
+    """Promo vs non-promo totals, one row per promo_flag."""
+    g = txn.assign(_neg_row=txn["line_revenue"] < 0,
+                   _neg=txn["line_revenue"].clip(upper=0)).groupby("promo_flag", sort=True)
+    summary = g.agg(line_items=("order_id", "size"),
+                    distinct_orders=("order_id", "nunique"),
+                    total_quantity=("quantity", "sum"),
+                    total_revenue=("line_revenue", "sum"),
+                    avg_unit_price=("unit_price", "mean"),
+                    avg_discount_per_unit=("discount_per_unit", "mean"),
+                    negative_revenue_rows=("_neg_row", "sum"),
+                    negative_revenue_amount=("_neg", "sum")).reset_index()
+    orders = summary["distinct_orders"]
+    summary.insert(5, "avg_order_value",
+                   (summary["total_revenue"] / orders.where(orders > 0)).round(2).fillna(0))
+    return summary.round({"total_revenue": 2, "avg_unit_price": 2,
+                          "avg_discount_per_unit": 2, "negative_revenue_amount": 2})
+
+
+# ---------------------------------------------------------------------------
+# Uplift cube
+# ---------------------------------------------------------------------------
+
+def cube_frame(txn, dim_date):
+    """Transactions with the dim_date keys of the cube attached."""
+    calendar = dim_date[["date", "week_start_date", "season_flag", "day_of_week"]]
+    return txn.merge(calendar, on="date", how="left", validate="many_to_one")
+
+
+def cells(df, dims=CUBE_DIMENSIONS, metrics=UPLIFT_METRICS):
+    """Sufficient statistics of every occupied (dims..., promo_flag) cell.
 
-    results = []
-    for flag in sorted(txn["promo_flag"].unique()):
-        sub = txn[txn["promo_flag"] == flag]
-        neg = sub[sub["line_revenue"] < 0]
-        distinct_orders = sub["order_id"].nunique()
-        total_rev = sub["line_revenue"].sum()
-        results.append({
-            "promo_flag": flag,
-            "line_items": len(sub),
-            "distinct_orders": distinct_orders,
-            "total_quantity": sub["quantity"].sum(),
-            "total_revenue": round(total_rev, 2),
-            "avg_order_value": round(total_rev / distinct_orders, 2) if distinct_orders else 0,
-            "avg_unit_price": round(sub["unit_price"].mean(), 2),
-            "avg_discount_per_unit": round(sub["discount_per_unit"].mean(), 2),
-            "negative_revenue_rows": len(neg),
-            "negative_revenue_amount": round(neg["line_revenue"].sum(), 2),
+    One row per cell: the dimension values, ``promo_flag``, ``n`` and
+    ``{metric}_sum`` / ``{metric}_sumsq``. All cells come from one bincount
+    pass over a combined integer key.
+    """
+    codes, levels = [], []
+    for d in dims:
+        # factorize codes NaN as -1, which ravel_multi_index rejects
+        code, uniques = pd.factorize(df[d].astype("string").fillna(UNKNOWN), sort=True)
+        codes.append(code)
+        levels.append(uniques)
+    codes.append(df["promo_flag"].to_numpy().astype(np.int64))
+    shape = [len(u) for u in levels] + [2]
+    key = np.ravel_multi_index(codes, shape)
+    occupied, inverse = np.unique(key, return_inverse=True)
+
+    stats = {"n": np.bincount(inverse, minlength=len(occupied))}
+    for m in metrics:
+        x = df[m].to_numpy(dtype=np.float64)
+        stats[f"{m}_sum"] = np.bincount(inverse, weights=x, minlength=len(occupied))
+        stats[f"{m}_sumsq"] = np.bincount(inverse, weights=x * x, minlength=len(occupied))
+
+    index = np.unravel_index(occupied, shape)
+    out = {d: u.take(i) for d, u, i in zip(dims, levels, index)}
+    out["promo_flag"] = index[-1]
+    out.update(stats)
+    return pd.DataFrame(out)
+
+
+def rollup(cell_stats, by, metrics=UPLIFT_METRICS):
+    """Promo vs non-promo comparison per group of ``by`` (a tuple of
+    dimensions; empty for the overall total), summed from ``cell_stats``.
+
+    Returns one row per (group, metric): line items, means of each arm, the
+    delta, its standard error and the relative uplift.
+    """
+    sums = [c for c in cell_stats if c == "n" or c.endswith(("_sum", "_sumsq"))]
+    agg = cell_stats.groupby([*by, "promo_flag"], sort=True)[sums].sum()
+    wide = agg.unstack("promo_flag", fill_value=0)
+    if not by:
+        wide = wide.to_frame().T
+    frames = []
+    for m in metrics:
+        arms = {}
+        for flag in (0, 1):
+            n = wide[("n", flag)].to_numpy(dtype=np.float64)
+            s = wide[(f"{m}_sum", flag)].to_numpy()
+            ss = wide[(f"{m}_sumsq", flag)].to_numpy()
+            with np.errstate(invalid="ignore", divide="ignore"):
+                mean = s / n
+                var = np.where(n > 1, (ss - s * mean) / (n - 1), np.nan)
+            arms[flag] = n, mean, np.clip(var, 0, None)
+        (n0, mean0, var0), (n1, mean1, var1) = arms[0], arms[1]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            se = np.sqrt(var1 / n1 + var0 / n0)
+            relative = np.where(mean0 != 0, (mean1 - mean0) / np.abs(mean0), np.nan)
+        frame = pd.DataFrame({
+            "metric": m,
+            "n_promo": n1.astype(int), "n_non_promo": n0.astype(int),
+            "mean_promo": mean1, "mean_non_promo": mean0,
+            "delta": mean1 - mean0, "delta_se": se, "relative_uplift": relative,
         })
+        for d in reversed(by):
+            frame.insert(0, d, wide.index.get_level_values(d) if len(by) > 1 else wide.index)
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
 
-    summary = pd.DataFrame(results)
+def uplift_cube(cell_stats, rollups=ROLLUPS, dims=CUBE_DIMENSIONS, metrics=UPLIFT_METRICS):
+    """Tidy cube of every rollup: one column per dimension (``ALL`` where
+    rolled up), a ``grouping`` label and the rollup comparison columns."""
+    frames = []
+    for by in rollups:
+        frame = rollup(cell_stats, by, metrics)
+        for d in by:
+            frame[d] = frame[d].astype(str)
+        for d in dims:
+            if d not in by:
+                frame[d] = ALL
+        frame.insert(0, "grouping", " x ".join(by) or ALL)
+        frames.append(frame)
+    cube = pd.concat(frames, ignore_index=True)
+    cube = cube[["grouping", *dims, *[c for c in cube if c not in dims and c != "grouping"]]]
+    return cube.round({"mean_promo": 4, "mean_non_promo": 4, "delta": 4,
+                       "delta_se": 4, "relative_uplift": 4})
+
+
+def run():
+    """Compute promo vs non-promo metrics and the uplift cube; write both."""
+    txn = _read(WAREHOUSE / "fact_ecommerce" / "fact_ecommerce_transactions.csv")
+
+    summary = summarize(txn)
 
     OUTPUT.mkdir(parents=True, exist_ok=True)
     out_path = OUTPUT / "promo_impact_summary.csv"
@@ -63,6 +201,25 @@ def run():
         print(f"    Negative rev amount: ${row['negative_revenue_amount']:,.2f}")
 
     print(f"\n  Written to {out_path}")
+
+    dim_date = _read(WAREHOUSE / "dimensions" / "dim_date.csv")
+    cell_stats = cells(cube_frame(txn, dim_date))
+    cells_path = OUTPUT / "promo_uplift_cells.csv"
+    cell_stats.to_csv(cells_path, index=False)
+    cube = uplift_cube(cell_stats)
+    cube_path = OUTPUT / "promo_uplift_cube.csv"
+    cube.to_csv(cube_path, index=False)
+    print(f"\nPromo Uplift Cube: {len(cell_stats):,} cells -> {len(ROLLUPS)} rollups")
+    print(f"  Written to {cells_path} ({len(cell_stats):,} rows)")
+    print(f"  Written to {cube_path} ({len(cube):,} rows)")
+    single = cube[(cube["metric"] == "line_revenue")
+                  & cube["grouping"].isin(["product_category", "size", "dma_name",
+                                           "season_flag"])]
+    print("\n  Line revenue per item, promo - non-promo:")
+    for _, row in single.iterrows():
+        level = row[row["grouping"]]
+        print(f"    {row['grouping']:<17} {level:<22} {row['delta']:+8.2f} "
+              f"(se {row['delta_se']:.2f}, n {row['n_promo']:,}/{row['n_non_promo']:,})")
     return summary
 
 
@@ -0,0 +1,259 @@
+"""Rolling-window lagged correlations.
+
+One correlation over the full 18 months hides how channel relationships
+shift between ``regular``, ``back_to_school`` and ``black_friday_holiday``
+periods. ``rolling_correlations`` tracks r(x(t), y(t + k)) over a sliding
+window for many pairs and lags at once.
+
+Each window needs the six Pearson sums (n, x, y, x^2, y^2, xy). The per-day
+terms of every (lag, pair) come from ``significance.aligned_terms``; one
+cumulative sum along time then gives every window's sums as the difference
+of two prefix sums: O(1) per window and O(T) per series, whatever the
+window length. Days where either side is missing drop out of their windows.
+
+A row is labelled by the window's last target day (the day of y(t + k)), so
+a correlation never uses data from after its date. ``window_season`` is the
+season_flag of the window when all of its days share one, else
+``transition``.
+
+Outputs: analysis/output/rolling_correlations.csv
+         analysis/output/chart_rolling_correlation.png
+Run:     python -m analysis.rolling_correlation
+         python -m analysis.rolling_correlation --benchmark   (vs pandas rolling().corr)
+"""
+
+import pathlib
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+
+from analysis.significance import aligned_terms, pearson_from_sums
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+OUTPUT = PROJECT_ROOT / "analysis" / "output"
+
+WINDOW = 21
+MIN_PERIODS = 14
+LAGS = (0, 7)
+TRANSITION = "transition"
+
+COLORS = {
+    "steel_blue": "#4682B4",
+    "coral": "#E07A5F",
+    "sage": "#81B29A",
+    "amber": "#F2CC8F",
+    "slate": "#3D405B",
+}
+SEASON_COLORS = {"back_to_school": COLORS["amber"], "black_friday_holiday": COLORS["coral"]}
+DPI = 300
+FONT_LABEL = 11
+FONT_TITLE = 13
+
+
+# ---------------------------------------------------------------------------
+# Engine
+# ---------------------------------------------------------------------------
+
+def window_sums(terms, window):
+    """Sliding-window sums of ``terms`` along axis 0 via prefix sums; row t
+    covers rows t - window + 1..t (rows before a full window are partial)."""
+    csum = np.cumsum(terms, axis=0)
+    out = csum.copy()
+    out[window:] -= csum[:-window]
+    return out
+
+
+def rolling_correlations(values, x_idx, y_idx, lags=LAGS, window=WINDOW,
+                         min_periods=MIN_PERIODS):
+    """Rolling r of every (lag, pair).
+
+    ``values`` is (T, N), NaN where missing. Returns ``(r, n)``, each
+    (T, len(lags), P): r[t, l, p] correlates x_p with y_p lagged by
+    ``lags[l]`` over the ``window`` target days ending at t; NaN where fewer
+    than ``min_periods`` days overlap or a side has no variance.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    T = len(x)
+    lags = list(lags)
+    max_lag = max(lags)
+    if not 0 <= max_lag < T:
+        raise ValueError(f"lags must be in [0, {T - 1}], got {lags}")
+    if window < 1:
+        raise ValueError(f"window must be positive, got {window}")
+    terms = aligned_terms(x, np.asarray(x_idx), np.asarray(y_idx), max_lag)[:, :, lags]
+    sums = window_sums(terms, window)                   # (T, 6, L, P), x-side rows
+    r = pearson_from_sums(sums)
+    n = np.rint(sums[:, 0]).astype(np.int64)
+    r[n < min_periods] = np.nan
+    # Row t pairs x(t) with y(t + k): move lag k's rows to the target date.
+    r_out = np.full_like(r, np.nan)
+    n_out = np.zeros_like(n)
+    for l, k in enumerate(lags):
+        r_out[k:, l] = r[:T - k, l]
+        n_out[k:, l] = n[:T - k, l]
+    return r_out, n_out
+
+
+def window_seasons(flags, window=WINDOW):
+    """season_flag of each window ending at t, or ``TRANSITION`` when the
+    window spans more than one season (O(T) via a running count of changes)."""
+    flags = np.asarray(flags, dtype=object)
+    changes = np.concatenate([[0], np.cumsum(flags[1:] != flags[:-1])])
+    start = np.maximum(np.arange(len(flags)) - window + 1, 0)
+    return np.where(changes == changes[start], flags, TRANSITION)
+
+
+def pair_table(df, pairs, lags=LAGS, window=WINDOW, min_periods=MIN_PERIODS):
+    """Tidy rolling correlations for (x_col, y_col, label) pairs of ``df``:
+    date, window_season, signal_pair, lag_days, pearson_r, n_obs."""
+    df = df.sort_values("date").reset_index(drop=True)
+    columns = list(dict.fromkeys(c for x, y, _ in pairs for c in (x, y)))
+    x_idx = [columns.index(x) for x, _, _ in pairs]
+    y_idx = [columns.index(y) for _, y, _ in pairs]
+    r, n = rolling_correlations(df[columns].to_numpy(dtype=np.float64), x_idx, y_idx,
+                                lags, window, min_periods)
+    T, L, P = r.shape
+    p, l, t = np.meshgrid(np.arange(P), np.arange(L), np.arange(T), indexing="ij")
+    labels = np.array([label for _, _, label in pairs])
+    out = pd.DataFrame({
+        "date": df["date"].to_numpy()[t.ravel()],
+        "window_season": window_seasons(df["season_flag"], window)[t.ravel()],
+        "signal_pair": labels[p.ravel()],
+        "lag_days": np.asarray(lags)[l.ravel()],
+        "pearson_r": r[t, l, p].ravel().round(6),
+        "n_obs": n[t, l, p].ravel(),
+    })
+    return out.dropna(subset=["pearson_r"]).reset_index(drop=True)
+
+
+def season_summary(table):
+    """Mean, min and max rolling r per pair, lag and window season (windows
+    that lie entirely inside one season)."""
+    inside = table[table["window_season"] != TRANSITION]
+    return (inside.groupby(["signal_pair", "lag_days", "window_season"], sort=False)["pearson_r"]
+            .agg(windows="count", mean_r="mean", min_r="min", max_r="max")
+            .round(4)
+            .reset_index())
+
+
+# ---------------------------------------------------------------------------
+# Chart
+# ---------------------------------------------------------------------------
+
+def chart_rolling(table, summary, pairs, colors, lag=0, window=WINDOW):
+    """Rolling r over time for ``pairs`` at one lag, seasons shaded."""
+    fig, ax = plt.subplots(figsize=(12, 6))
+    spans = summary.assign(block=summary["season_flag"].ne(summary["season_flag"].shift()).cumsum())
+    spans = spans.groupby("block").agg(flag=("season_flag", "first"),
+                                       start=("date", "min"), end=("date", "max"))
+    shaded = set()
+    for _, span in spans.iterrows():
+        if span["flag"] in SEASON_COLORS:
+            ax.axvspan(span["start"], span["end"], color=SEASON_COLORS[span["flag"]], alpha=0.15,
+                       linewidth=0,
+                       label=None if span["flag"] in shaded
+                       else span["flag"].replace("_", " ").title())
+            shaded.add(span["flag"])
+    for (_, _, label), color in zip(pairs, colors):
+        sub = table[(table["signal_pair"] == label) & (table["lag_days"] == lag)]
+        ax.plot(sub["date"], sub["pearson_r"], linewidth=1.8, color=color, label=label)
+    ax.axhline(0, color="gray", linewidth=0.5, linestyle="--")
+    ax.set_ylim(-1.05, 1.05)
+    ax.set_title(f"Rolling {window}-Day Correlation (lag {lag}d)",
+                 fontsize=FONT_TITLE, fontweight="bold", pad=10)
+    ax.set_ylabel("Pearson r", fontsize=FONT_LABEL)
+    ax.xaxis.set_major_locator(mdates.MonthLocator(interval=2))
+    ax.xaxis.set_major_formatter(mdates.DateFormatter("%b %Y"))
+    ax.tick_params(axis="x", rotation=45)
+    ax.spines["top"].set_visible(False)
+    ax.spines["right"].set_visible(False)
+    ax.legend(fontsize=9, loc="lower left", framealpha=0.9)
+    ax.text(0.0, -0.2, f"Each point: the {window} days ending on that date",
+            transform=ax.transAxes, fontsize=8, color="gray")
+    path = OUTPUT / "chart_rolling_correlation.png"
+    fig.savefig(path, dpi=DPI, bbox_inches="tight")
+    plt.close(fig)
+    print(f"  Saved {path}")
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def benchmark(window=WINDOW, lags=tuple(range(15))):
+    """Time prefix sums vs pandas ``rolling().corr`` over every ordered pair
+    of the national daily signals."""
+    from analysis.panel import panel, metric_columns
+
+    daily = panel("day", "national")
+    columns = metric_columns("national")
+    values = daily[columns].to_numpy(dtype=np.float64)
+    size = len(columns)
+    x_idx = [i for i in range(size) for j in range(size) if i != j]
+    y_idx = [j for i in range(size) for j in range(size) if i != j]
+
+    start = time.perf_counter()
+    r, _ = rolling_correlations(values, x_idx, y_idx, lags, window, min_periods=window)
+    fast_s = time.perf_counter() - start
+
+    frame = pd.DataFrame(values)
+    start = time.perf_counter()
+    ref = np.full_like(r, np.nan)
+    for l, k in enumerate(lags):
+        for p, (i, j) in enumerate(zip(x_idx, y_idx)):
+            ref[:, l, p] = frame[i].shift(k).rolling(window).corr(frame[j]).to_numpy()
+    loop_s = time.perf_counter() - start
+    # Constant windows come out as NaN here and as NaN or inf in pandas.
+    both = np.isfinite(r) & np.isfinite(ref)
+    return pd.DataFrame([{
+        "pairs": len(x_idx), "lags": len(lags), "window": window,
+        "correlations": r.size,
+        "pandas_seconds": round(loop_s, 3), "prefix_sum_seconds": round(fast_s, 4),
+        "speedup": round(loop_s / fast_s, 1),
+        "max_abs_diff": float(np.abs(r[both] - ref[both]).max()),
+    }])
+
+
+# ---------------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------------
+
+def run(window=WINDOW, lags=LAGS):
+    """Rolling correlations for the lag_analysis signal pairs."""
+    from analysis.lag_analysis import SIGNAL_PAIRS, _read
+
+    summary = _read(OUTPUT / "cross_channel_daily.csv")
+    start = time.perf_counter()
+    table = pair_table(summary, SIGNAL_PAIRS, lags, window)
+    print(f"Rolling {window}-day correlations: {len(SIGNAL_PAIRS)} pairs x lags {list(lags)} "
+          f"in {time.perf_counter() - start:.3f}s")
+    path = OUTPUT / "rolling_correlations.csv"
+    table.to_csv(path, index=False)
+    print(f"  Written {path} ({len(table):,} rows)")
+
+    print("\nMean rolling r by season (windows inside one season):")
+    print(season_summary(table).to_string(index=False))
+
+    chart_rolling(table, summary, SIGNAL_PAIRS[:3],
+                  [COLORS["steel_blue"], COLORS["coral"], COLORS["sage"]], lag=0, window=window)
+    return table
+
+
+def main():
+    if "--benchmark" in sys.argv[1:]:
+        print("=" * 80)
+        print("ROLLING CORRELATION BENCHMARK")
+        print("=" * 80)
+        print(benchmark().to_string(index=False))
+    else:
+        run()
+
+
+if __name__ == "__main__":
+    main()
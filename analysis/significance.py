@@ -0,0 +1,229 @@
+"""Uncertainty for lagged cross-correlations.
+
+Two resampling schemes, both vectorized over every signal pair and lag:
+
+* Confidence intervals — circular moving-block bootstrap. Each replicate
+  draws blocks of ``BLOCK_LENGTH`` consecutive days (preserving the short-run
+  autocorrelation a plain bootstrap would destroy). A replicate is just a
+  weight per day (how often it was drawn), so the six Pearson sums of every
+  (lag, pair) for a whole batch of replicates are one matrix product:
+  (replicates x T) @ (T x sums). Batches of ``CHUNK`` replicates run in a
+  process pool, each with its own child seed, so results do not depend on
+  the worker count.
+
+* p-values — circular-shift permutation test. Shifting one series against
+  the other keeps both autocorrelation structures and breaks their
+  alignment; every shift farther than ``max_lag + BLOCK_LENGTH`` days from
+  the real alignment is one null replicate. All T shifts come from one
+  circular FFT pass (``xcorr.lagged_correlations(circular=True)``), so the
+  null is enumerated exactly rather than sampled. These per-lag p-values are
+  unadjusted. The peak lag is picked as the largest |r| over lags
+  0..max_lag, so its p-value compares that maximum with the maximum |r| over
+  the same window of lags at each far shift.
+
+The bootstrap also gives the range of the peak lag, which is what decides
+whether "peak at lag 3d" differs from lag 0.
+
+Run:     python -m analysis.significance
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from analysis.xcorr import lagged_correlations
+
+N_BOOT = 2000
+BLOCK_LENGTH = 14
+CONFIDENCE = 0.95
+CHUNK = 250
+SEED = 42
+
+
+# ---------------------------------------------------------------------------
+# Block bootstrap
+# ---------------------------------------------------------------------------
+
+def block_indices(n_rep, length, block, rng):
+    """(n_rep, length) day indices of circular moving-block bootstrap samples."""
+    n_blocks = -(-length // block)
+    starts = rng.integers(0, length, size=(n_rep, n_blocks))
+    idx = (starts[:, :, None] + np.arange(block)) % length
+    return idx.reshape(n_rep, -1)[:, :length]
+
+
+def index_weights(idx, length):
+    """Times each day is drawn in each replicate, (n_rep, length)."""
+    n_rep = len(idx)
+    flat = (np.arange(n_rep)[:, None] * length + idx).ravel()
+    return np.bincount(flat, minlength=n_rep * length).reshape(n_rep, length).astype(np.float64)
+
+
+def aligned_terms(values, x_idx, y_idx, max_lag):
+    """Per-day terms of the Pearson sums (n, x, y, x^2, y^2, xy) for every lag
+    and pair, (T, 6, lags, pairs). Day t pairs x(t) with y(t + k); days
+    without both values contribute nothing."""
+    T, lags, size = len(values), max_lag + 1, len(x_idx)
+    a = np.full((T, lags, size), np.nan)
+    b = np.full((T, lags, size), np.nan)
+    for k in range(lags):
+        a[:T - k, k] = values[:T - k, x_idx]
+        b[:T - k, k] = values[k:, y_idx]
+    m = ~(np.isnan(a) | np.isnan(b))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for v in (a, b):
+            v[~m] = np.nan
+            v -= np.nanmean(v, axis=0)
+            v /= np.nanstd(v, axis=0)
+            v[~m | ~np.isfinite(v)] = 0
+    return np.stack([m, a, b, a * a, b * b, a * b], axis=1).astype(np.float64)
+
+
+def pearson_from_sums(sums):
+    """Pearson r from the six sums stacked on axis -3."""
+    n, sx, sy, sxx, syy, sxy = np.moveaxis(sums, -3, 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cov = sxy - sx * sy / n
+        var_x = sxx - sx * sx / n
+        var_y = syy - sy * sy / n
+        r = cov / np.sqrt(var_x * var_y)
+        r[(n < 3) | (var_x <= 1e-9 * n) | (var_y <= 1e-9 * n)] = np.nan
+    return np.clip(r, -1.0, 1.0)
+
+
+def _bootstrap_chunk(terms, block, n_rep, seed):
+    T = terms.shape[0]
+    weights = index_weights(block_indices(n_rep, T, block, np.random.default_rng(seed)), T)
+    sums = weights @ terms.reshape(T, -1)
+    return pearson_from_sums(sums.reshape(n_rep, *terms.shape[1:]))
+
+
+def bootstrap(terms, n_boot=N_BOOT, block=BLOCK_LENGTH, seed=SEED, workers=None):
+    """Bootstrap replicates of r, (n_boot, lags, pairs)."""
+    sizes = [min(CHUNK, n_boot - start) for start in range(0, n_boot, CHUNK)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(terms, block, size, s) for size, s in zip(sizes, seeds)]
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    if workers <= 1:
+        chunks = [_bootstrap_chunk(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(_bootstrap_chunk, *zip(*jobs)))
+    return np.concatenate(chunks)
+
+
+# ---------------------------------------------------------------------------
+# Circular-shift null
+# ---------------------------------------------------------------------------
+
+def circular_shifts(values, x_idx, y_idx):
+    """r of every pair at every circular shift, (T, pairs)."""
+    r, _ = lagged_correlations(values, len(values) - 1, circular=True)
+    return r[:, x_idx, y_idx]
+
+
+def far_shifts(length, max_lag, block=BLOCK_LENGTH):
+    """Mask of the circular shifts more than ``max_lag + block`` days away
+    from the real alignment."""
+    shift = np.arange(length)
+    return np.minimum(shift, length - shift) > max_lag + block
+
+
+def circular_null(values, x_idx, y_idx, max_lag, block=BLOCK_LENGTH):
+    """Null correlations of every pair, (shifts, pairs): r at every circular
+    shift at least ``max_lag + block`` days away from the real alignment."""
+    return circular_shifts(values, x_idx, y_idx)[far_shifts(len(values), max_lag, block)]
+
+
+def peak_null(shifts, max_lag, block=BLOCK_LENGTH):
+    """Null of the peak |r| over lags 0..max_lag, (windows, pairs).
+
+    ``shifts`` is r at every circular shift (..., T, pairs). For each shift s
+    whose whole window s..s + max_lag is far from the real alignment, the
+    replicate is the largest |r| over that window.
+    """
+    T = shifts.shape[-2]
+    window = (np.arange(T)[:, None] + np.arange(max_lag + 1)) % T        # (T, lags)
+    window = window[far_shifts(T, max_lag, block)[window].all(axis=1)]
+    return np.fmax.reduce(np.abs(shifts[..., window, :]), axis=-2)
+
+
+def permutation_pvalues(observed, null):
+    """Two-sided p-values of ``observed`` (lags, pairs) against ``null``
+    (shifts, pairs); (1 + #|null| >= |r|) / (1 + #null)."""
+    valid = ~np.isnan(null)
+    exceed = (np.abs(null)[None, :, :] >= np.abs(observed)[:, None, :] - 1e-12) & valid[None]
+    with np.errstate(invalid="ignore"):
+        p = (1 + exceed.sum(axis=1)) / (1 + valid.sum(axis=0))
+    p[np.isnan(observed)] = np.nan
+    return p
+
+
+# ---------------------------------------------------------------------------
+# Entry point
+# ---------------------------------------------------------------------------
+
+def significance(df, pairs, max_lag, n_boot=N_BOOT, block=BLOCK_LENGTH,
+                 confidence=CONFIDENCE, seed=SEED, workers=None):
+    """Confidence intervals and p-values for (x_col, y_col, label) pairs.
+
+    Returns ``(per_lag, peaks)``: ``per_lag`` has signal_pair, lag_days,
+    ci_low, ci_high, p_value_unadjusted; ``peaks`` has signal_pair,
+    peak_lag_low, peak_lag_high (bootstrap range of the lag with the largest
+    |r|) and peak_p_value (the largest |r| over lags 0..max_lag against
+    ``peak_null``).
+    """
+    columns = list(dict.fromkeys(c for x, y, _ in pairs for c in (x, y)))
+    values = df[columns].to_numpy(dtype=np.float64)
+    x_idx = np.array([columns.index(x) for x, _, _ in pairs])
+    y_idx = np.array([columns.index(y) for _, y, _ in pairs])
+
+    terms = aligned_terms(values, x_idx, y_idx, max_lag)
+    observed = pearson_from_sums(terms.sum(axis=0))
+    boot = bootstrap(terms, n_boot, block, seed, workers)
+    alpha = (1 - confidence) / 2
+    low, high = np.nanquantile(boot, [alpha, 1 - alpha], axis=0)
+    shifts = circular_shifts(values, x_idx, y_idx)
+    p = permutation_pvalues(observed, shifts[far_shifts(len(values), max_lag, block)])
+    peak_p = permutation_pvalues(np.fmax.reduce(np.abs(observed), axis=0)[None],
+                                 peak_null(shifts, max_lag, block))[0]
+
+    rows = []
+    for j, (_, _, label) in enumerate(pairs):
+        for lag in range(max_lag + 1):
+            rows.append({"signal_pair": label, "lag_days": lag,
+                         "ci_low": round(float(low[lag, j]), 6),
+                         "ci_high": round(float(high[lag, j]), 6),
+                         "p_value_unadjusted": round(float(p[lag, j]), 4)})
+
+    peak_lags = np.nanargmax(np.abs(np.nan_to_num(boot, nan=0.0)), axis=1)
+    peak_low, peak_high = np.quantile(peak_lags, [alpha, 1 - alpha], axis=0,
+                                      method="inverted_cdf")
+    peaks = pd.DataFrame({"signal_pair": [label for _, _, label in pairs],
+                          "peak_lag_low": peak_low.astype(int),
+                          "peak_lag_high": peak_high.astype(int),
+                          "peak_p_value": peak_p.round(4)})
+    return pd.DataFrame(rows), peaks
+
+
+def main():
+    from analysis.lag_analysis import OUTPUT, MAX_LAG, SIGNAL_PAIRS, _read
+
+    print("=" * 80)
+    print("LAGGED CORRELATION SIGNIFICANCE")
+    print("=" * 80)
+    summary = _read(OUTPUT / "cross_channel_daily.csv")
+    start = time.perf_counter()
+    per_lag, peaks = significance(summary, SIGNAL_PAIRS, MAX_LAG)
+    print(f"{N_BOOT} bootstrap replicates x {len(SIGNAL_PAIRS)} pairs x {MAX_LAG + 1} lags "
+          f"in {time.perf_counter() - start:.2f}s\n")
+    print(per_lag[per_lag["lag_days"].isin([0, 7, 14])].to_string(index=False))
+    print()
+    print(peaks.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
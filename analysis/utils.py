@@ -2,6 +2,8 @@
 
 import pandas as pd
 
+from analysis.deseasonalize import decompose
+
 
 def add_residual_columns(df, cols, window=14):
     """Add deseasonalized residual columns by subtracting a centered rolling mean.
@@ -15,10 +17,13 @@ def add_residual_columns(df, cols, window=14):
     Simple subtraction is used because percent change introduces
     division-by-zero errors on sparse signals like podcast_impressions.
     Pearson correlation is scale-invariant, so absolute residuals are
-    appropriate.
+    appropriate. All columns are decomposed in one pass
+    (``analysis.deseasonalize``, method ``moving_average``), and repeated
+    calls on the same signals within one process reuse the cached
+    decomposition.
     """
-    df = df.sort_values("date").copy()
-    for col in cols:
-        trend = df[col].rolling(window, center=True, min_periods=window).mean()
-        df[f"{col}__resid"] = df[col] - trend
-    return df
+    df = df.sort_values("date")
+    _, _, resid = decompose(df[cols].to_numpy(dtype="float64"), df["date"],
+                            "moving_average", window)
+    resid = pd.DataFrame(resid, index=df.index, columns=[f"{col}__resid" for col in cols])
+    return pd.concat([df, resid], axis=1)
@@ -0,0 +1,143 @@
+"""Embedded SQL access to the warehouse (DuckDB).
+
+Every table in ``src.validation.contracts.CONTRACTS`` that exists on disk is
+registered as a view over its stored CSV, so analysis code can aggregate
+facts with SQL instead of loading whole fact tables into pandas first. Only
+the aggregated result crosses into pandas.
+
+The engine runs with DuckDB's default (all-core) thread count, so scan
+order is not fixed. Aggregates are written to be order-independent instead:
+float sums use the compensated ``fsum`` and "first value" aggregates order
+their input explicitly, so results match the pandas groupby path on any
+number of threads.
+
+Run:     python -m analysis.warehouse_db     (benchmark SQL vs pandas)
+"""
+
+import pathlib
+import time
+
+import duckdb
+import pandas as pd
+
+from src.validation.contracts import CONTRACTS
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[1]
+WAREHOUSE = PROJECT_ROOT / "data_warehouse"
+
+BENCHMARK_REPEAT = 5
+RTOL = 1e-12    # float sums may differ from pandas in the last bit
+
+
+def view_sql(con, table, path):
+    """CREATE VIEW statement reading ``path`` with a pinned schema.
+
+    The schema is sniffed once over the whole file (so column types follow
+    the data, as with ``pd.read_csv``) and written into the view; otherwise
+    DuckDB would re-sniff the CSV every time the view is bound.
+    """
+    sniffed = con.execute("SELECT Columns FROM sniff_csv(?, sample_size = -1)",
+                          [path.as_posix()]).fetchone()[0]
+    columns = ", ".join(f"'{c['name']}': '{c['type']}'" for c in sniffed)
+    return (f"CREATE VIEW {table} AS SELECT * FROM read_csv('{path.as_posix()}', "
+            f"header = true, auto_detect = false, columns = {{{columns}}})")
+
+
+def connect(warehouse=WAREHOUSE):
+    """In-memory DuckDB connection with one view per stored warehouse table."""
+    con = duckdb.connect()
+    for table, spec in CONTRACTS.items():
+        path = pathlib.Path(warehouse) / spec["path"]
+        if path.exists():
+            con.execute(view_sql(con, table, path))
+    return con
+
+
+def tables(con):
+    """Names of the registered views."""
+    return [r[0] for r in con.execute(
+        "SELECT view_name FROM duckdb_views() WHERE NOT internal ORDER BY view_name"
+    ).fetchall()]
+
+
+def column_types(con, table):
+    """Column name -> DuckDB type of a registered view."""
+    return dict(con.execute(
+        f"SELECT column_name, column_type FROM (DESCRIBE {table})").fetchall())
+
+
+def sum_expr(column, col_type):
+    """SUM of ``column`` typed like the pandas groupby sum: floats use the
+    compensated ``fsum`` (totals agree with pandas to the last bit or one
+    ulp), integers are narrowed from HUGEINT back to BIGINT."""
+    if col_type in ("DOUBLE", "FLOAT") or col_type.startswith("DECIMAL"):
+        return f"fsum({column})"
+    return f"sum({column})::BIGINT"
+
+
+def query(sql, con=None, params=None):
+    """Run ``sql`` and return the result as a DataFrame."""
+    con = con or connect()
+    return con.execute(sql, params or []).df()
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def _best_of(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        times.append(time.perf_counter() - start)
+    return min(times), out
+
+
+def benchmark(repeat=BENCHMARK_REPEAT, con=None):
+    """Time the SQL and pandas paths of the cross-channel summary and the
+    chart aggregations; each pair must return identical frames. Both paths
+    read the CSVs on every call; the SQL views are registered once."""
+    from analysis import cross_channel_summary as ccs
+    from analysis import generate_charts as gc
+
+    con = con or connect()
+    cases = {
+        "cross_channel_daily": (lambda: ccs.summarize_sql(con), ccs.summarize_pandas),
+        "paid_spend_by_platform": (
+            lambda: gc.daily_by("fact_paid_social_daily", "channel", "spend", con),
+            lambda: gc.daily_by_pandas("fact_paid_social_daily", "channel", "spend")),
+        "web_sessions_by_source": (
+            lambda: gc.daily_by("fact_web_analytics_daily", "traffic_source", "sessions",
+                                con),
+            lambda: gc.daily_by_pandas("fact_web_analytics_daily", "traffic_source",
+                                       "sessions")),
+    }
+    rows = []
+    for name, (sql_fn, pandas_fn) in cases.items():
+        sql_s, sql_out = _best_of(sql_fn, repeat)
+        pd_s, pd_out = _best_of(pandas_fn, repeat)
+        pd.testing.assert_frame_equal(sql_out, pd_out, check_dtype=False,
+                                      check_exact=False, rtol=RTOL)
+        rows.append({"case": name, "rows_out": len(sql_out),
+                     "sql_seconds": round(sql_s, 4), "pandas_seconds": round(pd_s, 4),
+                     "speedup": round(pd_s / sql_s, 2)})
+    return pd.DataFrame(rows)
+
+
+def main():
+    print("=" * 80)
+    print("WAREHOUSE SQL LAYER")
+    print("=" * 80)
+    start = time.perf_counter()
+    con = connect()
+    print(f"Registered views in {time.perf_counter() - start:.2f}s")
+    for table in tables(con):
+        n = con.execute(f"SELECT count(*) FROM {table}").fetchone()[0]
+        print(f"  {table:<32} {n:>8,} rows")
+    print(f"\nBenchmark (best of {BENCHMARK_REPEAT}, outputs checked equal):")
+    print(benchmark(con=con).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""
+Integer-coded raw sources for key and dependency discovery.
+
+Each raw file is read once as text, with pandas' default missing-value
+markers (so an empty cell and a literal ``None`` are the same NULL, as they
+are in the transforms), and every column is replaced by dense int32 codes
+from ``pd.factorize``. NULLs — including columns a schema-drift file does
+not have — get their own code, so a NULL compares equal to another NULL.
+
+A coded source is a plain dict::
+
+    {"name": ..., "files": [...], "rows": n,
+     "columns": [...], "codes": {col: int32 array}, "cards": {col: distinct}}
+
+Run:     python -m src.exploration.coded_sources
+"""
+
+import os
+from collections import OrderedDict
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
+
+# Raw datastreams. ``measures`` are the additive metric columns; key and
+# dependency searches run over the remaining (attribute) columns by default.
+SOURCES = {
+    "paid_social": {
+        "files": [
+            "sBelles_paid_instagram_part1.csv",
+            "sBelles_paid_instagram_part2.csv",
+            "sBelles_paid_instagram_part3_schema_drift.csv",
+            "sBelles_paid_pinterest_part1_schema_drift.csv",
+            "sBelles_paid_pinterest_part2.csv",
+            "sBelles_paid_pinterest_part3.csv",
+            "sBelles_paid_tiktok_part1.csv",
+            "sBelles_paid_tiktok_part2_schema_drift.csv",
+            "sBelles_paid_tiktok_part3.csv",
+        ],
+        "measures": ["spend", "impressions", "clicks", "video_views", "video_25pct",
+                     "video_50pct", "video_75pct", "video_completes"],
+    },
+    "web_analytics": {
+        "files": [
+            "sBelles_web_traffic_2023_Q1_Q2.csv",
+            "sBelles_web_traffic_2023_Q3_Q4.csv",
+            "sBelles_web_traffic_2024_Q1.csv",
+            "sBelles_web_traffic_2024_Q2.csv",
+        ],
+        "measures": [],
+    },
+    "ecommerce": {
+        "files": [
+            "sBelles_transactions_2023_Q1_Q2.csv",
+            "sBelles_transactions_2023_Q3_Q4.csv",
+            "sBelles_transactions_2024_Q1_Q2.csv",
+        ],
+        "measures": ["quantity", "unit_price", "unit_cost", "discount_per_unit",
+                     "line_revenue"],
+    },
+    "organic_social": {
+        "files": [
+            "sBelles_tiktok_owned_2023.csv",
+            "sBelles_tiktok_owned_2024.csv",
+        ],
+        "measures": ["followers", "impressions", "video_views", "video_completes",
+                     "likes", "comments", "shares", "clicks", "saves"],
+    },
+    "podcast": {
+        "files": [
+            "sBelles_podcast_mentions_2023_2024_part1.csv",
+            "sBelles_podcast_mentions_2023_2024_part2.csv",
+        ],
+        "measures": ["estimated_impressions", "episode_rating"],
+    },
+    "ooh": {
+        "files": ["sBelles_ooh_airport_weekly.csv"],
+        "measures": ["spend", "impressions", "placements"],
+    },
+}
+
+# Schema-drift renames, matching transform_paid_social.
+COLUMN_ALIASES = {
+    "spend_usd": "spend",
+    "link_clicks": "clicks",
+    "views": "video_views",
+}
+
+
+@lru_cache(maxsize=None)
+def read_raw(filename):
+    """Raw file as text columns with standardized, de-drifted column names."""
+    df = pd.read_csv(os.path.join(DATA, filename), dtype=str)
+    df.columns = df.columns.str.strip().str.lower()
+    return df.rename(columns=COLUMN_ALIASES)
+
+
+def encode(df, name, files=()):
+    """Integer-code every column of ``df``."""
+    codes, cards = {}, {}
+    for col in df.columns:
+        c, uniques = pd.factorize(df[col], use_na_sentinel=False)
+        codes[col] = c.astype(np.int32)
+        cards[col] = len(uniques)
+    return {"name": name, "files": list(files), "rows": len(df),
+            "columns": list(df.columns), "codes": codes, "cards": cards}
+
+
+def load_file(filename):
+    """One raw file, coded."""
+    return encode(read_raw(filename), filename, [filename])
+
+
+def load_stream(stream):
+    """All files of a datastream unioned (columns missing from a file are
+    NULL for its rows), coded."""
+    files = SOURCES[stream]["files"]
+    df = pd.concat([read_raw(f) for f in files], ignore_index=True)
+    return encode(df, stream, files)
+
+
+def select(coded, mask):
+    """Coded source restricted to the rows in ``mask`` (codes stay valid;
+    ``cards`` become upper bounds)."""
+    out = dict(coded, codes={c: v[mask] for c, v in coded["codes"].items()})
+    out["rows"] = int(np.count_nonzero(mask))
+    return out
+
+
+def attribute_columns(coded, stream=None):
+    """Non-measure columns of a coded source."""
+    measures = set(SOURCES[stream]["measures"]) if stream else set()
+    return [c for c in coded["columns"] if c not in measures]
+
+
+def combine(codes_a, codes_b, card_b):
+    """Partition codes of the column pair (a, b): dense int32 codes plus the
+    number of distinct combinations."""
+    joint = codes_a.astype(np.int64) * card_b + codes_b
+    c, uniques = pd.factorize(joint)
+    return c.astype(np.int32), len(uniques)
+
+
+# ---------------------------------------------------------------------------
+# Stripped partitions
+# ---------------------------------------------------------------------------
+# A partition of the rows by a column set is kept "stripped": only rows in
+# groups of two or more are stored, as (row indices, group codes, groups).
+# A row that is alone in its group stays alone under any finer partition, so
+# refinements only ever touch the shrinking set of still-duplicated rows.
+# ``duplicates(part)`` is the number of rows beyond the first in each group —
+# zero means the column set is a unique key.
+
+DENSE_MIN = 1 << 16     # code spaces up to max(this, 2 x rows) use bincount
+
+
+def _strip(rows, joint, space):
+    """Keep rows whose joint code occurs more than once; relabel densely."""
+    if space <= max(DENSE_MIN, 2 * len(joint)):
+        counts = np.bincount(joint, minlength=space)
+    else:
+        joint, uniques = pd.factorize(joint)
+        counts = np.bincount(joint, minlength=len(uniques))
+    multi = counts > 1
+    keep = multi[joint]
+    relabel = np.cumsum(multi, dtype=np.int32) - 1
+    return rows[keep], relabel[joint[keep]], int(multi.sum())
+
+
+def partition(coded, col):
+    """Stripped partition of a single column."""
+    rows = np.arange(coded["rows"], dtype=np.int32)
+    return _strip(rows, coded["codes"][col], coded["cards"][col])
+
+
+def refine(part, coded, col):
+    """Stripped partition of (part's columns + ``col``)."""
+    rows, codes, groups = part
+    card = coded["cards"][col]
+    space = groups * card
+    dtype = np.int32 if space < 2 ** 31 else np.int64
+    joint = codes.astype(dtype) * card + coded["codes"][col][rows]
+    return _strip(rows, joint, space)
+
+
+def duplicates(part):
+    """Rows beyond the first in each group of a stripped partition."""
+    return len(part[0]) - part[2]
+
+
+CACHE_BYTES = 512 * 1024 * 1024
+
+
+def partition_cache(coded, cols, max_bytes=CACHE_BYTES):
+    """``get(subset)`` -> stripped partition of the columns ``cols[i] for i in
+    subset`` (a sorted index tuple).
+
+    Partitions are built by refining the partition of ``subset[:-1]``, which
+    is looked up (recursively) in a least-recently-used cache bounded to
+    ``max_bytes``; single-column partitions are always kept. Visiting subsets
+    in sorted order keeps the prefixes a search needs next in the cache, so
+    each new subset costs one refinement while memory stays bounded on
+    million-row sources.
+    """
+    singles = {(i,): partition(coded, c) for i, c in enumerate(cols)}
+    cache = OrderedDict()
+    used = [0]
+
+    def get(subset):
+        if len(subset) == 1:
+            return singles[subset]
+        if subset in cache:
+            cache.move_to_end(subset)
+            return cache[subset]
+        part = refine(get(subset[:-1]), coded, cols[subset[-1]])
+        cache[subset] = part
+        used[0] += part[0].nbytes + part[1].nbytes
+        while used[0] > max_bytes and len(cache) > 1:
+            _, old = cache.popitem(last=False)
+            used[0] -= old[0].nbytes + old[1].nbytes
+        return part
+
+    return get
+
+
+def main():
+    print("=" * 80)
+    print("CODED RAW SOURCES")
+    print("=" * 80)
+    for stream in SOURCES:
+        coded = load_stream(stream)
+        print(f"\n{stream}: {coded['rows']:,} rows, {len(coded['columns'])} columns")
+        for col in coded["columns"]:
+            print(f"  {col:<24} {coded['cards'][col]:>8,} distinct")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Functional dependency discovery across the raw sources.
+
+Generalizes the one-at-a-time checks in ``schema_design_investigation``
+(DMA -> state, airport_code -> airport_name, campaign_id -> campaign_name)
+to every column pair and triple of every source. Columns are integer-coded
+once (``coded_sources``); for each determinant X the stripped partition of X
+is built by refinement, and X -> A is scored with the g3 measure: the
+fraction of rows that would have to be removed for X -> A to hold exactly
+(0 = exact FD). Only rows in non-singleton X groups can violate, so the
+score is computed from the stripped partition alone.
+
+The search is level-wise over determinants of up to ``MAX_LHS`` columns,
+reporting only minimal FDs (no subset of X already determines A within the
+error bound). Determinants that are (almost) unique are skipped: a column set
+with nearly one row per value determines everything trivially and is a key,
+not a dimension — see ``key_discovery``.
+
+Runs on every stream (files unioned, each FD then re-checked per file) and on
+cross-stream unions of shared columns, and reports which columns are
+dimension attributes that can move out of the facts.
+
+Outputs: docs/functional_dependencies.md
+Run:     python -m src.exploration.fd_discovery
+"""
+
+import os
+import time
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from src.exploration.coded_sources import (
+    SOURCES, read_raw, encode, load_file, load_stream, attribute_columns,
+    partition_cache, duplicates,
+)
+
+DOC_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "docs",
+                        "functional_dependencies.md")
+
+MAX_LHS = 2
+MAX_ERROR = 0.05          # approximate FD: g3 <= 5% of rows
+MAX_LHS_GROUP_RATIO = 0.5  # determinants need >= 2 rows per value on average
+
+# Columns shared by several streams, checked on the union of the files that
+# have all of them (paid social has no zip_code, so it only joins "dma").
+UNIONS = {
+    "geography": {
+        "streams": ["paid_social", "web_analytics", "ecommerce"],
+        "columns": ["dma_name", "state", "zip_code"],
+    },
+    "dma": {
+        "streams": ["paid_social", "web_analytics", "ecommerce"],
+        "columns": ["dma_name", "state"],
+    },
+}
+
+
+# ---------------------------------------------------------------------------
+# Scoring
+# ---------------------------------------------------------------------------
+
+def g3(part, coded, col):
+    """(g3 error, violating determinant values) of X -> ``col``, where
+    ``part`` is the stripped partition of X."""
+    rows, codes, groups = part
+    if not len(rows):
+        return 0.0, 0
+    card = coded["cards"][col]
+    joint = codes.astype(np.int64) * card + coded["codes"][col][rows]
+    pairs, uniques = pd.factorize(joint)
+    counts = np.bincount(pairs, minlength=len(uniques))
+    group = uniques // card
+    best = np.zeros(groups, dtype=np.int64)
+    np.maximum.at(best, group, counts)
+    distinct = np.bincount(group, minlength=groups)
+    removed = len(rows) - int(best.sum())
+    return removed / coded["rows"], int((distinct > 1).sum())
+
+
+# ---------------------------------------------------------------------------
+# Search
+# ---------------------------------------------------------------------------
+
+def discover_fds(coded, lhs_cols=None, rhs_cols=None, max_lhs=MAX_LHS,
+                 max_error=MAX_ERROR):
+    """Minimal exact and approximate FDs of a coded source.
+
+    Returns a dict with ``fds`` (list of dicts: lhs, rhs, error, violations,
+    lhs_groups), ``constants`` (single-valued columns, excluded from the
+    search), ``rows``, ``columns``, ``checked`` and ``seconds``.
+    """
+    start = time.perf_counter()
+    n = coded["rows"]
+    lhs_cols = list(lhs_cols or coded["columns"])
+    rhs_cols = list(rhs_cols or coded["columns"])
+    constants = [c for c in coded["columns"] if coded["cards"][c] <= 1]
+    lhs_cols = [c for c in lhs_cols if c not in constants]
+    rhs_cols = [c for c in rhs_cols if c not in constants]
+
+    part_of = partition_cache(coded, lhs_cols)
+    found = {}   # rhs -> determinants (index tuples) already within the bound
+    fds, checked = [], 0
+    for size in range(1, max_lhs + 1):
+        for lhs in combinations(range(len(lhs_cols)), size):
+            part = part_of(lhs)
+            groups = n - duplicates(part)
+            if groups > n * MAX_LHS_GROUP_RATIO:
+                continue
+            names = [lhs_cols[i] for i in lhs]
+            for rhs in rhs_cols:
+                if rhs in names:
+                    continue
+                if any(set(sub) <= set(lhs) for sub in found.get(rhs, ())):
+                    continue
+                checked += 1
+                error, violations = g3(part, coded, rhs)
+                if error <= max_error:
+                    found.setdefault(rhs, []).append(lhs)
+                    fds.append({"lhs": tuple(names), "rhs": rhs, "error": error,
+                                "violations": violations, "lhs_groups": groups})
+    return {"rows": n, "columns": coded["columns"], "fds": fds, "constants": constants,
+            "checked": checked, "seconds": time.perf_counter() - start}
+
+
+def load_union(name):
+    """Coded union of the shared columns over the files that have them all."""
+    spec = UNIONS[name]
+    files = [f for stream in spec["streams"] for f in SOURCES[stream]["files"]
+             if set(spec["columns"]) <= set(read_raw(f).columns)]
+    frames = [read_raw(f)[spec["columns"]] for f in files]
+    return encode(pd.concat(frames, ignore_index=True), name, files)
+
+
+def fd_error(coded, lhs, rhs):
+    """g3 error of one FD ``lhs -> rhs`` in a coded source."""
+    part = partition_cache(coded, list(lhs))(tuple(range(len(lhs))))
+    return g3(part, coded, rhs)[0]
+
+
+def discover_stream(stream, **kwargs):
+    """FDs of a whole datastream (attribute determinants, any dependent),
+    each re-scored on the individual files that have its columns
+    (``files_exact`` = (files where it is exact, files checked))."""
+    union = load_stream(stream)
+    result = discover_fds(union, attribute_columns(union, stream), **kwargs)
+    result["files"] = SOURCES[stream]["files"]
+    coded_files = [load_file(f) for f in result["files"]]
+    for fd in result["fds"]:
+        cols = set(fd["lhs"]) | {fd["rhs"]}
+        errors = [fd_error(c, fd["lhs"], fd["rhs"]) for c in coded_files
+                  if cols <= set(c["columns"])]
+        fd["files_exact"] = (sum(e == 0 for e in errors), len(errors))
+    return result
+
+
+def discover_all(**kwargs):
+    results = {stream: discover_stream(stream, **kwargs) for stream in SOURCES}
+    for name in UNIONS:
+        res = discover_fds(load_union(name), **kwargs)
+        res["files"] = []
+        results[name] = res
+    return results
+
+
+def holds(results, source, lhs, rhs):
+    """g3 error of ``lhs -> rhs`` in ``source`` via a reported minimal FD
+    (0 for a constant ``rhs``; None when not found within the error bound)."""
+    lhs = tuple(lhs) if not isinstance(lhs, str) else (lhs,)
+    if rhs in results[source]["constants"]:
+        return 0.0
+    for fd in results[source]["fds"]:
+        if fd["rhs"] == rhs and set(fd["lhs"]) <= set(lhs):
+            return fd["error"]
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Report
+# ---------------------------------------------------------------------------
+
+def dimension_candidates(res):
+    """Exact FDs grouped by determinant: determinant -> determined columns."""
+    dims = {}
+    for fd in res["fds"]:
+        if fd["error"] == 0:
+            dims.setdefault(fd["lhs"], []).append(fd["rhs"])
+    return dims
+
+
+def _fmt(cols):
+    return ", ".join(f"`{c}`" for c in cols)
+
+
+def render_markdown(results):
+    lines = [
+        "# Functional Dependencies — Raw Sources",
+        "",
+        "*Generated by `python -m src.exploration.fd_discovery`*",
+        "",
+        "Every raw source is integer-coded once and each determinant X (up to "
+        f"{MAX_LHS} attribute columns) is partitioned by refinement. X → A is "
+        "scored with g3, the share of rows that would have to be removed for the "
+        f"dependency to hold: 0 is an exact FD, ≤ {MAX_ERROR:.0%} is reported as "
+        "approximate. Only minimal FDs are listed, determinants with fewer than "
+        f"{1 / MAX_LHS_GROUP_RATIO:.0f} rows per value on average are skipped (they "
+        "are keys, see `docs/grain_analysis.md` section 4), and single-valued "
+        "columns are listed as constants.",
+        "",
+        "---",
+        "",
+        "## 1. Candidate Dimension Attributes",
+        "",
+        "Columns exactly determined by a repeating determinant are denormalized "
+        "in the source: they can live on a dimension keyed by the determinant and "
+        "be dropped from the fact.",
+        "",
+        "| Source | Determinant | Determined columns | Rows per value |",
+        "|---|---|---|---:|",
+    ]
+    for source, res in results.items():
+        groups = {fd["lhs"]: fd["lhs_groups"] for fd in res["fds"]}
+        for lhs, rhs in sorted(dimension_candidates(res).items(),
+                               key=lambda x: (len(x[0]), -len(x[1]), x[0])):
+            lines.append(f"| {source} | {_fmt(lhs)} | {_fmt(rhs)} "
+                         f"| {res['rows'] / groups[lhs]:,.1f} |")
+    lines += ["", "---", ""]
+
+    for i, (source, res) in enumerate(results.items(), start=2):
+        files = res["files"]
+        scope = (f"{len(files)} file{'s' if len(files) != 1 else ''}" if files
+                 else "cross-stream union of " + _fmt(UNIONS[source]["columns"]))
+        lines += [f"## {i}. {source} ({scope}, {res['rows']:,} rows)", ""]
+        if res["constants"]:
+            lines += [f"Constant columns: {_fmt(res['constants'])}.", ""]
+        exact = sum(fd["error"] == 0 for fd in res["fds"])
+        lines += [f"{exact} exact and {len(res['fds']) - exact} approximate minimal FDs "
+                  f"({res['checked']:,} candidates scored).", ""]
+        if res["fds"]:
+            header = "| FD | g3 | Violating determinant values |"
+            sep = "|---|---:|---:|"
+            if files:
+                header += " Exact in files |"
+                sep += "---:|"
+            lines += [header, sep]
+            for fd in sorted(res["fds"], key=lambda f: (f["error"], f["lhs"], f["rhs"])):
+                row = (f"| {_fmt(fd['lhs'])} → `{fd['rhs']}` | {fd['error']:.2%} "
+                       f"| {fd['violations']:,} |")
+                if files:
+                    row += " {}/{} |".format(*fd["files_exact"])
+                lines.append(row)
+            lines.append("")
+    return "\n".join(lines).rstrip() + "\n"
+
+
+def print_results(results):
+    for source, res in results.items():
+        print(f"\n{source}: {res['rows']:,} rows, {res['checked']:,} candidates, "
+              f"{res['seconds']:.2f}s")
+        if res["constants"]:
+            print(f"  constants: {res['constants']}")
+        for fd in res["fds"]:
+            tag = "EXACT " if fd["error"] == 0 else f"{fd['error']:6.2%}"
+            print(f"  {tag} {fd['lhs']} -> {fd['rhs']}")
+
+
+def main():
+    print("=" * 80)
+    print("FUNCTIONAL DEPENDENCY DISCOVERY")
+    print("=" * 80)
+    results = discover_all()
+    print_results(results)
+    with open(DOC_PATH, "w", encoding="utf-8") as f:
+        f.write(render_markdown(results))
+    print(f"\nWrote {os.path.normpath(DOC_PATH)}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
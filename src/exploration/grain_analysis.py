@@ -2,7 +2,8 @@
 Grain Analysis & Metric Feasibility — Pre-schema design investigation.
 
 Determines natural grain (unique key) for each data stream, verifies metric
-formulas, checks date spine coverage, and flags data quality issues.
+formulas, checks date spine coverage, and flags data quality issues. Section 4
+(minimal unique keys found by search) comes from ``key_discovery``.
 
 Outputs: docs/grain_analysis.md
 Run:     python -m src.exploration.grain_analysis
@@ -14,6 +15,9 @@ import random
 import statistics
 from collections import defaultdict, Counter
 from datetime import date, timedelta
+from functools import lru_cache
+
+from src.exploration import key_discovery
 
 DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
 
@@ -55,6 +59,7 @@ PODCAST_FILES = [
 OOH_FILE = "sBelles_ooh_airport_weekly.csv"
 
 
+@lru_cache(maxsize=None)
 def read_csv(filename):
     path = os.path.join(DATA, filename)
     with open(path, newline="", encoding="utf-8") as f:
@@ -631,6 +636,9 @@ def main():
     # Section 3: Date spine
     check_date_spine()
 
+    # Section 4: Automatic key discovery (rewrites its section of the doc)
+    key_discovery.main()
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,254 @@
+"""
+Automatic minimal unique-key discovery for the raw sources.
+
+Replaces the hand-written candidate-key lists in ``grain_analysis`` with a
+level-wise search over integer-coded columns (see ``coded_sources``):
+
+1. level 1 is every attribute column on its own;
+2. a subset whose partition has as many groups as the source has rows is a
+   unique key — it is recorded and never extended, so no superset of a
+   unique key is ever evaluated;
+3. a subset is only partitioned when the product of its prefix's group
+   count and the new column's cardinality leaves room for it to be a key or
+   near-key — coarse combinations are bounded away without touching rows;
+4. level k+1 candidates join two non-unique level-k subsets that share their
+   first k-1 columns (Apriori-style), and are kept only if every k-subset is
+   non-unique; each candidate's partition is its prefix's stripped partition
+   refined by one column, so only rows that are still duplicated are touched
+   (``coded_sources.partition_cache`` keeps the prefixes in bounded memory).
+
+Non-unique subsets with few duplicate rows are reported as near-keys, again
+only the minimal ones. Results for each stream (all files unioned) and each
+file are written into the key-discovery section of docs/grain_analysis.md.
+
+Outputs: docs/grain_analysis.md (section 4)
+Run:     python -m src.exploration.key_discovery
+"""
+
+import os
+import time
+from itertools import combinations
+
+import pandas as pd
+
+from src.exploration.coded_sources import (
+    SOURCES, load_file, load_stream, attribute_columns, combine, select,
+    partition_cache, duplicates,
+)
+
+DOC_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "docs", "grain_analysis.md")
+DOC_START = "<!-- key-discovery:start -->"
+DOC_END = "<!-- key-discovery:end -->"
+DOC_BEFORE = "## Data Quality Issues Summary"
+
+MAX_KEY_SIZE = 5
+NEAR_KEY_RATIO = 0.10   # near-key: non-unique with duplicate rows <= 10% of rows
+MAX_NEAR_KEYS = 5
+
+
+# ---------------------------------------------------------------------------
+# Search
+# ---------------------------------------------------------------------------
+
+def first_occurrences(coded):
+    """Mask of rows that do not repeat an earlier row on every column."""
+    cols = coded["columns"]
+    codes, groups = coded["codes"][cols[0]], coded["cards"][cols[0]]
+    for col in cols[1:]:
+        codes, groups = combine(codes, coded["codes"][col], coded["cards"][col])
+    return ~pd.Series(codes).duplicated().to_numpy()
+
+
+def _next_level(prev):
+    """Apriori candidate generation over sorted column-index tuples."""
+    by_prefix = {}
+    for subset in sorted(prev):
+        by_prefix.setdefault(subset[:-1], []).append(subset)
+    for group in by_prefix.values():
+        for a, b in combinations(group, 2):
+            cand = a + (b[-1],)
+            if all(cand[:i] + cand[i + 1:] in prev for i in range(len(cand))):
+                yield cand
+
+
+def discover_keys(coded, columns=None, max_size=MAX_KEY_SIZE,
+                  near_ratio=NEAR_KEY_RATIO):
+    """Minimal unique keys and minimal near-keys of a coded source.
+
+    Returns a dict with ``unique`` (list of column tuples), ``near`` (list of
+    (column tuple, duplicate rows)), ``evaluated`` subset count, ``rows``,
+    ``exact_duplicates`` and ``seconds``. Rows that repeat another row on
+    every column are set aside first (the ETL drops them), so keys and
+    duplicate counts describe the distinct rows.
+    """
+    start = time.perf_counter()
+    cols = list(columns or coded["columns"])
+    keep = first_occurrences(coded)
+    exact_dups = int((~keep).sum())
+    if exact_dups:
+        coded = select(coded, keep)
+    near_limit = int(coded["rows"] * near_ratio)
+
+    # Finest columns first: a candidate's prefix is then its most refined
+    # parent, and coarse-only combinations come last.
+    order = sorted(range(len(cols)), key=lambda i: -coded["cards"][cols[i]])
+    search_cols = [cols[i] for i in order]
+    n = coded["rows"]
+    part_of = partition_cache(coded, search_cols)
+    level = [(i,) for i in range(len(cols))]
+    groups = {}   # subset -> exact group count, or an upper bound if skipped
+    unique, near, near_all = [], [], set()
+    evaluated = 0
+    for size in range(1, max_size + 1):
+        evaluated += len(level)
+        open_sets = set()
+        for subset in level:
+            card = coded["cards"][search_cols[subset[-1]]]
+            bound = card if size == 1 else min(n, groups[subset[:-1]] * card)
+            if n - bound > near_limit:
+                groups[subset] = bound     # too coarse to be a key or near-key
+                open_sets.add(subset)
+                continue
+            dups = duplicates(part_of(subset))
+            groups[subset] = n - dups
+            if dups == 0:
+                unique.append(subset)
+                continue
+            if dups <= near_limit:
+                near_all.add(subset)
+                if size == 1 or not any(subset[:i] + subset[i + 1:] in near_all
+                                        for i in range(size)):
+                    near.append((subset, dups))
+            open_sets.add(subset)
+        if size == max_size or not open_sets:
+            break
+        level = sorted(_next_level(open_sets))
+
+    names = lambda subset: tuple(sorted((search_cols[i] for i in subset),  # noqa: E731
+                                        key=cols.index))
+    return {
+        "rows": coded["rows"] + exact_dups,
+        "unique": [names(s) for s in unique],
+        "near": sorted(((names(s), d) for s, d in near), key=lambda x: (x[1], len(x[0]))),
+        "evaluated": evaluated,
+        "exact_duplicates": exact_dups,
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def discover_stream(stream, **kwargs):
+    """Key discovery on a whole datastream and on each of its files."""
+    union = load_stream(stream)
+    result = discover_keys(union, attribute_columns(union, stream), **kwargs)
+    result["files"] = {}
+    for f in SOURCES[stream]["files"]:
+        coded = load_file(f)
+        result["files"][f] = discover_keys(coded, attribute_columns(coded, stream), **kwargs)
+    return result
+
+
+def discover_all(**kwargs):
+    return {stream: discover_stream(stream, **kwargs) for stream in SOURCES}
+
+
+# ---------------------------------------------------------------------------
+# Report
+# ---------------------------------------------------------------------------
+
+def _fmt_key(key):
+    return "`(" + ", ".join(key) + ")`"
+
+
+def render_markdown(results):
+    """Markdown body of the key-discovery section."""
+    lines = [
+        "## 4. Automatic Key Discovery",
+        "",
+        "*Generated by `python -m src.exploration.key_discovery`.* Every raw "
+        "source is loaded once into integer-coded columns and column subsets are "
+        f"searched level by level (up to {MAX_KEY_SIZE} columns), never extending "
+        "a subset that is already unique. Measure columns are excluded. "
+        f"Near-keys are minimal non-unique subsets with at most "
+        f"{NEAR_KEY_RATIO:.0%} duplicate rows; *dup rows* counts rows beyond the "
+        "first for each repeated key value.",
+        "",
+    ]
+    for stream, res in results.items():
+        files = res["files"]
+        lines += [
+            f"### 4{chr(ord('a') + list(results).index(stream))}. {stream} "
+            f"({len(files)} file{'s' if len(files) > 1 else ''}, {res['rows']:,} rows)",
+            "",
+        ]
+        if res["exact_duplicates"]:
+            lines += [
+                f"**{res['exact_duplicates']:,} rows are exact duplicates of another "
+                "row** across the union. Keys below hold once those are dropped.",
+                "",
+            ]
+        lines += ["| Minimal unique key (all files unioned) | Columns |", "|---|---:|"]
+        for key in sorted(res["unique"], key=lambda k: (len(k), k))[:10]:
+            lines.append(f"| {_fmt_key(key)} | {len(key)} |")
+        if not res["unique"]:
+            lines.append(f"| *none up to {MAX_KEY_SIZE} columns* | — |")
+        if len(res["unique"]) > 10:
+            lines.append(f"| *… {len(res['unique']) - 10} more* | |")
+        lines.append("")
+        if res["near"]:
+            lines += ["| Near-key | Dup rows |", "|---|---:|"]
+            for key, dups in res["near"][:MAX_NEAR_KEYS]:
+                lines.append(f"| {_fmt_key(key)} | {dups:,} |")
+            lines.append("")
+        lines += ["| File | Rows | Smallest minimal keys | Subsets evaluated |",
+                  "|---|---:|---|---:|"]
+        for f, fr in files.items():
+            size = min((len(k) for k in fr["unique"]), default=None)
+            smallest = [k for k in fr["unique"] if len(k) == size]
+            keys = ", ".join(_fmt_key(k) for k in sorted(smallest)[:3]) or "*none*"
+            if len(smallest) > 3:
+                keys += f" (+{len(smallest) - 3})"
+            lines.append(f"| {f} | {fr['rows']:,} | {keys} | {fr['evaluated']:,} |")
+        lines += ["", f"Union search: {res['evaluated']:,} subsets evaluated.", ""]
+    return "\n".join(lines).rstrip() + "\n"
+
+
+def write_doc(results, path=DOC_PATH):
+    """Replace (or insert) the key-discovery section of docs/grain_analysis.md."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    section = f"{DOC_START}\n{render_markdown(results)}{DOC_END}\n"
+    if DOC_START in text:
+        head, rest = text.split(DOC_START, 1)
+        tail = rest.split(DOC_END, 1)[1].lstrip("\n")
+        text = head + section + "\n" + tail
+    else:
+        head, tail = text.split(DOC_BEFORE, 1)
+        text = head + section + "\n---\n\n" + DOC_BEFORE + tail
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def print_results(results):
+    for stream, res in results.items():
+        print(f"\n{stream}: {res['rows']:,} rows, {res['evaluated']:,} subsets, "
+              f"{res['seconds']:.2f}s")
+        if res["exact_duplicates"]:
+            print(f"  exact duplicate rows: {res['exact_duplicates']:,}")
+        for key in res["unique"]:
+            print(f"  UNIQUE {key}")
+        for key, dups in res["near"][:MAX_NEAR_KEYS]:
+            print(f"  NEAR   {key}: {dups:,} dup rows")
+
+
+def main():
+    print("=" * 80)
+    print("AUTOMATIC KEY DISCOVERY")
+    print("=" * 80)
+    results = discover_all()
+    print_results(results)
+    write_doc(results)
+    print(f"\nWrote {os.path.normpath(DOC_PATH)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,8 @@ Schema Design Investigation — Pre-schema profiling for S'Belles take-home.
 
 Analyzes DMA standardization, state standardization, airport-to-geography mapping,
 campaign linkage across paid social and web analytics, and podcast geography signals.
+Section 6 checks the relationships these sections rely on against the mined
+functional dependencies (``fd_discovery``).
 
 Outputs: docs/schema_design_notes.md
 Run:     python -m src.exploration.schema_design_investigation
@@ -10,9 +12,11 @@ Run:     python -m src.exploration.schema_design_investigation
 
 import csv
 import os
-import re
 from collections import defaultdict
 
+from src.exploration import fd_discovery
+from src.transforms.geo_matcher import MATCHER, find_terms, geo_inference
+
 DATA = os.path.join(os.path.dirname(__file__), "..", "..", "data")
 
 PAID_SOCIAL_FILES = [
@@ -60,38 +64,6 @@ def read_csv(filename):
         return list(csv.DictReader(f))
 
 
-# -- Geographic reference terms for podcast analysis --
-US_STATES = [
-    "Alabama", "Alaska", "Arizona", "Arkansas", "California", "Colorado",
-    "Connecticut", "Delaware", "Florida", "Georgia", "Hawaii", "Idaho",
-    "Illinois", "Indiana", "Iowa", "Kansas", "Kentucky", "Louisiana", "Maine",
-    "Maryland", "Massachusetts", "Michigan", "Minnesota", "Mississippi",
-    "Missouri", "Montana", "Nebraska", "Nevada", "New Hampshire", "New Jersey",
-    "New Mexico", "New York", "North Carolina", "North Dakota", "Ohio",
-    "Oklahoma", "Oregon", "Pennsylvania", "Rhode Island", "South Carolina",
-    "South Dakota", "Tennessee", "Texas", "Utah", "Vermont", "Virginia",
-    "Washington", "West Virginia", "Wisconsin", "Wyoming",
-]
-STATE_ABBREVS = [
-    "AL", "AK", "AZ", "AR", "CA", "CO", "CT", "DE", "FL", "GA", "HI", "ID",
-    "IL", "IN", "IA", "KS", "KY", "LA", "ME", "MD", "MA", "MI", "MN", "MS",
-    "MO", "MT", "NE", "NV", "NH", "NJ", "NM", "NY", "NC", "ND", "OH", "OK",
-    "OR", "PA", "RI", "SC", "SD", "TN", "TX", "UT", "VT", "VA", "WA", "WV",
-    "WI", "WY",
-]
-CITIES = [
-    "Atlanta", "ATL", "Nashville", "Charlotte", "Dallas", "Houston", "Miami",
-    "Tampa", "Raleigh", "Savannah", "Charleston", "Memphis", "Birmingham",
-    "Jacksonville", "New Orleans", "Austin", "San Antonio", "Richmond",
-    "Louisville", "Knoxville", "Chattanooga", "Greenville", "Columbia", "Macon",
-    "Augusta", "Athens",
-]
-REGIONAL = [
-    "Southern", "Peach State", "Dixie", "Deep South", "Magnolia", "Gulf Coast",
-    "Low Country", "Lowcountry", "Bible Belt", "Sun Belt", "Sunbelt",
-]
-
-
 def analyze_dma_standardization():
     """Section 1: DMA standardization across streams."""
     print("=" * 80)
@@ -318,6 +290,7 @@ def analyze_podcast_geography():
 
     podcast_names = set()
     podcast_founder_mentions = defaultdict(set)
+    podcast_texts = defaultdict(set)
 
     for f in PODCAST_FILES:
         rows = read_csv(f)
@@ -325,34 +298,22 @@ def analyze_podcast_geography():
             pn = r.get("podcast_name", "")
             if pn:
                 podcast_names.add(pn)
+                podcast_texts[pn].update([r.get("episode_title", ""),
+                                          r.get("transcript_snippet", "")])
                 if r.get("mentions_founder", "0") == "1":
                     podcast_founder_mentions[pn].add(r.get("episode_title", ""))
 
     print(f"\nUnique podcast names: {len(podcast_names)}")
 
+    # One gazetteer pass per name, title and snippet (states, abbreviations,
+    # cities, regional nicknames; word-bounded).
     geo_podcasts = {}
     non_geo_podcasts = []
+    inferred = {}
 
     for pn in sorted(podcast_names):
-        found_geo = []
-        pn_lower = pn.lower()
-        for s in US_STATES:
-            if s.lower() in pn_lower:
-                found_geo.append(f"state:{s}")
-        for c in CITIES:
-            if len(c) <= 3:
-                if re.search(r"\b" + re.escape(c) + r"\b", pn):
-                    found_geo.append(f"city:{c}")
-            else:
-                if c.lower() in pn_lower:
-                    found_geo.append(f"city:{c}")
-        for rt in REGIONAL:
-            if rt.lower() in pn_lower:
-                found_geo.append(f"regional:{rt}")
-        for sa in STATE_ABBREVS:
-            if re.search(r"\b" + re.escape(sa) + r"\b", pn):
-                found_geo.append(f"abbrev:{sa}")
-
+        found_geo = [f"{kind}:{term}" for term, kind, _, _ in find_terms(MATCHER, pn)]
+        inferred[pn] = geo_inference(pn, sorted(podcast_texts[pn]))
         if found_geo:
             geo_podcasts[pn] = found_geo
         else:
@@ -361,7 +322,8 @@ def analyze_podcast_geography():
     print("\nPodcasts WITH geographic references:")
     for pn, refs in sorted(geo_podcasts.items()):
         has_founder = "YES" if pn in podcast_founder_mentions else "NO"
-        print(f"  '{pn}' -> {refs} | founder: {has_founder}")
+        how, state = inferred[pn]
+        print(f"  '{pn}' -> {refs} | state: {state} ({how}) | founder: {has_founder}")
 
     print(f"\nPodcasts WITHOUT geographic references:")
     for pn in sorted(non_geo_podcasts):
@@ -375,12 +337,44 @@ def analyze_podcast_geography():
     print(f"Non-geo without founder mentions: {len(non_geo_without)}")
 
 
+# Relationships the schema design relies on: (source, determinant, dependent).
+EXPECTED_FDS = [
+    ("dma", "dma_name", "state"),
+    ("geography", "zip_code", "dma_name"),
+    ("ooh", "airport_code", "airport_name"),
+    ("paid_social", "campaign_id", "campaign_name"),
+    ("paid_social", "campaign_id", "channel"),
+    ("web_analytics", "traffic_source", "traffic_medium"),
+]
+
+
+def analyze_functional_dependencies():
+    """Section 6: Functional dependencies (mined over all sources)."""
+    print("\n" + "=" * 80)
+    print("SECTION 6: FUNCTIONAL DEPENDENCIES")
+    print("=" * 80)
+
+    results = fd_discovery.main()
+
+    print("\nRelationships relied on by the schema:")
+    for source, lhs, rhs in EXPECTED_FDS:
+        error = fd_discovery.holds(results, source, lhs, rhs)
+        if error is None:
+            status = "DOES NOT HOLD"
+        elif error == 0:
+            status = "exact"
+        else:
+            status = f"approximate (g3 {error:.2%})"
+        print(f"  {source}: {lhs} -> {rhs}: {status}")
+
+
 def main():
     analyze_dma_standardization()
     analyze_state_standardization()
     analyze_airport_mapping()
     analyze_campaign_linkage()
     analyze_podcast_geography()
+    analyze_functional_dependencies()
 
 
 if __name__ == "__main__":
@@ -2,61 +2,86 @@
 Phase 0 – Data Profiling & Inventory
 Reads every CSV in data/, profiles columns, detects schema drift and known
 data traps, and writes a summary to output/profiling/file_inventory.csv.
+
+Each file is streamed in chunks of CHUNK_ROWS rows and folded into running
+per-column statistics (null counts, min/max, Welford mean/variance, a
+reservoir sample, bounded value counts and a per-date histogram), so memory
+does not grow with file size. Files are profiled in parallel processes, and
+overlap detection works from the per-date histograms rather than re-reading.
 """
 
 import os
 import warnings
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 
+from src.profiling import sketches
+
 # ---------------------------------------------------------------------------
 # Paths
 # ---------------------------------------------------------------------------
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 DATA_DIR = PROJECT_ROOT / "data"
 OUTPUT_DIR = PROJECT_ROOT / "output" / "profiling"
+SKETCH_DIR = OUTPUT_DIR / "sketches"
+
+# ---------------------------------------------------------------------------
+# Streaming limits
+# ---------------------------------------------------------------------------
+CHUNK_ROWS = 100_000          # rows per chunk read
+RESERVOIR_SIZE = 1_000        # sampled values kept per column
+DATE_SAMPLE = 50              # values tried when sniffing date columns
+MAX_TRACKED_VALUES = 10_000   # distinct values counted per categorical column
 
 
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
 
+def _is_text(series: pd.Series) -> bool:
+    return series.dtype == "object" or pd.api.types.is_string_dtype(series)
+
+
+def _parses_as_dates(values) -> bool:
+    values = pd.Series(values).dropna()
+    if values.empty:
+        return False
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", UserWarning)
+            pd.to_datetime(values.astype(str))
+        return True
+    except (ValueError, TypeError):
+        return False
+
+
 def detect_date_columns(df: pd.DataFrame) -> list[str]:
     """Return column names that look like dates/datetimes."""
     date_cols = []
     for col in df.columns:
-        if df[col].dtype == "object":
-            sample = df[col].dropna().head(50)
-            try:
-                with warnings.catch_warnings():
-                    warnings.simplefilter("ignore", UserWarning)
-                    pd.to_datetime(sample)
+        if _is_text(df[col]):
+            if _parses_as_dates(df[col].dropna().head(DATE_SAMPLE)):
                 date_cols.append(col)
-            except (ValueError, TypeError):
-                continue
         elif pd.api.types.is_datetime64_any_dtype(df[col]):
             date_cols.append(col)
     return date_cols
 
 
-def infer_granularity(df: pd.DataFrame, date_cols: list[str]) -> str:
-    """Guess event-level / daily / weekly / monthly from date column values."""
-    if not date_cols:
-        return "unknown"
-    col = date_cols[0]
-    series = pd.to_datetime(df[col], errors="coerce").dropna().sort_values()
-    if series.empty:
+def infer_granularity(date_counts: pd.Series, has_time: bool) -> str:
+    """Guess event-level / daily / weekly / monthly from a per-date histogram."""
+    if date_counts is None or date_counts.empty:
         return "unknown"
 
     # If timestamps have non-midnight times → event-level
-    if (series.dt.hour != 0).any() or (series.dt.minute != 0).any():
+    if has_time:
         return "event-level"
 
     # Use distinct dates to avoid being fooled by repeated dates (e.g. one
     # row per airport per week)
-    distinct = series.dt.normalize().drop_duplicates().sort_values()
-    diffs = distinct.diff().dropna()
+    diffs = pd.Series(date_counts.index).diff().dropna()
     if diffs.empty:
         return "unknown"
     median_days = diffs.dt.days.median()
@@ -69,40 +94,149 @@ def infer_granularity(df: pd.DataFrame, date_cols: list[str]) -> str:
     return f"~{int(median_days)}-day"
 
 
-def profile_numeric(series: pd.Series) -> dict:
-    """Compute summary stats for a numeric column."""
+# ---------------------------------------------------------------------------
+# Running column statistics
+# ---------------------------------------------------------------------------
+
+def new_column_state() -> dict:
+    """Empty running statistics for one column."""
     return {
-        "min": series.min(),
-        "max": series.max(),
-        "mean": round(series.mean(), 2),
-        "median": round(series.median(), 2),
+        "dtypes": [], "count": 0, "nulls": 0,
+        # numeric (Welford / Chan et al. merge)
+        "n": 0, "mean": 0.0, "m2": 0.0, "min": None, "max": None,
+        # sampling and categoricals
+        "seen": 0, "reservoir": [], "value_counts": {}, "overflow": False,
+        # dates
+        "date_counts": None, "has_time": False,
+        # mergeable sketches persisted for drift monitoring
+        "sketch": sketches.column_new(),
     }
 
 
-def profile_categorical(series: pd.Series) -> dict:
-    """Compute summary stats for a string/categorical column."""
-    top = series.value_counts().head(5)
+def _merge_moments(state: dict, values: np.ndarray) -> None:
+    """Fold a chunk's count/mean/M2 into the running Welford moments."""
+    n_b = len(values)
+    if n_b == 0:
+        return
+    mean_b = float(values.mean())
+    m2_b = float(((values - mean_b) ** 2).sum())
+    n_a = state["n"]
+    n = n_a + n_b
+    delta = mean_b - state["mean"]
+    state["mean"] += delta * n_b / n
+    state["m2"] += m2_b + delta * delta * n_a * n_b / n
+    state["n"] = n
+    lo, hi = values.min(), values.max()
+    state["min"] = lo if state["min"] is None else min(state["min"], lo)
+    state["max"] = hi if state["max"] is None else max(state["max"], hi)
+
+
+def _sample(state: dict, values: np.ndarray, rng: np.random.Generator) -> None:
+    """Reservoir sampling (Algorithm R), vectorized over one chunk."""
+    reservoir = state["reservoir"]
+    free = RESERVOIR_SIZE - len(reservoir)
+    if free > 0:
+        reservoir.extend(values[:free].tolist())
+        state["seen"] += min(free, len(values))
+        values = values[free:]
+    if len(values) == 0:
+        return
+    seen = state["seen"] + np.arange(1, len(values) + 1)
+    slots = (rng.random(len(values)) * seen).astype(np.int64)
+    keep = slots < RESERVOIR_SIZE
+    for slot, value in zip(slots[keep], values[keep]):
+        reservoir[slot] = value
+    state["seen"] += len(values)
+
+
+def _count_values(state: dict, series: pd.Series) -> None:
+    """Merge a chunk's value counts, up to MAX_TRACKED_VALUES distinct values."""
+    if state["overflow"]:
+        return
+    counts = state["value_counts"]
+    for value, n in series.value_counts().items():
+        counts[value] = counts.get(value, 0) + int(n)
+    if len(counts) > MAX_TRACKED_VALUES:
+        state["overflow"] = True
+
+
+def _count_dates(state: dict, series: pd.Series) -> None:
+    """Merge a chunk's per-date histogram for a date column."""
+    dt = pd.to_datetime(series, errors="coerce").dropna()
+    if dt.empty:
+        return
+    days = dt.dt.normalize()
+    state["has_time"] = state["has_time"] or bool((dt != days).any())
+    counts = days.value_counts()
+    prior = state["date_counts"]
+    merged = counts if prior is None else prior.add(counts, fill_value=0)
+    state["date_counts"] = merged.astype("int64")
+
+
+def update_column(state: dict, series: pd.Series, is_date: bool,
+                  rng: np.random.Generator) -> None:
+    """Fold one chunk of a column into its running statistics."""
+    present = series.dropna()
+    state["dtypes"].append(str(series.dtype))
+    state["count"] += len(series)
+    state["nulls"] += len(series) - len(present)
+    _sample(state, present.to_numpy(), rng)
+    if is_date:
+        kind = "date"
+        _count_dates(state, present)
+    elif pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        kind = "numeric"
+        _merge_moments(state, present.to_numpy(dtype="float64"))
+    else:
+        kind = "text"
+        _count_values(state, present)
+    sketches.column_update(state["sketch"], present, kind)
+
+
+def _merged_dtype(dtypes: list[str]) -> str:
+    kinds = set(dtypes)
+    if len(kinds) == 1:
+        return dtypes[0]
+    if kinds <= {"int64", "float64"}:
+        return "float64"
+    return "object"
+
+
+def profile_numeric(state: dict) -> dict:
+    """Summary stats for a numeric column; the median comes from the reservoir."""
+    if state["n"] == 0:
+        return {"min": None, "max": None, "mean": None, "median": None}
     return {
-        "unique_count": series.nunique(),
-        "top_5": list(top.index),
+        "min": state["min"],
+        "max": state["max"],
+        "mean": round(state["mean"], 2),
+        "std": round(float(np.sqrt(state["m2"] / state["n"])), 2),
+        "median": round(float(np.median(state["reservoir"])), 2),
     }
 
 
-def profile_date_column(series: pd.Series) -> dict:
-    """Compute date range and gap info for a date column."""
-    dt = pd.to_datetime(series, errors="coerce").dropna().sort_values()
-    if dt.empty:
-        return {"min": None, "max": None, "distinct_dates": 0, "gaps": []}
-    dates = dt.dt.date
-    distinct = dates.nunique()
-    date_range = pd.date_range(dates.min(), dates.max(), freq="D")
-    present = set(dates.unique())
-    missing = sorted(set(d.date() for d in date_range) - set(present))
+def profile_categorical(state: dict) -> dict:
+    """Distinct count and top 5 values for a string/categorical column."""
+    counts = state["value_counts"]
+    # Ties broken by value so the result does not depend on chunk boundaries
+    top = sorted(counts, key=lambda v: (-counts[v], str(v)))[:5]
     return {
-        "min": str(dates.min()),
-        "max": str(dates.max()),
-        "distinct_dates": distinct,
-        "missing_date_count": len(missing),
+        "unique_count": f">{MAX_TRACKED_VALUES}" if state["overflow"] else len(counts),
+        "top_5": top,
+    }
+
+
+def profile_date_column(date_counts: pd.Series) -> dict:
+    """Date range and gap info from a per-date histogram."""
+    if date_counts is None or date_counts.empty:
+        return {"min": None, "max": None, "distinct_dates": 0, "missing_date_count": 0}
+    first, last = date_counts.index.min(), date_counts.index.max()
+    span = (last - first).days + 1
+    return {
+        "min": str(first.date()),
+        "max": str(last.date()),
+        "distinct_dates": len(date_counts),
+        "missing_date_count": span - len(date_counts),
     }
 
 
@@ -110,61 +244,93 @@ def profile_date_column(series: pd.Series) -> dict:
 # Per-file profiling
 # ---------------------------------------------------------------------------
 
-def profile_file(filepath: Path) -> dict:
-    """Profile a single CSV file and return a summary dict."""
-    df = pd.read_csv(filepath, low_memory=False)
+def profile_file(filepath: Path, chunksize: int = CHUNK_ROWS) -> dict:
+    """Profile a single CSV file, one chunk at a time, and return a summary dict."""
     size_bytes = filepath.stat().st_size
-    date_cols = detect_date_columns(df)
-    granularity = infer_granularity(df, date_cols)
-
-    # Date range from first detected date column
-    date_info = {}
-    if date_cols:
-        date_info = profile_date_column(df[date_cols[0]])
+    rng = np.random.default_rng(0)
+    columns, date_cols, states = None, [], {}
+    rows = 0
+
+    for chunk in pd.read_csv(filepath, chunksize=chunksize):
+        if columns is None:
+            columns = list(chunk.columns)
+            date_cols = detect_date_columns(chunk)
+            states = {col: new_column_state() for col in columns}
+        rows += len(chunk)
+        for col in columns:
+            update_column(states[col], chunk[col], col in date_cols, rng)
+
+    columns = columns or []
+    # Confirm date columns against the whole-file reservoir, not just chunk 1
+    date_cols = [c for c in date_cols if _parses_as_dates(states[c]["reservoir"])]
 
-    # Null summary
-    null_counts = df.isnull().sum()
-    total_nulls = int(null_counts.sum())
-
-    # Per-column detail
     column_profiles = []
-    for col in df.columns:
+    for col in columns:
+        st = states[col]
+        dtype = _merged_dtype(st["dtypes"])
         col_info = {
             "column": col,
-            "dtype": str(df[col].dtype),
-            "null_count": int(df[col].isnull().sum()),
-            "null_pct": round(df[col].isnull().mean() * 100, 2),
+            "dtype": dtype,
+            "null_count": st["nulls"],
+            "null_pct": round(st["nulls"] / st["count"] * 100, 2) if st["count"] else 0.0,
         }
         if col in date_cols:
             col_info["role"] = "date"
-            col_info.update(profile_date_column(df[col]))
-        elif pd.api.types.is_numeric_dtype(df[col]):
+            col_info.update(profile_date_column(st["date_counts"]))
+        elif st["n"] and not st["value_counts"]:
             col_info["role"] = "numeric"
-            col_info.update(profile_numeric(df[col]))
+            col_info.update(profile_numeric(st))
         else:
             col_info["role"] = "categorical"
-            col_info.update(profile_categorical(df[col]))
+            col_info.update(profile_categorical(st))
         column_profiles.append(col_info)
+        st["sketch"]["role"] = col_info["role"]
+
+    # Date range, granularity and histogram from the first detected date column
+    date_counts, has_time = None, False
+    if date_cols:
+        date_counts = states[date_cols[0]]["date_counts"]
+        has_time = states[date_cols[0]]["has_time"]
+        date_counts = date_counts.sort_index() if date_counts is not None else None
+    date_info = profile_date_column(date_counts) if date_cols else {}
 
     return {
         "filename": filepath.name,
         "path": str(filepath.relative_to(PROJECT_ROOT)),
         "format": filepath.suffix,
         "size_bytes": size_bytes,
-        "rows": len(df),
-        "cols": len(df.columns),
-        "columns": list(df.columns),
+        "rows": rows,
+        "cols": len(columns),
+        "columns": columns,
         "date_columns": date_cols,
         "date_min": date_info.get("min"),
         "date_max": date_info.get("max"),
         "distinct_dates": date_info.get("distinct_dates"),
         "missing_date_count": date_info.get("missing_date_count"),
-        "granularity": granularity,
-        "total_nulls": total_nulls,
+        "granularity": infer_granularity(date_counts, has_time),
+        "total_nulls": int(sum(st["nulls"] for st in states.values())),
         "column_profiles": column_profiles,
+        "date_counts": date_counts,
+        "sketches": {col: states[col]["sketch"] for col in columns},
     }
 
 
+def profile_files(paths: list[Path], workers: int | None = None) -> list[dict]:
+    """Profile files in parallel processes; results keep the input order."""
+    workers = workers or min(len(paths), os.cpu_count() or 1)
+    if workers <= 1:
+        profiles = []
+        for f in paths:
+            print(f"  Profiling {f.name} ...")
+            profiles.append(profile_file(f))
+        return profiles
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        profiles = list(pool.map(profile_file, paths))
+    for p in profiles:
+        print(f"  Profiled {p['filename']}")
+    return profiles
+
+
 # ---------------------------------------------------------------------------
 # Schema drift detection
 # ---------------------------------------------------------------------------
@@ -224,18 +390,24 @@ def detect_schema_drift(profiles: list[dict]) -> dict:
 # ---------------------------------------------------------------------------
 
 def detect_web_overlap(profiles: list[dict]) -> dict | None:
-    """Check for date overlap between web_traffic files."""
+    """Check for date overlap between web_traffic files.
+
+    Rows in each overlap window are summed from the per-date histograms
+    collected while profiling, so no file is read again.
+    """
     web_files = [p for p in profiles if classify_file(p["filename"]) == "web_traffic"]
     if len(web_files) < 2:
         return None
 
     ranges = {}
+    counts = {}
     for p in web_files:
         if p["date_min"] and p["date_max"]:
             ranges[p["filename"]] = (
                 pd.Timestamp(p["date_min"]),
                 pd.Timestamp(p["date_max"]),
             )
+            counts[p["filename"]] = p["date_counts"]
 
     overlaps = []
     filenames = list(ranges.keys())
@@ -246,14 +418,11 @@ def detect_web_overlap(profiles: list[dict]) -> dict | None:
             overlap_start = max(a_start, b_start)
             overlap_end = min(a_end, b_end)
             if overlap_start <= overlap_end:
-                # Count rows in overlap window for each file
-                row_counts = {}
-                for fname in [filenames[i], filenames[j]]:
-                    df = pd.read_csv(DATA_DIR / fname, low_memory=False)
-                    date_col = [c for c in df.columns if "date" in c.lower()][0]
-                    dt = pd.to_datetime(df[date_col], errors="coerce")
-                    mask = (dt >= overlap_start) & (dt <= overlap_end)
-                    row_counts[fname] = int(mask.sum())
+                # Count rows on each day of the overlap window, per file
+                row_counts = {
+                    fname: int(counts[fname].loc[overlap_start:overlap_end].sum())
+                    for fname in [filenames[i], filenames[j]]
+                }
                 overlaps.append({
                     "file_a": filenames[i],
                     "file_b": filenames[j],
@@ -345,6 +514,39 @@ def save_inventory(profiles: list[dict], output_path: Path) -> None:
     print(f"Inventory saved to {output_path}")
 
 
+# ---------------------------------------------------------------------------
+# Sketch history and distribution drift
+# ---------------------------------------------------------------------------
+
+def monitor_drift(profiles: list[dict], sketch_dir: Path = SKETCH_DIR) -> pd.DataFrame | None:
+    """Persist this run's per-stream sketches and compare them with history.
+
+    Returns the drift flags, or None on the first run (no history yet).
+    """
+    streams = sketches.merge_streams(profiles, classify_file)
+    baseline, history = sketches.load_history(sketch_dir)
+    run_path = sketches.save_run(streams, [p["filename"] for p in profiles], sketch_dir)
+    print(f"Sketches saved to {run_path}")
+    if not baseline:
+        print("No sketch history yet — this run becomes the drift baseline.")
+        return None
+
+    report = sketches.drift_report(streams, baseline)
+    report.to_csv(OUTPUT_DIR / "drift_report.csv", index=False)
+
+    print("\n" + "=" * 80)
+    print(f"DISTRIBUTION DRIFT vs {len(history)} previous run(s)")
+    print("=" * 80)
+    if report.empty:
+        print("\n  No drift detected.")
+    for row in report.itertuples(index=False):
+        column = f".{row.column}" if row.column else ""
+        values = f"  ({row.baseline} -> {row.current})" if row.baseline is not None else ""
+        print(f"  [{row.check}] {row.stream}{column}: {row.detail}{values}")
+    print(f"\nDrift report saved to {OUTPUT_DIR / 'drift_report.csv'}")
+    return report
+
+
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
@@ -357,16 +559,14 @@ def main():
 
     print(f"Found {len(csv_files)} CSV files in {DATA_DIR}\n")
 
-    profiles = []
-    for f in csv_files:
-        print(f"  Profiling {f.name} ...")
-        profiles.append(profile_file(f))
+    profiles = profile_files(csv_files)
 
     drift = detect_schema_drift(profiles)
     overlaps = detect_web_overlap(profiles)
 
     print_summary(profiles, drift, overlaps)
     save_inventory(profiles, OUTPUT_DIR / "file_inventory.csv")
+    monitor_drift(profiles)
 
     return profiles, drift, overlaps
 
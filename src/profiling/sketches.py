@@ -0,0 +1,367 @@
+"""
+Mergeable per-column sketches and run-over-run drift detection.
+
+Three sketches, each a plain dict that can be updated one chunk at a time,
+merged with another sketch of the same kind, and stored as JSON:
+
+- HyperLogLog (``hll_*``): distinct-value counts, ~1.6% error at p=12.
+- Relative-error quantile sketch (``quant_*``): log-spaced buckets as in
+  DDSketch, so every quantile is within ALPHA relative error.
+- Space-saving top-k (``topk_*``): the k heaviest values with counts and an
+  error bound.
+
+``profile_all`` folds every chunk into these, ``save_run`` persists one JSON
+file per profiling run under output/profiling/sketches/, and ``drift_report``
+compares the current run against the merged history of earlier runs without
+reading any historical data file.
+"""
+
+import base64
+import json
+import math
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+HLL_P = 12                 # 2**12 registers
+ALPHA = 0.01               # quantile sketch relative accuracy
+TOPK = 64                  # values tracked per categorical column
+HISTORY_RUNS = 10          # previous runs merged into the baseline
+
+# Drift thresholds
+CARDINALITY_JUMP = 0.20    # relative change in distinct count
+QUANTILE_SHIFT = 0.25      # relative change in p10 / p50 / p90
+QUANTILES = (0.1, 0.5, 0.9)
+
+
+def _hash(series: pd.Series) -> np.ndarray:
+    """Stable 64-bit hashes; numbers hash as float64 so int/float files agree."""
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        series = series.astype("float64")
+    else:
+        series = series.astype(str)
+    return pd.util.hash_pandas_object(series, index=False).to_numpy()
+
+
+# ---------------------------------------------------------------------------
+# HyperLogLog
+# ---------------------------------------------------------------------------
+
+def hll_new() -> dict:
+    return {"kind": "hll", "p": HLL_P, "registers": np.zeros(1 << HLL_P, dtype=np.uint8)}
+
+
+def hll_update(sketch: dict, series: pd.Series) -> None:
+    h = _hash(series)
+    if len(h) == 0:
+        return
+    p = sketch["p"]
+    idx = (h >> np.uint64(64 - p)).astype(np.intp)
+    # Rank = leading zeros of the next 32 bits + 1 (33 if they are all zero)
+    rest = ((h << np.uint64(p)) >> np.uint64(32)).astype(np.float64)
+    _, exponent = np.frexp(rest)
+    rank = np.where(rest > 0, 33 - exponent, 33).astype(np.uint8)
+    np.maximum.at(sketch["registers"], idx, rank)
+
+
+def hll_merge(a: dict, b: dict) -> dict:
+    return {"kind": "hll", "p": a["p"], "registers": np.maximum(a["registers"], b["registers"])}
+
+
+def hll_estimate(sketch: dict) -> float:
+    reg = sketch["registers"].astype(np.float64)
+    m = len(reg)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(2.0 ** -reg)
+    zeros = int((reg == 0).sum())
+    if raw <= 2.5 * m and zeros:
+        return m * math.log(m / zeros)  # linear counting for small sets
+    return float(raw)
+
+
+# ---------------------------------------------------------------------------
+# Quantile sketch (log-bucketed, relative error)
+# ---------------------------------------------------------------------------
+
+_GAMMA = (1 + ALPHA) / (1 - ALPHA)
+_LOG_GAMMA = math.log(_GAMMA)
+
+
+def quant_new() -> dict:
+    return {"kind": "quantile", "alpha": ALPHA, "pos": {}, "neg": {}, "zero": 0}
+
+
+def _add_buckets(store: dict, values: np.ndarray) -> None:
+    keys, counts = np.unique(np.ceil(np.log(values) / _LOG_GAMMA).astype(np.int64),
+                             return_counts=True)
+    for k, n in zip(keys.tolist(), counts.tolist()):
+        store[k] = store.get(k, 0) + n
+
+
+def quant_update(sketch: dict, values: np.ndarray) -> None:
+    values = values[~np.isnan(values)]
+    _add_buckets(sketch["pos"], values[values > 0])
+    _add_buckets(sketch["neg"], -values[values < 0])
+    sketch["zero"] += int((values == 0).sum())
+
+
+def quant_merge(a: dict, b: dict) -> dict:
+    out = quant_new()
+    for side in ("pos", "neg"):
+        for store in (a[side], b[side]):
+            for k, n in store.items():
+                out[side][k] = out[side].get(k, 0) + n
+    out["zero"] = a["zero"] + b["zero"]
+    return out
+
+
+def quant_count(sketch: dict) -> int:
+    return sum(sketch["pos"].values()) + sum(sketch["neg"].values()) + sketch["zero"]
+
+
+def quant_quantile(sketch: dict, q: float):
+    """Value at quantile ``q`` (None for an empty sketch)."""
+    total = quant_count(sketch)
+    if total == 0:
+        return None
+    rank = q * (total - 1)
+    seen = 0
+    # Negative buckets from most to least negative, then zero, then positive
+    for k in sorted(sketch["neg"], reverse=True):
+        seen += sketch["neg"][k]
+        if seen > rank:
+            return -2 * _GAMMA ** k / (_GAMMA + 1)
+    seen += sketch["zero"]
+    if seen > rank:
+        return 0.0
+    for k in sorted(sketch["pos"]):
+        seen += sketch["pos"][k]
+        if seen > rank:
+            return 2 * _GAMMA ** k / (_GAMMA + 1)
+    return 2 * _GAMMA ** max(sketch["pos"]) / (_GAMMA + 1)
+
+
+# ---------------------------------------------------------------------------
+# Space-saving top-k
+# ---------------------------------------------------------------------------
+
+def topk_new(k: int = TOPK) -> dict:
+    return {"kind": "topk", "k": k, "counts": {}, "errors": {}}
+
+
+def _topk_add(sketch: dict, value, n: int) -> None:
+    counts, errors = sketch["counts"], sketch["errors"]
+    if value in counts:
+        counts[value] += n
+    elif len(counts) < sketch["k"]:
+        counts[value], errors[value] = n, 0
+    else:
+        victim = min(counts, key=counts.get)
+        floor = counts.pop(victim)
+        errors.pop(victim)
+        counts[value], errors[value] = floor + n, floor
+
+
+def topk_update(sketch: dict, series: pd.Series) -> None:
+    """Weighted space-saving over one chunk's pre-aggregated value counts."""
+    for value, n in series.astype(str).value_counts().items():
+        _topk_add(sketch, value, int(n))
+
+
+def topk_merge(a: dict, b: dict) -> dict:
+    """Merge two summaries; a value missing from one side may have had up to
+    that side's minimum count there, which is added to its error."""
+    floor_a = 0 if topk_exact(a) else min(a["counts"].values())
+    floor_b = 0 if topk_exact(b) else min(b["counts"].values())
+    counts, errors = {}, {}
+    for value in set(a["counts"]) | set(b["counts"]):
+        counts[value] = a["counts"].get(value, floor_a) + b["counts"].get(value, floor_b)
+        errors[value] = (a["errors"].get(value, floor_a) + b["errors"].get(value, floor_b))
+    keep = sorted(counts, key=lambda v: (-counts[v], v))[:a["k"]]
+    return {"kind": "topk", "k": a["k"], "counts": {v: counts[v] for v in keep},
+            "errors": {v: errors[v] for v in keep}}
+
+
+def topk_exact(sketch: dict) -> bool:
+    """True while every distinct value seen is still tracked (no evictions,
+    which always leave a non-zero error behind)."""
+    return not any(sketch["errors"].values())
+
+
+# ---------------------------------------------------------------------------
+# Column sketches, merging and (de)serialization
+# ---------------------------------------------------------------------------
+
+def column_new() -> dict:
+    """Empty column sketch; ``role`` is set once profiling has decided it."""
+    return {"role": None, "rows": 0, "hll": hll_new()}
+
+
+def column_update(sketch: dict, present: pd.Series, kind: str) -> None:
+    """Fold one chunk's non-null values into a column sketch.
+
+    ``kind`` is how the chunk was read: "numeric" values feed the quantile
+    sketch, "text" values the top-k; "date" columns keep only the HLL.
+    """
+    sketch["rows"] += len(present)
+    hll_update(sketch["hll"], present)
+    if kind == "numeric":
+        quant_update(sketch.setdefault("quantile", quant_new()),
+                     present.to_numpy(dtype="float64"))
+    elif kind == "text":
+        topk_update(sketch.setdefault("topk", topk_new()), present)
+
+
+def column_merge(a: dict, b: dict) -> dict:
+    out = {"role": a["role"] if a["role"] == b["role"] else "mixed",
+           "rows": a["rows"] + b["rows"], "hll": hll_merge(a["hll"], b["hll"])}
+    for key, merge in (("quantile", quant_merge), ("topk", topk_merge)):
+        if key in a and key in b:
+            out[key] = merge(a[key], b[key])
+        elif key in a or key in b:
+            out[key] = a.get(key) or b.get(key)
+    return out
+
+
+def _to_json(sketch: dict) -> dict:
+    out = {"role": sketch["role"], "rows": sketch["rows"],
+           "hll": base64.b64encode(sketch["hll"]["registers"].tobytes()).decode("ascii")}
+    if "quantile" in sketch:
+        q = sketch["quantile"]
+        out["quantile"] = {"pos": {str(k): v for k, v in q["pos"].items()},
+                           "neg": {str(k): v for k, v in q["neg"].items()}, "zero": q["zero"]}
+    if "topk" in sketch:
+        out["topk"] = {"k": sketch["topk"]["k"], "counts": sketch["topk"]["counts"],
+                       "errors": sketch["topk"]["errors"]}
+    return out
+
+
+def _from_json(data: dict) -> dict:
+    registers = np.frombuffer(base64.b64decode(data["hll"]), dtype=np.uint8).copy()
+    out = {"role": data["role"], "rows": data["rows"],
+           "hll": {"kind": "hll", "p": int(np.log2(len(registers))), "registers": registers}}
+    if "quantile" in data:
+        q = data["quantile"]
+        out["quantile"] = {"kind": "quantile", "alpha": ALPHA,
+                           "pos": {int(k): v for k, v in q["pos"].items()},
+                           "neg": {int(k): v for k, v in q["neg"].items()}, "zero": q["zero"]}
+    if "topk" in data:
+        out["topk"] = dict(data["topk"], kind="topk")
+    return out
+
+
+def merge_streams(profiles: list[dict], stream_of) -> dict:
+    """Merge per-file column sketches into {stream: {column: sketch}}."""
+    streams: dict[str, dict] = {}
+    for p in profiles:
+        cols = streams.setdefault(stream_of(p["filename"]), {})
+        for col, sketch in p["sketches"].items():
+            cols[col] = column_merge(cols[col], sketch) if col in cols else sketch
+    return streams
+
+
+# ---------------------------------------------------------------------------
+# Persistence
+# ---------------------------------------------------------------------------
+
+def save_run(streams: dict, files: list[str], sketch_dir: Path, run_id: str | None = None) -> Path:
+    """Write one run's stream sketches as JSON; returns the file path."""
+    run_id = run_id or datetime.now().strftime("%Y%m%dT%H%M%S")
+    payload = {
+        "run_id": run_id,
+        "files": files,
+        "streams": {s: {c: _to_json(k) for c, k in cols.items()} for s, cols in streams.items()},
+    }
+    sketch_dir.mkdir(parents=True, exist_ok=True)
+    path = sketch_dir / f"run_{run_id}.json"
+    path.write_text(json.dumps(payload, sort_keys=True))
+    return path
+
+
+def load_history(sketch_dir: Path, exclude: Path | None = None,
+                 runs: int = HISTORY_RUNS) -> tuple[dict, list[str]]:
+    """Merge the most recent ``runs`` stored runs into one baseline."""
+    paths = sorted(p for p in sketch_dir.glob("run_*.json") if p != exclude)[-runs:]
+    baseline: dict[str, dict] = {}
+    for path in paths:
+        data = json.loads(path.read_text())
+        for stream, cols in data["streams"].items():
+            merged = baseline.setdefault(stream, {})
+            for col, raw in cols.items():
+                sketch = _from_json(raw)
+                merged[col] = column_merge(merged[col], sketch) if col in merged else sketch
+    return baseline, [p.stem for p in paths]
+
+
+# ---------------------------------------------------------------------------
+# Drift
+# ---------------------------------------------------------------------------
+
+def _rel_change(new: float, old: float) -> float:
+    if old == 0:
+        return 0.0 if new == 0 else math.inf
+    return (new - old) / abs(old)
+
+
+def drift_report(current: dict, baseline: dict) -> pd.DataFrame:
+    """Flag drift of ``current`` stream sketches against ``baseline``.
+
+    Checks, per stream: new and vanished columns; per column: distinct-count
+    jumps (HLL), p10/p50/p90 shifts for numerics, and categories that never
+    appeared in the baseline's top-k.
+    """
+    flags = []
+
+    def flag(stream, column, check, detail, baseline_value=None, current_value=None):
+        flags.append({"stream": stream, "column": column, "check": check, "detail": detail,
+                      "baseline": baseline_value, "current": current_value})
+
+    for stream, cols in sorted(current.items()):
+        base = baseline.get(stream)
+        if base is None:
+            flag(stream, None, "new_stream", "stream not present in history")
+            continue
+        for col in sorted(set(cols) - set(base)):
+            flag(stream, col, "new_column", "column not present in history")
+        for col in sorted(set(base) - set(cols)):
+            flag(stream, col, "missing_column", "column present in history but not in this run")
+
+        for col in sorted(set(cols) & set(base)):
+            cur, old = cols[col], base[col]
+            if cur["role"] != old["role"]:
+                flag(stream, col, "type_change", f"{old['role']} -> {cur['role']}",
+                     old["role"], cur["role"])
+
+            n_cur, n_old = hll_estimate(cur["hll"]), hll_estimate(old["hll"])
+            change = _rel_change(n_cur, n_old)
+            if abs(change) > CARDINALITY_JUMP and abs(n_cur - n_old) >= 1:
+                flag(stream, col, "cardinality_jump", f"distinct values {change:+.0%}",
+                     round(n_old), round(n_cur))
+
+            if "quantile" in cur and "quantile" in old:
+                for q in QUANTILES:
+                    v_cur = quant_quantile(cur["quantile"], q)
+                    v_old = quant_quantile(old["quantile"], q)
+                    if v_cur is None or v_old is None:
+                        continue
+                    shift = _rel_change(v_cur, v_old)
+                    if abs(shift) > QUANTILE_SHIFT:
+                        flag(stream, col, "quantile_shift", f"p{int(q * 100)} {shift:+.0%}",
+                             round(v_old, 4), round(v_cur, 4))
+
+            if "topk" in cur and "topk" in old:
+                known = old["topk"]["counts"]
+                floor = 0 if topk_exact(old["topk"]) else min(known.values())
+                total = max(old["rows"], 1)
+                for value, n in cur["topk"]["counts"].items():
+                    # With a saturated baseline only values heavier than
+                    # anything it could have evicted are provably new
+                    share = n / max(cur["rows"], 1) * total
+                    if value not in known and share > floor:
+                        flag(stream, col, "new_category", f"value {value!r} not seen before",
+                             None, n)
+
+    return pd.DataFrame(flags, columns=["stream", "column", "check", "detail",
+                                        "baseline", "current"])
@@ -117,6 +117,12 @@ def main():
     run_module("analysis.cross_channel_summary")
     run_module("analysis.generate_charts")
     run_module("analysis.lag_analysis")
+    run_module("analysis.transfer_entropy")
+    run_module("analysis.granger")
+    run_module("analysis.rolling_correlation")
+    run_module("analysis.partial_correlation")
+    run_module("analysis.dma_lag_analysis")
+    run_module("analysis.mmm")
     run_module("analysis.promo_analysis")
 
     # ------------------------------------------------------------------
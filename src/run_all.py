@@ -1,8 +1,9 @@
 """Orchestrator: run all dimension builds and fact transforms, then validate."""
 
 import time
-import pandas as pd
-from src.transforms.utils import WAREHOUSE_DIR, DATE_START, DATE_END
+from itertools import groupby
+
+from src.transforms.utils import WAREHOUSE_DIR
 from src.transforms.build_dimensions import build_all_dimensions
 from src.transforms.transform_ooh import transform_ooh
 from src.transforms.transform_organic_social import transform_organic_social
@@ -10,6 +11,60 @@ from src.transforms.transform_podcast import transform_podcast
 from src.transforms.transform_paid_social import transform_paid_social
 from src.transforms.transform_ecommerce import transform_ecommerce
 from src.transforms.transform_web_analytics import transform_web_analytics
+from src.validation.contracts import CONTRACTS, date_bounds, empty_ok_columns
+from src.validation.engine import result, run_rules
+
+
+# All expected output files and their date columns, from the table contracts
+OUTPUTS = {name: WAREHOUSE_DIR / c["path"] for name, c in CONTRACTS.items()}
+DATE_COLS = {name: c["date_col"] for name, c in CONTRACTS.items() if c.get("date_col")}
+
+TABLES = {
+    name: {"path": path, "date_cols": [DATE_COLS[name]] if name in DATE_COLS else []}
+    for name, path in OUTPUTS.items()
+}
+
+
+def build_rules():
+    """Declare the output checks: file exists, row count > 0, no fully-empty
+    columns, and date range (for tables with date columns)."""
+    rules = []
+    for name, path in OUTPUTS.items():
+        def exists(frames, path=path):
+            return result(path.exists(), observed=path.exists(), expected=True,
+                          lines=[f"file exists: {'PASS' if path.exists() else 'FAIL'}"])
+
+        def row_count(frames, name=name):
+            rows = len(frames[name])
+            return result(rows > 0, observed=rows, expected="> 0",
+                          lines=[f"row count: {rows:,} — {'PASS' if rows > 0 else 'FAIL'}"])
+
+        def no_empty(frames, name=name):
+            df = frames[name]
+            allowed = empty_ok_columns(name)
+            empty = [c for c in df.columns[df.isna().all().to_numpy()] if c not in allowed]
+            status = "PASS" if not empty else "FAIL"
+            line = f"empty columns: {empty} — {status}" if empty else f"no empty columns: {status}"
+            return result(not empty, observed=empty, expected=[], lines=[line])
+
+        rules += [
+            {"name": "file_exists", "table": name, "columns": {}, "check": exists},
+            {"name": "row_count>0", "table": name, "columns": {name: None}, "check": row_count},
+            {"name": "no_empty_cols", "table": name, "columns": {name: None}, "check": no_empty},
+        ]
+
+        if name in DATE_COLS:
+            def date_range(frames, name=name, dcol=DATE_COLS[name]):
+                dates = frames[name][dcol]
+                mn, mx = dates.min(), dates.max()
+                start, end = date_bounds(name)
+                ok = mn >= start and mx <= end
+                return result(ok, observed=[mn, mx], expected=[start, end],
+                              lines=[f"date range: {mn.date()} to {mx.date()} — "
+                                     f"{'PASS' if ok else 'FAIL'}"])
+            rules.append({"name": "date_range", "table": name,
+                          "columns": {name: None}, "check": date_range})
+    return rules
 
 
 def validate_outputs():
@@ -18,86 +73,24 @@ def validate_outputs():
     print("VALIDATION")
     print("=" * 60)
 
-    checks = []
-
-    # All expected output files
-    outputs = {
-        "dim_date": WAREHOUSE_DIR / "dimensions" / "dim_date.csv",
-        "dim_geography": WAREHOUSE_DIR / "dimensions" / "dim_geography.csv",
-        "dim_channel": WAREHOUSE_DIR / "dimensions" / "dim_channel.csv",
-        "dim_campaign_initiative": WAREHOUSE_DIR / "dimensions" / "dim_campaign_initiative.csv",
-        "dim_podcast": WAREHOUSE_DIR / "dimensions" / "dim_podcast.csv",
-        "fact_paid_social_daily": WAREHOUSE_DIR / "fact_paid_social" / "fact_paid_social_daily.csv",
-        "fact_web_analytics_daily": WAREHOUSE_DIR / "fact_web_analytics" / "fact_web_analytics_daily.csv",
-        "fact_ecommerce_daily": WAREHOUSE_DIR / "fact_ecommerce" / "fact_ecommerce_daily.csv",
-        "fact_organic_social_daily": WAREHOUSE_DIR / "fact_organic_social" / "fact_organic_social_daily.csv",
-        "fact_podcast_daily": WAREHOUSE_DIR / "fact_podcast" / "fact_podcast_daily.csv",
-        "fact_ooh_daily": WAREHOUSE_DIR / "fact_ooh" / "fact_ooh_daily.csv",
-        "fact_ecommerce_transactions": WAREHOUSE_DIR / "fact_ecommerce" / "fact_ecommerce_transactions.csv",
-        "fact_web_analytics_events": WAREHOUSE_DIR / "fact_web_analytics" / "fact_web_analytics_events.csv",
-    }
-
-    # Date columns in each fact table
-    date_cols = {
-        "dim_date": "date",
-        "fact_paid_social_daily": "date",
-        "fact_web_analytics_daily": "date",
-        "fact_ecommerce_daily": "date",
-        "fact_organic_social_daily": "date",
-        "fact_podcast_daily": "date",
-        "fact_ooh_daily": "date",
-        "fact_ecommerce_transactions": "date",
-        "fact_web_analytics_events": "date",
-    }
-
-    for name, path in outputs.items():
+    results, _ = run_rules(build_rules(), TABLES)
+
+    for name, group in groupby(results, key=lambda r: r["table"]):
         print(f"\n  --- {name} ---")
+        for r in group:
+            # Skip follow-on checks for a missing file, as before
+            if r["check"] != "file_exists" and not OUTPUTS[name].exists():
+                continue
+            for line in r["lines"]:
+                print(f"    {line}")
 
-        # Check 1: file exists
-        exists = path.exists()
-        status = "PASS" if exists else "FAIL"
-        checks.append((name, "file_exists", status))
-        print(f"    file exists: {status}")
-        if not exists:
-            continue
-
-        df = pd.read_csv(path)
-
-        # Check 2: row count > 0
-        row_ok = len(df) > 0
-        status = "PASS" if row_ok else "FAIL"
-        checks.append((name, "row_count>0", status))
-        print(f"    row count: {len(df):,} — {status}")
-
-        # Check 3: no fully-empty columns (excluding known-nullable by design)
-        nullable_by_design = {
-            "dim_geography": {"zip_code"},  # not populated at this grain
-        }
-        allowed = nullable_by_design.get(name, set())
-        empty_cols = [c for c in df.columns
-                      if df[c].isna().all() and c not in allowed]
-        no_empty = len(empty_cols) == 0
-        status = "PASS" if no_empty else "FAIL"
-        checks.append((name, "no_empty_cols", status))
-        if not no_empty:
-            print(f"    empty columns: {empty_cols} — {status}")
-        else:
-            print(f"    no empty columns: {status}")
-
-        # Check 4: date range (for tables with date columns)
-        if name in date_cols:
-            dcol = date_cols[name]
-            dates = pd.to_datetime(df[dcol])
-            mn, mx = dates.min(), dates.max()
-            in_range = mn >= DATE_START and mx <= DATE_END
-            status = "PASS" if in_range else "FAIL"
-            checks.append((name, "date_range", status))
-            print(f"    date range: {mn.date()} to {mx.date()} — {status}")
+    checks = [r for r in results
+              if r["check"] == "file_exists" or OUTPUTS[r["table"]].exists()]
 
     # Summary
     total = len(checks)
-    passed = sum(1 for _, _, s in checks if s == "PASS")
-    failed = sum(1 for _, _, s in checks if s == "FAIL")
+    passed = sum(1 for r in checks if r["status"] == "PASS")
+    failed = sum(1 for r in checks if r["status"] == "FAIL")
 
     print("\n" + "=" * 60)
     print(f"SUMMARY: {passed}/{total} checks passed, {failed} failed")
@@ -105,9 +98,9 @@ def validate_outputs():
 
     if failed > 0:
         print("\nFailed checks:")
-        for name, check, status in checks:
-            if status == "FAIL":
-                print(f"  FAIL: {name} / {check}")
+        for r in checks:
+            if r["status"] == "FAIL":
+                print(f"  FAIL: {r['table']} / {r['check']}")
 
     return failed == 0
 
@@ -3,8 +3,11 @@
 import pandas as pd
 from src.transforms.utils import (
     DATA_DIR, WAREHOUSE_DIR, REFERENCE_DIR, read_csv, log_step,
-    DATE_START, DATE_END,
+    DATE_START, DATE_END, control_totals, record_control_totals,
 )
+from src.transforms.campaign_matcher import initiatives
+from src.transforms.geo_matcher import geo_inference
+from src.validation.contracts import assert_contract
 
 DIM_DIR = WAREHOUSE_DIR / "dimensions"
 
@@ -36,13 +39,29 @@ def build_dim_date():
     df["season_flag"] = df["date"].apply(_season)
 
     out = DIM_DIR / "dim_date.csv"
+    assert_contract(df, "dim_date")
     df.to_csv(out, index=False)
+    record_control_totals("dim_date", output=control_totals(df, date_col="date"), file=out)
     log_step("dim_date", len(df), len(df),
              actions=[f"season_flag distribution: {df['season_flag'].value_counts().to_dict()}"],
              date_range=(str(df["date"].min().date()), str(df["date"].max().date())))
     return df
 
 
+def podcast_geography():
+    """podcast_name -> (geo_inferred, geo_state) from the gazetteer matcher:
+    "explicit" when the podcast name states the geography, "inferred" when
+    only its episode titles and transcript snippets do (see
+    ``geo_matcher.geo_inference``), "unknown" otherwise."""
+    raw = pd.concat([read_csv(f) for f in sorted(DATA_DIR.glob("sBelles_podcast_*.csv"))],
+                    ignore_index=True)
+    geo = {}
+    for name, eps in raw.groupby("podcast_name", sort=True):
+        texts = [*eps["episode_title"].unique(), *eps["transcript_snippet"].unique()]
+        geo[name] = geo_inference(name, texts)
+    return geo
+
+
 def build_dim_geography():
     """dim_geography: collect unique geos from all sources + airport lookup."""
     print("\n=== dim_geography ===")
@@ -86,14 +105,7 @@ def build_dim_geography():
         })
 
     # --- Inferred geos from podcast ---
-    podcast_names = set()
-    for f in DATA_DIR.glob("sBelles_podcast_*.csv"):
-        df = read_csv(f)
-        podcast_names.update(df["podcast_name"].unique())
-
-    ga_keywords = ["GA", "ATL", "Peach State"]
-    for name in sorted(podcast_names):
-        state = "GA" if any(kw in name for kw in ga_keywords) else None
+    for name, (_, state) in podcast_geography().items():
         rows.append({
             "dma_name": None, "state": state,
             "zip_code": None, "airport_code": None, "airport_name": None,
@@ -104,7 +116,9 @@ def build_dim_geography():
     dim.insert(0, "geo_key", range(1, len(dim) + 1))
 
     out = DIM_DIR / "dim_geography.csv"
+    assert_contract(dim, "dim_geography")
     dim.to_csv(out, index=False)
+    record_control_totals("dim_geography", output=control_totals(dim), file=out)
     log_step("dim_geography", 0, len(dim),
              actions=[f"local: {(dim['geo_scope']=='local').sum()}, "
                       f"national: {(dim['geo_scope']=='national').sum()}, "
@@ -126,64 +140,46 @@ def build_dim_channel():
     ]
     df = pd.DataFrame(data, columns=["channel_key", "channel_name", "channel_group", "is_paid"])
     out = DIM_DIR / "dim_channel.csv"
+    assert_contract(df, "dim_channel")
     df.to_csv(out, index=False)
+    record_control_totals("dim_channel", output=control_totals(df), file=out)
     log_step("dim_channel", 7, 7)
     return df
 
 
 def build_dim_campaign_initiative():
-    """dim_campaign_initiative: 6-row bridge table."""
+    """dim_campaign_initiative: bridge table matched from campaign values;
+    keys of the previous build are kept."""
     print("\n=== dim_campaign_initiative ===")
-    data = [
-        (1, "Always On",
-         "Instagram Always On, Pinterest Always On, TikTok Always On",
-         "Always On",
-         "Direct theme match across both streams"),
-        (2, "BTS",
-         "Instagram BTS Moms, Pinterest BTS Moms, TikTok BTS Moms",
-         "BTS 2023, BTS 2024",
-         "Web uses year-suffixed variants"),
-        (3, "Teen Trends",
-         "Instagram Teen Trends, Pinterest Teen Trends, TikTok Teen Trends",
-         None,
-         "No web analytics counterpart found"),
-        (4, "Black Friday",
-         None,
-         "Black Friday 2023",
-         "Web/promo only — no paid social campaign"),
-        (5, "Email Promo",
-         None,
-         "Email Promo",
-         "Web/promo only — no paid social campaign"),
-        (6, "Unattributed",
-         None,
-         "None",
-         "Web traffic with explicit 'None' campaign value"),
-    ]
-    df = pd.DataFrame(data, columns=[
-        "initiative_key", "initiative_name",
-        "paid_social_campaign_pattern", "web_analytics_campaign_value", "notes",
-    ])
     out = DIM_DIR / "dim_campaign_initiative.csv"
+    # "None" is a campaign value (unattributed web traffic), not a null
+    previous = (pd.read_csv(out, keep_default_na=False, na_values=[""])
+                if out.exists() else None)
+    df = initiatives(previous=previous)
+    assert_contract(df, "dim_campaign_initiative")
     df.to_csv(out, index=False)
-    log_step("dim_campaign_initiative", 6, 6)
+    record_control_totals("dim_campaign_initiative", output=control_totals(df), file=out)
+    linked = df["match_confidence"].notna()
+    log_step("dim_campaign_initiative", len(df), len(df),
+             actions=[f"cross-stream links: {linked.sum()}, "
+                      f"min confidence: {df.loc[linked, 'match_confidence'].min():.3f}"])
     return df
 
 
 def build_dim_podcast():
-    """dim_podcast: 5 rows with geo_inferred logic."""
+    """dim_podcast: one row per podcast with geo_inferred logic."""
     print("\n=== dim_podcast ===")
     podcasts = [
-        (1, "Carpool Chronicles GA", "explicit", "GA"),
-        (2, "Mom Life in the ATL", "explicit", "GA"),
-        (3, "Peach State Parenting", "explicit", "GA"),
-        (4, "Suburban Style Chats", "unknown", None),
-        (5, "Teen Trend Watch", "unknown", None),
+        (key, name, inferred, state)
+        for key, (name, (inferred, state)) in enumerate(podcast_geography().items(), start=1)
     ]
     df = pd.DataFrame(podcasts, columns=["podcast_key", "podcast_name", "geo_inferred", "geo_state"])
     out = DIM_DIR / "dim_podcast.csv"
+    assert_contract(df, "dim_podcast")
     df.to_csv(out, index=False)
-    log_step("dim_podcast", 5, 5)
+    record_control_totals("dim_podcast", output=control_totals(df), file=out)
+    log_step("dim_podcast", len(df), len(df),
+             actions=[f"geo_inferred: {df['geo_inferred'].value_counts().to_dict()}"])
     return df
 
 
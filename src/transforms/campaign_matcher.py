@@ -0,0 +1,243 @@
+"""Match paid social campaign names to web analytics campaign values.
+
+Paid social names follow "{Platform} {Theme}" ("Instagram BTS Moms"); web
+analytics uses bare, sometimes year-suffixed themes ("BTS 2023"). The
+matcher works on distinct values only, so its cost depends on the number of
+campaigns, not on fact volume:
+
+1. normalize: strip the platform prefix and a trailing year, lowercase;
+2. group values by normalized theme within each stream;
+3. block: index paid themes by character trigrams and only score the web
+   themes that share at least ``MIN_SHARED_GRAMS`` trigrams with a paid
+   theme (no all-pairs comparison);
+4. score candidates with the trigram Dice coefficient
+   (2 |A & B| / (|A| + |B|)) and link each web theme to its best paid theme
+   scoring at least ``MATCH_THRESHOLD``.
+
+Dice penalizes length asymmetry, and containment (one theme's trigrams a
+subset of the other's) is never scored as a perfect match: a short generic
+theme contained in a longer one ("Sale" in "Black Friday Sale", "Moms" in
+"BTS Moms") is not linked, and only a theme that is the leading word(s) of
+the other ("BTS" -> "BTS Moms") is, with confidence ``CONTAINMENT_SCORE``.
+
+``initiatives()`` returns the rows of dim_campaign_initiative with a
+``match_confidence`` score for cross-stream links. New campaigns arrive
+weekly, so keys are stable across builds: given the previous dimension, an
+initiative keeps the key of the previous row it shares a campaign value
+with, and only new initiatives get new keys (``assign_keys``).
+"""
+
+import re
+from collections import Counter, defaultdict
+
+import pandas as pd
+
+from src.transforms.utils import DATA_DIR
+
+PLATFORMS = ("Instagram", "Pinterest", "TikTok", "Facebook")
+PLATFORM_PREFIX = re.compile(r"^(?:%s)\s+" % "|".join(PLATFORMS), re.IGNORECASE)
+YEAR_SUFFIX = re.compile(r"\s+20\d\d$")
+
+NGRAM = 3
+MIN_SHARED_GRAMS = 2
+MATCH_THRESHOLD = 0.6
+CONTAINMENT_SCORE = 0.65
+
+# Web events with no campaign (explicit "None" in the export).
+UNATTRIBUTED_VALUE = "None"
+UNATTRIBUTED_NAME = "Unattributed"
+
+NOTES = {
+    "direct": "Direct theme match across both streams",
+    "year": "Web uses year-suffixed variants",
+    "fuzzy": "Fuzzy theme match across streams",
+    "paid_only": "No web analytics counterpart found",
+    "web_only": "Web/promo only — no paid social campaign",
+    "unattributed": "Web traffic with explicit 'None' campaign value",
+}
+
+
+# ---------------------------------------------------------------------------
+# Normalization and scoring
+# ---------------------------------------------------------------------------
+
+def theme(value):
+    """Display theme: platform prefix and trailing year stripped."""
+    return YEAR_SUFFIX.sub("", PLATFORM_PREFIX.sub("", value.strip())).strip()
+
+
+def normalize(value):
+    return " ".join(theme(value).lower().split())
+
+
+def grams(text, n=NGRAM):
+    """Character n-grams of a normalized theme, padded at the word edges."""
+    padded = f" {text} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+def similarity(a, b):
+    """Trigram Dice coefficient of two normalized themes."""
+    ga, gb = grams(a), grams(b)
+    return 2 * len(ga & gb) / (len(ga) + len(gb)) if ga and gb else 0.0
+
+
+def match_score(a, b):
+    """Match score of two normalized themes: ``similarity``, except that
+    containment scores ``CONTAINMENT_SCORE`` when the shorter theme is the
+    longer one's leading word(s) and 0 otherwise."""
+    if a == b:
+        return 1.0
+    ga, gb = grams(a), grams(b)
+    if not (ga <= gb or gb <= ga):
+        return similarity(a, b)
+    short, long_ = sorted((a, b), key=len)
+    return CONTAINMENT_SCORE if long_.startswith(short + " ") else 0.0
+
+
+def build_index(themes):
+    """Inverted index: trigram -> set of themes containing it."""
+    index = defaultdict(set)
+    for t in themes:
+        for g in grams(t):
+            index[g].add(t)
+    return index
+
+
+def candidates(index, text):
+    """Indexed themes sharing at least ``MIN_SHARED_GRAMS`` trigrams with
+    ``text`` (all of them for themes too short to reach the minimum)."""
+    shared = Counter(t for g in grams(text) for t in index.get(g, ()))
+    need = min(MIN_SHARED_GRAMS, len(grams(text)))
+    return [t for t, count in shared.items() if count >= need]
+
+
+# ---------------------------------------------------------------------------
+# Sources
+# ---------------------------------------------------------------------------
+
+def distinct_values(pattern, column):
+    """Distinct values of ``column`` across the raw files matching ``pattern``
+    (nulls reported as ``UNATTRIBUTED_VALUE``)."""
+    values = set()
+    for f in sorted(DATA_DIR.glob(pattern)):
+        s = pd.read_csv(f, usecols=lambda c: c.strip().lower() == column).iloc[:, 0]
+        values.update(s.fillna(UNATTRIBUTED_VALUE).astype(str).unique())
+    return values
+
+
+def match(paid_values, web_values):
+    """Group both streams' values into initiatives.
+
+    Returns a list of dicts with ``paid`` and ``web`` value lists, the
+    display ``name``, ``confidence`` (None for single-stream initiatives) and
+    a ``kind`` used for notes.
+    """
+    paid = defaultdict(set)
+    for v in paid_values:
+        paid[normalize(v)].add(v)
+    web = defaultdict(set)
+    unattributed = set()
+    for v in web_values:
+        (unattributed if v == UNATTRIBUTED_VALUE else web[normalize(v)]).add(v)
+
+    index = build_index(paid)
+    links = {}   # web theme -> (paid theme, score)
+    for w in web:
+        scored = [(match_score(w, p), p) for p in candidates(index, w)]
+        if scored:
+            score, best = max(scored, key=lambda x: (x[0], -len(x[1]), x[1]))
+            if score >= MATCH_THRESHOLD:
+                links[w] = (best, score)
+
+    groups = []
+    for p in paid:
+        linked = sorted(w for w, (q, _) in links.items() if q == p)
+        web_vals = sorted(v for w in linked for v in web[w])
+        if not linked:
+            kind, confidence = "paid_only", None
+        else:
+            confidence = round(min(links[w][1] for w in linked), 3)
+            if any(YEAR_SUFFIX.search(v) for v in web_vals):
+                kind = "year"
+            elif linked == [p]:
+                kind = "direct"
+            else:
+                kind = "fuzzy"
+        labels = [theme(v) for v in sorted(paid[p])] + [theme(v) for v in web_vals]
+        name = min(labels, key=lambda s: (len(s), s))
+        groups.append({"name": name, "paid": sorted(paid[p]), "web": web_vals,
+                       "confidence": confidence, "kind": kind})
+    for w in sorted(set(web) - set(links)):
+        vals = sorted(web[w])
+        groups.append({"name": min((theme(v) for v in vals), key=lambda s: (len(s), s)),
+                       "paid": [], "web": vals, "confidence": None, "kind": "web_only"})
+
+    groups.sort(key=lambda g: (not g["paid"], g["name"].lower()))
+    if unattributed:
+        groups.append({"name": UNATTRIBUTED_NAME, "paid": [], "web": sorted(unattributed),
+                       "confidence": None, "kind": "unattributed"})
+    return groups
+
+
+def previous_keys(previous):
+    """Campaign value -> initiative_key of a previous dim_campaign_initiative
+    (a DataFrame, or None for a first build)."""
+    keys = {}
+    if previous is None:
+        return keys
+    for _, row in previous.iterrows():
+        for col in ("paid_social_campaign_pattern", "web_analytics_campaign_value"):
+            if isinstance(row[col], str):
+                for value in row[col].split(", "):
+                    keys[value] = int(row["initiative_key"])
+    return keys
+
+
+def assign_keys(groups, previous=None):
+    """initiative_key of every ``match`` group.
+
+    A group keeps the key of the previous initiative it shares a campaign
+    value with (the smallest, if initiatives merged; the first group in
+    ``match`` order, if one split). Other groups get keys after the largest
+    key ever assigned, in ``match`` order.
+    """
+    old = previous_keys(previous)
+    next_key = max(old.values(), default=0) + 1
+    if previous is not None and len(previous):
+        next_key = max(next_key, int(previous["initiative_key"].max()) + 1)
+    keys, taken = [], set()
+    for g in groups:
+        known = sorted({old[v] for v in g["paid"] + g["web"] if v in old} - taken)
+        if known:
+            key = known[0]
+        else:
+            key, next_key = next_key, next_key + 1
+        taken.add(key)
+        keys.append(key)
+    return keys
+
+
+def initiatives(paid_values=None, web_values=None, previous=None):
+    """dim_campaign_initiative rows from the raw campaign values, keyed
+    stably against ``previous`` (the last built dimension, if any)."""
+    if paid_values is None:
+        paid_values = distinct_values("sBelles_paid_*.csv", "campaign_name")
+    if web_values is None:
+        web_values = distinct_values("sBelles_web_*.csv", "campaign")
+    groups = match(paid_values, web_values)
+    rows = []
+    for key, g in zip(assign_keys(groups, previous), groups):
+        rows.append({
+            "initiative_key": key,
+            "initiative_name": g["name"],
+            "paid_social_campaign_pattern": ", ".join(g["paid"]) or None,
+            "web_analytics_campaign_value": ", ".join(g["web"]) or None,
+            "notes": NOTES[g["kind"]],
+            "match_confidence": g["confidence"],
+        })
+    return pd.DataFrame(rows).sort_values("initiative_key", ignore_index=True)
+
+
+if __name__ == "__main__":
+    print(initiatives().to_string(index=False))
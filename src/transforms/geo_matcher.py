@@ -0,0 +1,179 @@
+"""Gazetteer-based geo keyword matching for free text (podcast names, episode
+titles, transcript snippets).
+
+All gazetteer terms are compiled once into a single Aho-Corasick automaton,
+so each text is scanned in one pass regardless of how many terms there are.
+Matches must sit on word boundaries ("GA" matches "Chronicles GA" but not
+"GAP"). Short codes (state abbreviations, "ATL") are matched case-sensitively
+so ordinary words like "in", "me" or "or" are not read as states; everything
+else is case-insensitive.
+"""
+
+from collections import Counter, deque
+
+# ---------------------------------------------------------------------------
+# Gazetteer: term -> (kind, state). ``state`` is None for regions that do
+# not pin down a single state.
+# ---------------------------------------------------------------------------
+
+US_STATES = {
+    "Alabama": "AL", "Alaska": "AK", "Arizona": "AZ", "Arkansas": "AR",
+    "California": "CA", "Colorado": "CO", "Connecticut": "CT", "Delaware": "DE",
+    "Florida": "FL", "Georgia": "GA", "Hawaii": "HI", "Idaho": "ID",
+    "Illinois": "IL", "Indiana": "IN", "Iowa": "IA", "Kansas": "KS",
+    "Kentucky": "KY", "Louisiana": "LA", "Maine": "ME", "Maryland": "MD",
+    "Massachusetts": "MA", "Michigan": "MI", "Minnesota": "MN",
+    "Mississippi": "MS", "Missouri": "MO", "Montana": "MT", "Nebraska": "NE",
+    "Nevada": "NV", "New Hampshire": "NH", "New Jersey": "NJ",
+    "New Mexico": "NM", "New York": "NY", "North Carolina": "NC",
+    "North Dakota": "ND", "Ohio": "OH", "Oklahoma": "OK", "Oregon": "OR",
+    "Pennsylvania": "PA", "Rhode Island": "RI", "South Carolina": "SC",
+    "South Dakota": "SD", "Tennessee": "TN", "Texas": "TX", "Utah": "UT",
+    "Vermont": "VT", "Virginia": "VA", "Washington": "WA",
+    "West Virginia": "WV", "Wisconsin": "WI", "Wyoming": "WY",
+}
+
+# Cities in and around the S'Belles footprint; ambiguous names resolve to the
+# Southeast market. Cities that are also common first names or words
+# (Charlotte, Savannah, Austin, Augusta, Columbia, Athens) are left out:
+# "Charlotte joins us" says nothing about North Carolina.
+CITIES = {
+    "Atlanta": "GA", "ATL": "GA", "Nashville": "TN",
+    "Dallas": "TX", "Houston": "TX", "Miami": "FL", "Tampa": "FL",
+    "Raleigh": "NC", "Charleston": "SC", "Memphis": "TN",
+    "Birmingham": "AL", "Jacksonville": "FL", "New Orleans": "LA",
+    "San Antonio": "TX", "Richmond": "VA", "Louisville": "KY",
+    "Knoxville": "TN", "Chattanooga": "TN", "Greenville": "SC",
+    "Macon": "GA",
+}
+
+REGIONAL = {
+    "Peach State": "GA", "Low Country": "SC", "Lowcountry": "SC",
+    "Southern": None, "Dixie": None, "Deep South": None, "Magnolia": None,
+    "Gulf Coast": None, "Bible Belt": None, "Sun Belt": None, "Sunbelt": None,
+}
+
+GAZETTEER = {
+    **{name: ("state", abbr) for name, abbr in US_STATES.items()},
+    **{abbr: ("abbrev", abbr) for abbr in US_STATES.values()},
+    **{name: ("city", state) for name, state in CITIES.items()},
+    **{name: ("regional", state) for name, state in REGIONAL.items()},
+}
+
+CASE_SENSITIVE_MAX_LEN = 3
+
+# A state mined from free text (episode titles, snippets) rather than the
+# source's own name needs this many mentions and this share of all state
+# mentions before it is accepted.
+MIN_TEXT_VOTES = 3
+MIN_TEXT_SHARE = 0.6
+
+
+# ---------------------------------------------------------------------------
+# Automaton
+# ---------------------------------------------------------------------------
+
+def build_matcher(gazetteer=GAZETTEER):
+    """Compile gazetteer terms into an Aho-Corasick automaton.
+
+    The automaton is a dict of parallel lists indexed by node: ``goto``
+    (char -> node), ``fail`` (failure link) and ``out`` (terms ending here,
+    including those reached through failure links).
+    """
+    goto, fail, out = [{}], [0], [[]]
+    for term in gazetteer:
+        node = 0
+        for ch in term.lower():
+            nxt = goto[node].get(ch)
+            if nxt is None:
+                nxt = len(goto)
+                goto[node][ch] = nxt
+                goto.append({})
+                fail.append(0)
+                out.append([])
+            node = nxt
+        out[node].append(term)
+
+    queue = deque(goto[0].values())
+    while queue:
+        node = queue.popleft()
+        for ch, nxt in goto[node].items():
+            queue.append(nxt)
+            f = fail[node]
+            while f and ch not in goto[f]:
+                f = fail[f]
+            fail[nxt] = goto[f].get(ch, 0)
+            out[nxt] = out[nxt] + out[fail[nxt]]
+    return {"goto": goto, "fail": fail, "out": out, "gazetteer": gazetteer}
+
+
+def _on_boundary(text, start, end):
+    return ((start == 0 or not text[start - 1].isalnum())
+            and (end == len(text) or not text[end].isalnum()))
+
+
+def find_terms(matcher, text):
+    """Gazetteer terms in ``text`` as (term, kind, state, start) tuples.
+
+    Overlapping matches keep the leftmost-longest term, so "West Virginia"
+    is not also reported as "Virginia".
+    """
+    goto, fail, out, gaz = matcher["goto"], matcher["fail"], matcher["out"], matcher["gazetteer"]
+    hits = []
+    node = 0
+    for i, ch in enumerate(text.lower()):
+        while node and ch not in goto[node]:
+            node = fail[node]
+        node = goto[node].get(ch, 0)
+        for term in out[node]:
+            start = i + 1 - len(term)
+            if not _on_boundary(text, start, i + 1):
+                continue
+            if len(term) <= CASE_SENSITIVE_MAX_LEN and text[start:i + 1] != term:
+                continue
+            kind, state = gaz[term]
+            hits.append((term, kind, state, start))
+
+    kept, covered_to = [], 0
+    for hit in sorted(hits, key=lambda h: (h[3], -len(h[0]))):
+        if hit[3] >= covered_to:
+            kept.append(hit)
+            covered_to = hit[3] + len(hit[0])
+    return kept
+
+
+MATCHER = build_matcher()
+
+
+def infer_state(texts, matcher=MATCHER, min_votes=1, min_share=0.0):
+    """Most-mentioned state across ``texts``.
+
+    Returns (state, hits). ``state`` is None when no term maps to a state,
+    when two states tie for the most mentions, or when the leader has fewer
+    than ``min_votes`` mentions or less than ``min_share`` of them.
+    """
+    hits = [h for text in texts if isinstance(text, str) for h in find_terms(matcher, text)]
+    votes = Counter(state for _, _, state, _ in hits if state)
+    top = votes.most_common(2)
+    if not top or (len(top) == 2 and top[0][1] == top[1][1]):
+        return None, hits
+    state, n = top[0]
+    if n < min_votes or n < min_share * sum(votes.values()):
+        return None, hits
+    return state, hits
+
+
+def geo_inference(name, texts, matcher=MATCHER):
+    """(geo_inferred, state) of a named source with supporting free text.
+
+    "explicit" when ``name`` itself maps to a state; "inferred" when only
+    ``texts`` do, with at least ``MIN_TEXT_VOTES`` mentions and
+    ``MIN_TEXT_SHARE`` of the state mentions; otherwise ("unknown", None).
+    """
+    state, _ = infer_state([name], matcher)
+    if state:
+        return "explicit", state
+    state, _ = infer_state(texts, matcher, MIN_TEXT_VOTES, MIN_TEXT_SHARE)
+    if state:
+        return "inferred", state
+    return "unknown", None
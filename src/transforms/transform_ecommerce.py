@@ -3,7 +3,9 @@
 import pandas as pd
 from src.transforms.utils import (
     DATA_DIR, WAREHOUSE_DIR, read_csv, log_step, validate_date_range,
+    control_totals, source_totals, record_control_totals,
 )
+from src.validation.contracts import assert_contract
 
 
 def transform_ecommerce():
@@ -12,9 +14,10 @@ def transform_ecommerce():
     print("\n=== fact_ecommerce_daily ===")
 
     files = sorted(DATA_DIR.glob("sBelles_transactions_*.csv"))
-    dfs = [read_csv(f, date_cols=["order_datetime"]) for f in files]
-    rows_in = sum(len(d) for d in dfs)
-    df = pd.concat(dfs, ignore_index=True)
+    dfs = {f.name: read_csv(f, date_cols=["order_datetime"]) for f in files}
+    rows_in = sum(len(d) for d in dfs.values())
+    df = pd.concat(dfs.values(), ignore_index=True)
+    source = source_totals(dfs, ["line_revenue", "quantity"], "order_datetime")
 
     # Derive date from order_datetime
     df["date"] = df["order_datetime"].dt.normalize()
@@ -29,12 +32,19 @@ def transform_ecommerce():
                 "discount_per_unit", "line_revenue", "promo_flag"]
     txn = df[txn_cols].sort_values(["date", "order_id"]).reset_index(drop=True)
     txn_out = WAREHOUSE_DIR / "fact_ecommerce" / "fact_ecommerce_transactions.csv"
+    assert_contract(txn, "fact_ecommerce_transactions")
     txn.to_csv(txn_out, index=False)
     txn_mn, txn_mx = txn["date"].min(), txn["date"].max()
     log_step("fact_ecommerce_transactions", rows_in, len(txn),
              actions=[f"all {len(txn):,} line items preserved (no aggregation)",
                       f"negative revenue rows: {len(neg_rev)}"],
              date_range=(str(txn_mn.date()), str(txn_mx.date())))
+    record_control_totals("fact_ecommerce_transactions",
+                          output=control_totals(txn, ["line_revenue", "quantity"], "date"),
+                          source=source,
+                          reconcile={"line_revenue": "line_revenue", "quantity": "quantity"},
+                          notes={"negative_revenue_rows": int(len(neg_rev))},
+                          file=txn_out)
 
     # Compute derived columns for aggregation
     df["discount_x_qty"] = df["discount_per_unit"] * df["quantity"]
@@ -56,12 +66,20 @@ def transform_ecommerce():
     mn, mx = validate_date_range(agg, "date")
 
     out = WAREHOUSE_DIR / "fact_ecommerce" / "fact_ecommerce_daily.csv"
+    assert_contract(agg, "fact_ecommerce_daily")
     agg.to_csv(out, index=False)
     log_step("fact_ecommerce_daily", rows_in, len(agg),
              actions=[f"aggregated {rows_in} line-items to {len(agg)} daily rows",
                       f"negative revenue rows (preserved): {len(neg_rev)}",
                       "groupby: date, dma_name, state, product_category, size, promo_flag"],
              date_range=(str(mn.date()), str(mx.date())))
+    record_control_totals("fact_ecommerce_daily",
+                          output=control_totals(agg, ["gross_revenue", "total_quantity",
+                                                      "line_items"], "date"),
+                          source=source,
+                          reconcile={"gross_revenue": "line_revenue",
+                                     "total_quantity": "quantity"},
+                          file=out)
     return agg
 
 
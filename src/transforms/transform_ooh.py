@@ -3,7 +3,12 @@
 import pandas as pd
 from src.transforms.utils import (
     DATA_DIR, WAREHOUSE_DIR, REFERENCE_DIR, read_csv, log_step, validate_date_range,
+    control_totals, source_totals, record_control_totals,
 )
+from src.validation.contracts import assert_contract
+
+# Additive columns tracked as control totals (placements is a count, not summed)
+MEASURES = ["spend", "impressions"]
 
 
 def transform_ooh():
@@ -11,9 +16,10 @@ def transform_ooh():
     divide spend/impressions by 7, join airport_state from reference."""
     print("\n=== fact_ooh_daily ===")
 
-    df = read_csv(DATA_DIR / "sBelles_ooh_airport_weekly.csv",
-                  date_cols=["week_start_date"])
+    src = DATA_DIR / "sBelles_ooh_airport_weekly.csv"
+    df = read_csv(src, date_cols=["week_start_date"])
     rows_in = len(df)
+    source = source_totals({src.name: df}, MEASURES, "week_start_date")
 
     # Join airport state from reference
     airport_ref = read_csv(REFERENCE_DIR / "airport_lookup.csv")
@@ -43,6 +49,7 @@ def transform_ooh():
     mn, mx = validate_date_range(result, "date")
 
     out = WAREHOUSE_DIR / "fact_ooh" / "fact_ooh_daily.csv"
+    assert_contract(result, "fact_ooh_daily")
     result.to_csv(out, index=False)
     log_step("fact_ooh_daily", rows_in, len(result),
              actions=[f"expanded {rows_in} weekly -> {len(result)} daily rows",
@@ -50,6 +57,9 @@ def transform_ooh():
                       "placements carried forward (not divided)",
                       "airport state joined from reference"],
              date_range=(str(mn.date()), str(mx.date())))
+    record_control_totals("fact_ooh_daily",
+                          output=control_totals(result, MEASURES, "date"),
+                          source=source, reconcile={c: c for c in MEASURES}, file=out)
     return result
 
 
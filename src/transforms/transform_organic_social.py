@@ -3,7 +3,12 @@
 import pandas as pd
 from src.transforms.utils import (
     DATA_DIR, WAREHOUSE_DIR, read_csv, log_step, validate_date_range,
+    control_totals, source_totals, record_control_totals,
 )
+from src.validation.contracts import assert_contract
+
+# Additive columns tracked as control totals
+MEASURES = ["impressions", "video_views", "likes", "comments", "shares", "clicks", "saves"]
 
 
 def transform_organic_social():
@@ -11,9 +16,9 @@ def transform_organic_social():
     print("\n=== fact_organic_social_daily ===")
 
     files = sorted(DATA_DIR.glob("sBelles_tiktok_owned_*.csv"))
-    dfs = [read_csv(f, date_cols=["date"]) for f in files]
-    rows_in = sum(len(d) for d in dfs)
-    df = pd.concat(dfs, ignore_index=True)
+    dfs = {f.name: read_csv(f, date_cols=["date"]) for f in files}
+    rows_in = sum(len(d) for d in dfs.values())
+    df = pd.concat(dfs.values(), ignore_index=True)
 
     # Aggregate to daily grain
     agg = df.groupby("date").agg(
@@ -33,12 +38,17 @@ def transform_organic_social():
     mn, mx = validate_date_range(agg, "date")
 
     out = WAREHOUSE_DIR / "fact_organic_social" / "fact_organic_social_daily.csv"
+    assert_contract(agg, "fact_organic_social_daily")
     agg.to_csv(out, index=False)
     log_step("fact_organic_social_daily", rows_in, len(agg),
              actions=[f"aggregated {rows_in} post-level rows to {len(agg)} daily rows",
                       "followers_eod = MAX(followers) per day",
                       "all other metrics summed"],
              date_range=(str(mn.date()), str(mx.date())))
+    record_control_totals("fact_organic_social_daily",
+                          output=control_totals(agg, MEASURES, "date"),
+                          source=source_totals(dfs, MEASURES, "date"),
+                          reconcile={c: c for c in MEASURES}, file=out)
     return agg
 
 
@@ -1,9 +1,13 @@
 """Transform paid social data: union 9 CSVs with schema drift resolution."""
 
+import numpy as np
 import pandas as pd
 from src.transforms.utils import (
     DATA_DIR, WAREHOUSE_DIR, read_csv, log_step, validate_date_range,
+    control_totals, source_totals, record_control_totals,
 )
+from src.validation.contracts import assert_contract
+from src.validation.grain import SOURCE_COL, describe, find_duplicate_keys
 
 # Target column order for the fact table
 TARGET_COLS = [
@@ -13,6 +17,9 @@ TARGET_COLS = [
     "optimization_goal", "age_target", "audience_segment",
 ]
 
+# Additive columns tracked as control totals
+MEASURES = ["spend", "impressions", "clicks"]
+
 
 def _resolve_schema_drift(df, filename):
     """Resolve known schema drift issues per source-to-target mapping."""
@@ -48,37 +55,50 @@ def transform_paid_social():
     print("\n=== fact_paid_social_daily ===")
 
     files = sorted(DATA_DIR.glob("sBelles_paid_*.csv"))
-    dfs = []
+    dfs = {}
     for f in files:
         df = read_csv(f, date_cols=["date"])
-        df = _resolve_schema_drift(df, f.name)
-        dfs.append(df)
+        dfs[f.name] = _resolve_schema_drift(df, f.name)
 
-    rows_in = sum(len(d) for d in dfs)
-    result = pd.concat(dfs, ignore_index=True)
+    rows_in = sum(len(d) for d in dfs.values())
+    result = pd.concat(dfs.values(), ignore_index=True)
 
     # Ensure all target columns exist
     for col in TARGET_COLS:
         if col not in result.columns:
             result[col] = pd.NA
 
-    result = result[TARGET_COLS]
-
-    # Verify grain: (date, channel, campaign_id, dma_name) should be unique
+    # Verify grain: (date, channel, campaign_id, dma_name) should be unique.
+    # Rows keep their source file so offending keys can be traced back.
     grain_cols = ["date", "channel", "campaign_id", "dma_name"]
-    dupes = result.duplicated(subset=grain_cols, keep=False).sum()
-    grain_ok = dupes == 0
+    keys = result[grain_cols].assign(
+        **{SOURCE_COL: np.repeat(list(dfs), [len(d) for d in dfs.values()])})
+    offending = find_duplicate_keys(keys, grain_cols)
+    dupes = int(offending["rows"].sum())
+    grain_ok = offending.empty
+    for line in describe(offending, grain_cols):
+        print(f"  DUPLICATE KEY {line}")
+
+    result = result[TARGET_COLS]
 
     result = result.sort_values(["date", "channel", "campaign_id", "dma_name"]).reset_index(drop=True)
     mn, mx = validate_date_range(result, "date")
 
     out = WAREHOUSE_DIR / "fact_paid_social" / "fact_paid_social_daily.csv"
+    assert_contract(result, "fact_paid_social_daily")
     result.to_csv(out, index=False)
     log_step("fact_paid_social_daily", rows_in, len(result),
              actions=[f"unioned {len(files)} files",
                       "schema drift resolved (3 files)",
                       f"grain check (date,channel,campaign_id,dma_name): {'PASS' if grain_ok else f'FAIL ({dupes} dupes)'}"],
              date_range=(str(mn.date()), str(mx.date())))
+    record_control_totals(
+        "fact_paid_social_daily",
+        output=control_totals(result, MEASURES, "date"),
+        source=source_totals(dfs, MEASURES, "date"),
+        reconcile={c: c for c in MEASURES},
+        file=out,
+    )
     return result
 
 
@@ -3,7 +3,9 @@
 import pandas as pd
 from src.transforms.utils import (
     DATA_DIR, WAREHOUSE_DIR, read_csv, log_step, validate_date_range,
+    control_totals, source_totals, record_control_totals,
 )
+from src.validation.contracts import assert_contract
 
 
 def transform_podcast():
@@ -11,9 +13,10 @@ def transform_podcast():
     print("\n=== fact_podcast_daily ===")
 
     files = sorted(DATA_DIR.glob("sBelles_podcast_mentions_*.csv"))
-    dfs = [read_csv(f, date_cols=["mention_datetime", "episode_release_date"]) for f in files]
-    rows_in = sum(len(d) for d in dfs)
-    df = pd.concat(dfs, ignore_index=True)
+    dfs = {f.name: read_csv(f, date_cols=["mention_datetime", "episode_release_date"])
+           for f in files}
+    rows_in = sum(len(d) for d in dfs.values())
+    df = pd.concat(dfs.values(), ignore_index=True)
 
     # Derive date from mention_datetime
     df["date"] = df["mention_datetime"].dt.normalize()
@@ -34,6 +37,7 @@ def transform_podcast():
     mn, mx = validate_date_range(agg, "date")
 
     out = WAREHOUSE_DIR / "fact_podcast" / "fact_podcast_daily.csv"
+    assert_contract(agg, "fact_podcast_daily")
     agg.to_csv(out, index=False)
     log_step("fact_podcast_daily", rows_in, len(agg),
              actions=[f"grouped {rows_in} mention rows to {len(agg)} episode-date rows",
@@ -41,6 +45,11 @@ def transform_podcast():
                       "estimated_impressions: SUM",
                       f"multi-mention episodes: {(agg['mentions'] > 1).sum()}"],
              date_range=(str(mn.date()), str(mx.date())))
+    record_control_totals("fact_podcast_daily",
+                          output=control_totals(agg, ["estimated_impressions", "mentions"], "date"),
+                          source=source_totals(dfs, ["estimated_impressions"], "mention_datetime"),
+                          reconcile={"estimated_impressions": "estimated_impressions"},
+                          file=out)
     return agg
 
 
@@ -3,7 +3,9 @@
 import pandas as pd
 from src.transforms.utils import (
     DATA_DIR, WAREHOUSE_DIR, read_csv, log_step, validate_date_range,
+    control_totals, source_totals, record_control_totals,
 )
+from src.validation.contracts import assert_contract
 
 
 def transform_web_analytics():
@@ -24,6 +26,8 @@ def transform_web_analytics():
         dfs[key] = read_csv(path, date_cols=["event_datetime"])
 
     rows_in = sum(len(d) for d in dfs.values())
+    source = source_totals({p.name: dfs[k] for k, p in file_map.items()},
+                           date_col="event_datetime")
 
     # Dedup: drop Dec 2023 rows from Q1 2024 file
     q1_24 = dfs["q1_24"]
@@ -43,6 +47,7 @@ def transform_web_analytics():
                 "dma_name", "state", "zip_code"]
     evt = df[evt_cols].sort_values(["date", "event_datetime"]).reset_index(drop=True)
     evt_out = WAREHOUSE_DIR / "fact_web_analytics" / "fact_web_analytics_events.csv"
+    assert_contract(evt, "fact_web_analytics_events")
     evt.to_csv(evt_out, index=False)
     evt_mn, evt_mx = evt["date"].min(), evt["date"].max()
     null_campaign = evt["campaign"].isna().sum()
@@ -52,6 +57,10 @@ def transform_web_analytics():
                       f"all {len(evt):,} events preserved (no aggregation)",
                       f"null campaign: {null_campaign:,} ({null_pct:.1f}%)"],
              date_range=(str(evt_mn.date()), str(evt_mx.date())))
+    notes = {"dedup_dropped_rows": int(dec_dropped), "rows_after_dedup": int(rows_after_dedup)}
+    record_control_totals("fact_web_analytics_events",
+                          output=control_totals(evt, date_col="date"),
+                          source=source, notes=notes, file=evt_out)
 
     # Aggregate to daily grain
     groupby_cols = ["date", "traffic_source", "traffic_medium", "campaign",
@@ -66,6 +75,7 @@ def transform_web_analytics():
     mn, mx = validate_date_range(agg, "date")
 
     out = WAREHOUSE_DIR / "fact_web_analytics" / "fact_web_analytics_daily.csv"
+    assert_contract(agg, "fact_web_analytics_daily")
     agg.to_csv(out, index=False)
     log_step("fact_web_analytics_daily", rows_in, len(agg),
              actions=[f"dropped {dec_dropped} Dec 2023 rows from Q1 2024 file",
@@ -73,6 +83,9 @@ def transform_web_analytics():
                       f"aggregated events to {len(agg):,} daily rows",
                       "groupby: date, traffic_source, traffic_medium, campaign, device_category, dma_name, state"],
              date_range=(str(mn.date()), str(mx.date())))
+    record_control_totals("fact_web_analytics_daily",
+                          output=control_totals(agg, ["pageviews", "sessions", "users"], "date"),
+                          source=source, notes=notes, file=out)
     return agg
 
 
@@ -1,5 +1,7 @@
 """Shared utilities for S'Belles ETL pipeline."""
 
+import hashlib
+import json
 import pathlib
 import pandas as pd
 
@@ -41,3 +43,94 @@ def validate_date_range(df, date_col, start=DATE_START, end=DATE_END):
             f"(expected {start} to {end})"
         )
     return mn, mx
+
+
+# ---------------------------------------------------------------------------
+# Build manifest (control totals)
+# ---------------------------------------------------------------------------
+
+MANIFEST_PATH = WAREHOUSE_DIR / "build_manifest.json"
+
+
+def control_totals(df, sum_cols=(), date_col=None, by_month=True):
+    """Row count, column sums, date bounds and a per-month breakdown."""
+    sum_cols = [c for c in sum_cols if c in df.columns]
+    totals = {
+        "rows": int(len(df)),
+        "sums": {c: float(df[c].sum()) for c in sum_cols},
+    }
+    if date_col:
+        dates = pd.to_datetime(df[date_col])
+        totals["date_min"] = str(dates.min().date())
+        totals["date_max"] = str(dates.max().date())
+        if by_month:
+            months = dates.to_numpy().astype("datetime64[M]")
+            grouped = df[sum_cols].groupby(months)
+            sums, sizes = grouped.sum(), grouped.size()
+            totals["by_month"] = {
+                str(m)[:7]: {"rows": int(n),
+                             "sums": {c: float(v) for c, v in zip(sum_cols, row)}}
+                for m, n, row in zip(sizes.index, sizes.to_numpy(), sums.to_numpy())
+            }
+    return totals
+
+
+def source_totals(frames, sum_cols=(), date_col=None):
+    """Control totals over raw input frames keyed by filename.
+
+    ``frames`` maps filename -> DataFrame as read (after schema-drift
+    resolution). Returns combined totals plus a per-file breakdown.
+    """
+    combined = control_totals(pd.concat(frames.values(), ignore_index=True),
+                              sum_cols, date_col)
+    combined["by_file"] = {
+        name: control_totals(df, sum_cols, date_col, by_month=False)
+        for name, df in frames.items()
+    }
+    return combined
+
+
+def sha256_file(path, block_size=1 << 20):
+    """Hex SHA-256 of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def file_fingerprint(path):
+    """Checksum, byte size and column count of a written CSV."""
+    path = pathlib.Path(path)
+    with open(path) as f:
+        columns = len(f.readline().rstrip("\r\n").split(","))
+    return {"sha256": sha256_file(path), "size": path.stat().st_size, "columns": columns}
+
+
+def load_manifest(path=MANIFEST_PATH):
+    """Read the build manifest written by the transforms."""
+    return json.loads(path.read_text())
+
+
+def record_control_totals(table, output, source=None, reconcile=None, notes=None,
+                          file=None, path=MANIFEST_PATH):
+    """Merge one table's control totals into the build manifest.
+
+    ``reconcile`` maps output sum column -> source sum column for financial
+    reconciliation; ``notes`` holds transform-specific counts (e.g. rows
+    dropped by dedup); ``file`` is the CSV just written, whose fingerprint
+    ties the totals to its exact bytes. Other tables' entries are left
+    untouched, so each transform can run on its own.
+    """
+    manifest = json.loads(path.read_text()) if path.exists() else {}
+    if file is not None:
+        output = dict(output, file=file_fingerprint(file))
+    entry = {"output": output}
+    if source is not None:
+        entry["source"] = source
+    if reconcile:
+        entry["reconcile"] = reconcile
+    if notes:
+        entry["notes"] = notes
+    manifest[table] = entry
+    path.write_text(json.dumps(dict(sorted(manifest.items())), indent=2) + "\n")
@@ -0,0 +1,482 @@
+"""Declarative data contracts for every warehouse table.
+
+One contract per table states what the table must look like: column types,
+nullability, value ranges, allowed categories, grain, date bounds and the
+expected row count.
+
+Open vocabularies — DMAs, web campaigns, podcasts — are not listed here:
+the dimensions are built from the source data, so a fact column declares a
+``ref`` to its dimension column instead and is checked against whatever the
+ETL found (a new campaign or DMA flows through rather than aborting the
+build). Those dimensions have a minimum row count rather than an exact one.
+
+The validators (``run_all``, ``post_build_checks``, ``submission_check``)
+and the transforms all read their expectations from here instead of keeping
+their own copies.
+
+A contract compiles into a check plan: a list of vectorized steps, each of
+which folds one chunk into a running state. ``run_plan`` feeds every chunk
+through every step once, so a table — whole or streamed in chunks — is read
+a single time no matter how many checks its contract declares.
+
+    check_table(df, "fact_ooh_daily")             # list of engine results
+    check_chunks(pd.read_csv(path, chunksize=1_000_000), "fact_ooh_daily")
+    assert_contract(df, "fact_ooh_daily")         # pre-write, raises
+"""
+
+import pathlib
+
+import numpy as np
+import pandas as pd
+
+from src.transforms.utils import DATE_START, DATE_END, WAREHOUSE_DIR
+from src.validation.engine import PASS, result
+from src.validation.grain import hash_keys, repeated_hashes
+
+# ---------------------------------------------------------------------------
+# Shared vocabularies
+# ---------------------------------------------------------------------------
+
+PRODUCT_CATEGORIES = ["Girls Bottoms", "Girls Dresses", "Girls Tops"]
+SIZES = ["XS (4-5)", "S (6-7)", "M (8-10)", "L (12-14)"]
+TRAFFIC_SOURCES = ["direct", "email", "facebook", "google", "instagram", "tiktok"]
+TRAFFIC_MEDIUMS = ["cpc", "email", "none", "paid_social"]
+DEVICES = ["desktop", "mobile", "tablet"]
+
+# Dimension columns holding the source-derived vocabularies (table, column,
+# separator when one dimension cell lists several values).
+DMAS = ("dim_geography", "dma_name", None)
+WEB_CAMPAIGNS = ("dim_campaign_initiative", "web_analytics_campaign_value", ", ")
+PODCASTS = ("dim_podcast", "podcast_name", None)
+
+# Column kinds -> the check each one compiles to
+KINDS = ("datetime", "int", "float", "str", "bool")
+
+
+def col(kind, nullable=False, lo=None, hi=None, allowed=None, empty_ok=False, ref=None):
+    """Column spec. ``empty_ok`` marks columns that are entirely null by design;
+    ``ref`` names a dimension column (see ``DMAS``) whose values are allowed."""
+    assert kind in KINDS, kind
+    return {"kind": kind, "nullable": nullable or empty_ok, "lo": lo, "hi": hi,
+            "allowed": allowed, "empty_ok": empty_ok, "ref": ref}
+
+
+def _daily(path, submission, rows, grain, columns, **extra):
+    return {"path": path, "submission": submission, "rows": rows, "grain": grain,
+            "date_col": "date", "date_bounds": (DATE_START, DATE_END),
+            "columns": columns, **extra}
+
+
+# ---------------------------------------------------------------------------
+# Contracts (declaration order = run_all output order)
+# ---------------------------------------------------------------------------
+
+CONTRACTS = {
+    "dim_date": _daily("dimensions/dim_date.csv", "dimensions/dim_date.csv", 547, ["date"], {
+        "date": col("datetime"),
+        "day_of_week": col("str", allowed=["Monday", "Tuesday", "Wednesday", "Thursday",
+                                           "Friday", "Saturday", "Sunday"]),
+        "day_of_week_num": col("int", lo=1, hi=7),
+        "week_start_date": col("datetime"),
+        "month": col("int", lo=1, hi=12),
+        "month_name": col("str"),
+        "quarter": col("int", lo=1, hi=4),
+        "year": col("int", lo=2023, hi=2024),
+        "is_weekend": col("bool"),
+        "season_flag": col("str", allowed=["back_to_school", "black_friday_holiday", "regular"]),
+    }),
+    "dim_geography": {
+        "path": "dimensions/dim_geography.csv", "submission": "dimensions/dim_geography.csv",
+        "rows": None, "min_rows": 30, "grain": ["geo_key"], "date_col": None,
+        "columns": {
+            "geo_key": col("int", lo=1),
+            "dma_name": col("str", nullable=True),
+            "state": col("str", nullable=True),
+            "zip_code": col("float", empty_ok=True),  # not populated at this grain
+            "airport_code": col("str", nullable=True),
+            "airport_name": col("str", nullable=True),
+            "geo_scope": col("str", allowed=["local", "national", "inferred"]),
+        },
+    },
+    "dim_channel": {
+        "path": "dimensions/dim_channel.csv", "submission": "dimensions/dim_channel.csv",
+        "rows": 7, "grain": ["channel_key"], "date_col": None,
+        "columns": {
+            "channel_key": col("int", lo=1),
+            "channel_name": col("str"),
+            "channel_group": col("str", allowed=["paid_social", "organic_social",
+                                                 "web_analytics", "earned_media", "ooh"]),
+            "is_paid": col("bool"),
+        },
+    },
+    "dim_campaign_initiative": {
+        "path": "dimensions/dim_campaign_initiative.csv",
+        "submission": "dimensions/dim_campaign_initiative.csv",
+        "rows": None, "min_rows": 6, "grain": ["initiative_key"], "date_col": None,
+        "columns": {
+            "initiative_key": col("int", lo=1),
+            "initiative_name": col("str"),
+            "paid_social_campaign_pattern": col("str", nullable=True),
+            "web_analytics_campaign_value": col("str", nullable=True),
+            "notes": col("str"),
+            "match_confidence": col("float", nullable=True, lo=0, hi=1),
+        },
+    },
+    "dim_podcast": {
+        "path": "dimensions/dim_podcast.csv", "submission": "dimensions/dim_podcast.csv",
+        "rows": None, "min_rows": 5, "grain": ["podcast_key"], "date_col": None,
+        "columns": {
+            "podcast_key": col("int", lo=1),
+            "podcast_name": col("str"),
+            "geo_inferred": col("str", allowed=["explicit", "inferred", "unknown"]),
+            "geo_state": col("str", nullable=True),
+        },
+    },
+    "fact_paid_social_daily": _daily(
+        "fact_paid_social/fact_paid_social_daily.csv", "paid_social/fact_paid_social_daily.csv",
+        24_615, ["date", "channel", "campaign_id", "dma_name"], {
+            "date": col("datetime"),
+            "channel": col("str", allowed=["Instagram", "Pinterest", "TikTok"]),
+            "campaign_name": col("str"),
+            "campaign_id": col("str"),
+            "dma_name": col("str", ref=DMAS),
+            "state": col("str", allowed=["GA"]),
+            "spend": col("float", lo=0),
+            "impressions": col("int", lo=0),
+            "clicks": col("int", lo=0),
+            "video_views": col("int", lo=0),
+            # Missing from the Pinterest part-1 export (schema drift)
+            "video_25pct": col("int", nullable=True, lo=0),
+            "video_50pct": col("int", nullable=True, lo=0),
+            "video_75pct": col("int", lo=0),
+            "video_completes": col("int", lo=0),
+            # Missing from the TikTok part-2 export (schema drift)
+            "optimization_goal": col("str", nullable=True),
+            "age_target": col("str"),
+            "audience_segment": col("str"),
+        }),
+    "fact_web_analytics_daily": _daily(
+        "fact_web_analytics/fact_web_analytics_daily.csv",
+        "web_analytics/fact_web_analytics_daily.csv", 46_818,
+        ["date", "traffic_source", "traffic_medium", "campaign", "device_category",
+         "dma_name", "state"], {
+            "date": col("datetime"),
+            "traffic_source": col("str", allowed=TRAFFIC_SOURCES),
+            "traffic_medium": col("str", allowed=TRAFFIC_MEDIUMS),
+            "campaign": col("str", nullable=True, ref=WEB_CAMPAIGNS),
+            "device_category": col("str", allowed=DEVICES),
+            "dma_name": col("str", ref=DMAS),
+            "state": col("str", allowed=["GA"]),
+            "pageviews": col("int", lo=1),
+            "sessions": col("int", lo=1),
+            "users": col("int", lo=1),
+        }),
+    "fact_ecommerce_daily": _daily(
+        "fact_ecommerce/fact_ecommerce_daily.csv", "ecommerce/fact_ecommerce_daily.csv",
+        14_800, ["date", "dma_name", "product_category", "size", "promo_flag"], {
+            "date": col("datetime"),
+            "dma_name": col("str", ref=DMAS),
+            "state": col("str", allowed=["GA"]),
+            "product_category": col("str", allowed=PRODUCT_CATEGORIES),
+            "size": col("str", allowed=SIZES),
+            "promo_flag": col("int", allowed=[0, 1]),
+            "orders": col("int", lo=1),
+            "line_items": col("int", lo=1),
+            "total_quantity": col("int", lo=1),
+            "gross_revenue": col("float"),  # negative revenue rows are preserved
+            "total_discount": col("float", lo=0),
+            "total_cost": col("float", lo=0),
+            "avg_unit_price": col("float", lo=0),
+        }),
+    "fact_organic_social_daily": _daily(
+        "fact_organic_social/fact_organic_social_daily.csv",
+        "organic_social/fact_organic_social_daily.csv", 441, ["date"], {
+            "date": col("datetime"),
+            "posts": col("int", lo=1),
+            "followers_eod": col("int", lo=0),
+            "impressions": col("int", lo=0),
+            "video_views": col("int", lo=0),
+            "video_completes": col("int", lo=0),
+            "likes": col("int", lo=0),
+            "comments": col("int", lo=0),
+            "shares": col("int", lo=0),
+            "clicks": col("int", lo=0),
+            "saves": col("int", lo=0),
+        }),
+    "fact_podcast_daily": _daily(
+        "fact_podcast/fact_podcast_daily.csv", "podcast/fact_podcast_daily.csv",
+        85, ["date", "podcast_name", "episode_title"], {
+            "date": col("datetime"),
+            "podcast_name": col("str", ref=PODCASTS),
+            "episode_title": col("str"),
+            "host_name": col("str"),
+            "mentions_brand": col("int", allowed=[0, 1]),
+            "mentions_founder": col("int", allowed=[0, 1]),
+            "sentiment": col("str", allowed=["positive", "neutral", "mixed", "negative"]),
+            "estimated_impressions": col("int", lo=0),
+            "episode_rating": col("float", lo=0, hi=5),
+            "mentions": col("int", lo=1),
+        }),
+    "fact_ooh_daily": _daily(
+        "fact_ooh/fact_ooh_daily.csv", "ooh/fact_ooh_daily.csv",
+        10_920, ["date", "airport_code", "format", "audience_segment"], {
+            "date": col("datetime"),
+            "airport_code": col("str"),
+            "airport_name": col("str"),
+            "state": col("str"),
+            "format": col("str"),
+            "audience_segment": col("str"),
+            "spend": col("float", lo=0),
+            "impressions": col("float", lo=0),
+            "placements": col("int", lo=0),
+        }),
+    "fact_ecommerce_transactions": _daily(
+        "fact_ecommerce/fact_ecommerce_transactions.csv",
+        "ecommerce/fact_ecommerce_transactions.csv", 17_106, None, {
+            "date": col("datetime"),
+            "order_id": col("str"),
+            "user_id": col("str"),
+            "dma_name": col("str", ref=DMAS),
+            "state": col("str", allowed=["GA"]),
+            "zip_code": col("int"),
+            "product_category": col("str", allowed=PRODUCT_CATEGORIES),
+            "size": col("str", allowed=SIZES),
+            "quantity": col("int", lo=1),
+            "unit_price": col("float", lo=0),
+            "unit_cost": col("float", lo=0),
+            "discount_per_unit": col("float", lo=0),
+            "line_revenue": col("float"),  # returns/adjustments can be negative
+            "promo_flag": col("int", allowed=[0, 1]),
+        }),
+    "fact_web_analytics_events": _daily(
+        "fact_web_analytics/fact_web_analytics_events.csv",
+        "web_analytics/fact_web_analytics_events.csv", 51_234, None, {
+            "date": col("datetime"),
+            "event_datetime": col("datetime"),
+            "user_id": col("str"),
+            "session_id": col("str"),
+            "page_url": col("str"),
+            "traffic_source": col("str", allowed=TRAFFIC_SOURCES),
+            "traffic_medium": col("str", allowed=TRAFFIC_MEDIUMS),
+            "campaign": col("str", nullable=True, ref=WEB_CAMPAIGNS),
+            "device_category": col("str", allowed=DEVICES),
+            "dma_name": col("str", ref=DMAS),
+            "state": col("str", allowed=["GA"]),
+            "zip_code": col("int"),
+        }),
+}
+
+
+class ContractError(ValueError):
+    """Raised by ``assert_contract`` when a frame breaks its table contract."""
+
+
+# ---------------------------------------------------------------------------
+# Lookups used by the validators
+# ---------------------------------------------------------------------------
+
+def grain(table):
+    return CONTRACTS[table]["grain"]
+
+
+def date_bounds(table):
+    return CONTRACTS[table].get("date_bounds", (DATE_START, DATE_END))
+
+
+def empty_ok_columns(table):
+    return {c for c, spec in CONTRACTS[table]["columns"].items() if spec["empty_ok"]}
+
+
+def contract_columns(table):
+    return list(CONTRACTS[table]["columns"])
+
+
+def row_bounds(table):
+    """(lo, hi) expected row count; hi is None for an open-ended minimum."""
+    contract = CONTRACTS[table]
+    if contract.get("rows") is not None:
+        return contract["rows"], contract["rows"]
+    return contract.get("min_rows"), None
+
+
+def rows_clause(lo, hi):
+    return f"{lo:,}" if lo == hi else f">= {lo:,}"
+
+
+def reference_values(ref, warehouse=WAREHOUSE_DIR):
+    """Values of a ``ref`` dimension column as built on disk, or None when the
+    dimension has not been built yet."""
+    table, column, sep = ref
+    path = pathlib.Path(warehouse) / CONTRACTS[table]["path"]
+    if not path.exists():
+        return None
+    values = pd.read_csv(path, usecols=[column])[column].dropna().astype(str)
+    if sep:
+        values = values.str.split(sep).explode().str.strip()
+    return set(values)
+
+
+# ---------------------------------------------------------------------------
+# Compilation
+# ---------------------------------------------------------------------------
+#
+# A step is {"name", "needs", "zero", "update": fn(chunk) -> partial,
+# "merge": fn(a, b), "finish": fn(total) -> (ok, observed, expected)}.
+# Partials from successive chunks are merged starting from "zero", so steps
+# never need the whole table at once. A step whose "needs" columns are absent
+# contributes "zero"; the missing columns are reported once by the
+# "columns present" step.
+
+def _add(a, b):
+    return a + b
+
+
+def _violations(name, needs, fn):
+    """Step that counts rows failing a vectorized predicate."""
+    return {"name": name, "needs": needs, "zero": 0, "merge": _add,
+            "update": lambda chunk: int(fn(chunk)),
+            "finish": lambda n: (n == 0, n, 0)}
+
+
+def _coerce(s, kind):
+    """Values of ``s`` as the contract kind; unparsable values become NaN/NaT."""
+    if kind == "datetime":
+        return s if s.dtype.kind == "M" else pd.to_datetime(s, errors="coerce")
+    if kind in ("int", "float"):
+        return s if s.dtype.kind in "iuf" else pd.to_numeric(s, errors="coerce")
+    return s
+
+
+def _type_errors(s, kind):
+    """Number of non-null values that do not conform to ``kind``."""
+    present = s.notna()
+    if kind == "str":
+        textual = s.dtype.kind in "OUT" or isinstance(s.dtype, pd.StringDtype)
+        return 0 if textual else int(present.sum())
+    if kind == "bool":
+        return 0 if s.dtype.kind == "b" else int((present & ~s.isin([True, False])).sum())
+    values = _coerce(s, kind)
+    bad = present & values.isna()
+    if kind == "int":
+        numeric = values.astype("float64")
+        bad |= values.notna() & (np.floor(numeric) != numeric)
+    return int(bad.sum())
+
+
+def _column_steps(name, spec):
+    kind = spec["kind"]
+    needs = [name]
+    steps = [_violations(f"{name}: type {kind}", needs, lambda c: _type_errors(c[name], kind))]
+    if not spec["nullable"]:
+        steps.append(_violations(f"{name}: not null", needs, lambda c: c[name].isna().sum()))
+    if spec["lo"] is not None:
+        lo = spec["lo"]
+        steps.append(_violations(f"{name}: >= {lo}", needs,
+                                 lambda c: (_coerce(c[name], kind) < lo).sum()))
+    if spec["hi"] is not None:
+        hi = spec["hi"]
+        steps.append(_violations(f"{name}: <= {hi}", needs,
+                                 lambda c: (_coerce(c[name], kind) > hi).sum()))
+    if spec["allowed"] is not None:
+        allowed = spec["allowed"]
+        steps.append(_violations(f"{name}: in {len(allowed)} allowed values", needs,
+                                 lambda c: (c[name].notna() & ~c[name].isin(allowed)).sum()))
+    known = reference_values(spec["ref"]) if spec["ref"] else None
+    if known is not None:
+        dim_table, dim_col, _ = spec["ref"]
+        steps.append(_violations(f"{name}: in {dim_table}.{dim_col}", needs,
+                                 lambda c: (c[name].notna()
+                                            & ~c[name].astype(str).isin(known)).sum()))
+    if not spec["empty_ok"]:
+        steps.append({"name": f"{name}: not entirely null", "needs": needs, "zero": 0,
+                      "merge": _add, "update": lambda c: int(c[name].notna().sum()),
+                      "finish": lambda n: (n > 0, n, "> 0")})
+    return steps
+
+
+def _grain_finish(hashes):
+    # 64-bit key hashes: a repeated hash is a duplicate key for all practical
+    # purposes; grain.find_duplicate_keys confirms and lists the keys.
+    dupes = len(repeated_hashes(hashes))
+    return dupes == 0, dupes, 0
+
+
+def compile_contract(table, rows=True):
+    """Compile ``table``'s contract into a list of steps.
+
+    ``rows=False`` drops the expected-row-count step, for pre-write
+    assertions on data whose volume may legitimately change.
+    """
+    contract = CONTRACTS[table]
+    columns = contract["columns"]
+    steps = [{"name": "columns present", "needs": [], "zero": [],
+              "update": lambda c: sorted(set(columns) - set(c.columns)),
+              "merge": lambda a, b: sorted(set(a) | set(b)),
+              "finish": lambda missing: (not missing, missing, [])}]
+
+    for name, spec in columns.items():
+        steps += _column_steps(name, spec)
+
+    if contract.get("date_col"):
+        dcol = contract["date_col"]
+        start, end = date_bounds(table)
+        steps.append(_violations(
+            f"{dcol}: within {start.date()}..{end.date()}", [dcol],
+            lambda c: (c[dcol].notna() & ~_coerce(c[dcol], "datetime").between(start, end)).sum()))
+
+    if contract.get("grain"):
+        keys = contract["grain"]
+        steps.append({"name": f"grain unique ({', '.join(keys)})", "needs": keys,
+                      "zero": np.empty(0, dtype=np.uint64),
+                      "update": lambda c: hash_keys(c, keys),
+                      "merge": lambda a, b: np.concatenate([a, b]),
+                      "finish": _grain_finish})
+
+    lo, hi = row_bounds(table)
+    if rows and lo is not None:
+        expected = rows_clause(lo, hi)
+        steps.append({"name": f"row count ({expected})", "needs": [], "zero": 0,
+                      "update": len, "merge": _add,
+                      "finish": lambda n: (n >= lo and (hi is None or n <= hi), n,
+                                           lo if lo == hi else expected)})
+    return steps
+
+
+# ---------------------------------------------------------------------------
+# Execution
+# ---------------------------------------------------------------------------
+
+def run_plan(steps, chunks):
+    """Fold every chunk through every step in one pass; return engine results."""
+    totals = [step["zero"] for step in steps]
+    for chunk in chunks:
+        present = set(chunk.columns)
+        for i, step in enumerate(steps):
+            if set(step["needs"]) <= present:
+                totals[i] = step["merge"](totals[i], step["update"](chunk))
+    return [dict(result(*step["finish"](total)), check=step["name"])
+            for step, total in zip(steps, totals)]
+
+
+def check_table(df, table, rows=True):
+    """Run ``table``'s contract over an in-memory frame."""
+    return run_plan(compile_contract(table, rows=rows), [df])
+
+
+def check_chunks(chunks, table, rows=True):
+    """Run ``table``'s contract over an iterable of chunks in one pass."""
+    return run_plan(compile_contract(table, rows=rows), chunks)
+
+
+def failures(results):
+    return [r for r in results if r["status"] != PASS]
+
+
+def assert_contract(df, table):
+    """Pre-write assertion for transforms: raise ``ContractError`` listing every
+    broken clause. Row counts are not asserted (see ``compile_contract``)."""
+    bad = failures(check_table(df, table, rows=False))
+    if bad:
+        detail = "; ".join(f"{r['check']} (observed {r['observed']!r})" for r in bad)
+        raise ContractError(f"{table} breaks its contract: {detail}")
+    return df
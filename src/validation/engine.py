@@ -0,0 +1,185 @@
+"""Single-scan rule engine for warehouse validation.
+
+Checks are declared as rules grouped by the table they validate. The engine
+works out which columns every rule needs, reads each table exactly once with
+only those columns, then evaluates all of the table's rules against the
+in-memory frame. Every rule produces one structured result with its timing.
+
+A rule is a dict:
+
+    {
+        "name":     "grain_unique",
+        "table":    "fact_paid_social_daily",       # primary table
+        "section":  "grain",                        # report grouping
+        "columns":  {"fact_paid_social_daily": [...]},  # None = all columns
+        "check":    fn(frames) -> dict(status, observed, expected, lines),
+    }
+
+``frames`` maps table name -> DataFrame for the primary table and every
+other table named in ``columns``. A rule with ``"columns": {}`` reads no
+table at all (e.g. file-existence checks).
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+PASS = "PASS"
+FAIL = "FAIL"
+INFO = "INFO"
+
+
+def result(ok, observed=None, expected=None, lines=None):
+    """Build a rule outcome from a pass/fail bool."""
+    return {
+        "status": PASS if ok else FAIL,
+        "observed": observed,
+        "expected": expected,
+        "lines": lines or [],
+    }
+
+
+def info(observed=None, lines=None):
+    """Build an informational rule outcome (never fails)."""
+    return {"status": INFO, "observed": observed, "expected": None,
+            "lines": lines or []}
+
+
+def plain(value):
+    """Convert numpy/pandas scalars and containers to JSON-friendly values."""
+    if isinstance(value, dict):
+        return {str(k): plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [plain(v) for v in value]
+    if isinstance(value, pd.Timestamp):
+        return str(value.date()) if value == value.normalize() else str(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+# ---------------------------------------------------------------------------
+# Table loading
+# ---------------------------------------------------------------------------
+
+def required_columns(rules):
+    """Union the columns each rule needs, per table. None means all columns."""
+    needed = {}
+    for rule in rules:
+        for table, cols in rule.get("columns", {rule["table"]: None}).items():
+            if cols is None or needed.get(table, ()) is None:
+                needed[table] = None
+            else:
+                needed.setdefault(table, set()).update(cols)
+    return needed
+
+
+def load_table(spec, columns=None):
+    """Read one table according to its spec, restricted to ``columns``.
+
+    A spec is either ``{"path": ..., "date_cols": [...]}`` for a single CSV or
+    ``{"reader": fn(columns) -> DataFrame}`` for tables assembled from several
+    raw files.
+    """
+    if "reader" in spec:
+        return spec["reader"](columns)
+
+    usecols = None
+    if columns is not None:
+        wanted = set(columns)
+        usecols = lambda c: c.strip().lower() in wanted  # noqa: E731
+    date_cols = [c for c in spec.get("date_cols", [])
+                 if columns is None or c in columns]
+    df = pd.read_csv(spec["path"], usecols=usecols, parse_dates=date_cols)
+    df.columns = df.columns.str.strip().str.lower()
+    return df
+
+
+class LoadError:
+    """Placeholder for a table that could not be read."""
+
+    def __init__(self, exc):
+        self.message = f"{type(exc).__name__}: {exc}"
+
+
+def load_tables(tables, needed, cache=None):
+    """Load every table in ``needed`` once. Returns (frames, load timings).
+
+    A table that fails to load is stored as a ``LoadError`` so that only the
+    rules depending on it fail; the rest of the run continues.
+    """
+    cache = {} if cache is None else cache
+    timings = {}
+    for name, cols in needed.items():
+        if name in cache:
+            continue
+        t0 = time.perf_counter()
+        try:
+            cache[name] = load_table(tables[name], cols)
+        except (OSError, ValueError, KeyError) as exc:
+            cache[name] = LoadError(exc)
+        timings[name] = time.perf_counter() - t0
+    return cache, timings
+
+
+# ---------------------------------------------------------------------------
+# Evaluation
+# ---------------------------------------------------------------------------
+
+def group_by_table(rules):
+    """Group rules by primary table, preserving declaration order."""
+    groups = {}
+    for rule in rules:
+        groups.setdefault(rule["table"], []).append(rule)
+    return groups
+
+
+def evaluate(rule, frames):
+    """Evaluate one rule and attach its identity and timing."""
+    t0 = time.perf_counter()
+    missing = [frames[t].message for t in rule.get("columns", {rule["table"]: None})
+               if isinstance(frames.get(t), LoadError)]
+    try:
+        if missing:
+            out = result(False, observed=missing[0])
+        else:
+            out = rule["check"](frames)
+    except Exception as exc:  # a broken rule is a failed check, not a crash
+        out = result(False, observed=f"{type(exc).__name__}: {exc}")
+    out = dict(out)
+    out.update({
+        "check": rule["name"],
+        "table": rule["table"],
+        "section": rule.get("section", ""),
+        "duration_s": time.perf_counter() - t0,
+    })
+    out["observed"] = plain(out.get("observed"))
+    out["expected"] = plain(out.get("expected"))
+    return out
+
+
+def run_table(table, rules, tables, cache=None):
+    """Read one table (and any tables its rules join to) and run its rules."""
+    frames, timings = load_tables(tables, required_columns(rules), cache)
+    results = [evaluate(rule, frames) for rule in rules]
+    for r in results:
+        r["load_s"] = timings.get(table, 0.0)
+    return results
+
+
+def run_rules(rules, tables):
+    """Run every rule, reading each table once across the whole run.
+
+    Columns are unioned across all rules up front so that the single read of
+    a table satisfies every rule that touches it, including rules whose
+    primary table is another one.
+    """
+    frames, timings = load_tables(tables, required_columns(rules))
+    results = []
+    for table, group in group_by_table(rules).items():
+        for rule in group:
+            r = evaluate(rule, frames)
+            r["load_s"] = timings.get(table, 0.0)
+            results.append(r)
+    return results, timings
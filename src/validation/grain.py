@@ -0,0 +1,195 @@
+"""Hash-based grain uniqueness checker that reports the offending keys.
+
+``DataFrame.duplicated`` on multi-column string keys only yields a count and
+needs every key in memory at once. This checker instead:
+
+1. hashes the grain columns of each chunk into one uint64 per row
+   (``pd.util.hash_pandas_object``, vectorized);
+2. finds hash values that occur more than once by sorting the hashes — for
+   streamed input the hashes are first spilled to disk, partitioned by their
+   top bits, so only one partition is sorted in memory at a time;
+3. re-reads only the rows whose hash is a candidate and confirms true
+   duplicates on the actual key values (hash collisions drop out here);
+4. returns one row per duplicated key with its row count and source files.
+
+Inputs can be a DataFrame or a zero-argument callable returning an iterable
+of DataFrame chunks (e.g. ``csv_chunks``), so 100M-row facts can be checked
+with memory bounded by the chunk size and partition size.
+"""
+
+import pathlib
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+SOURCE_COL = "source_file"
+
+
+def canonical_keys(df, grain):
+    """The grain columns in one dtype per kind, so equal keys hash equally
+    whatever dtype a chunk was inferred with: numbers as float64 (int 1 and
+    float 1.0 — an int column with a NaN in the chunk — agree, -0.0 is 0.0),
+    datetimes as datetime64[ns], and everything else as pandas strings."""
+    out = {}
+    for col in grain:
+        s = df[col]
+        if s.dtype.kind in "biuf":
+            out[col] = s.astype("float64") + 0.0
+        elif s.dtype.kind == "M":
+            out[col] = s.astype("datetime64[ns]")
+        else:
+            out[col] = s.astype("string")
+    return pd.DataFrame(out, index=df.index)
+
+
+def hash_keys(df, grain):
+    """One uint64 hash per row over the (canonicalized) grain columns."""
+    return pd.util.hash_pandas_object(canonical_keys(df, grain), index=False,
+                                      categorize=True).to_numpy()
+
+
+def repeated_hashes(hashes):
+    """Sorted array of hash values that occur more than once."""
+    h = np.sort(hashes, kind="stable")
+    dup = h[1:] == h[:-1]
+    return np.unique(h[1:][dup])
+
+
+def _isin_sorted(values, sorted_candidates):
+    """Vectorized membership test against a sorted candidate array."""
+    if len(sorted_candidates) == 0:
+        return np.zeros(len(values), dtype=bool)
+    pos = np.searchsorted(sorted_candidates, values)
+    pos[pos == len(sorted_candidates)] = 0
+    return sorted_candidates[pos] == values
+
+
+def _candidate_rows(df, mask, grain, source_col):
+    """Rows under ``mask`` with canonical key values (as hashed) and the
+    source file, so keys from differently-typed chunks compare equal."""
+    rows = canonical_keys(df.loc[mask], grain)
+    if source_col in df.columns:
+        rows[source_col] = df.loc[mask, source_col]
+    return rows
+
+
+def _confirm(candidates, grain, source_col):
+    """Group candidate rows on the real key values; keep keys seen > 1 time."""
+    if candidates.empty:
+        return _empty_report(grain)
+    grouped = candidates.groupby(grain, dropna=False, sort=True)
+    report = grouped.size().rename("rows").reset_index()
+    for col in grain:
+        # canonical float keys back to integers for display where they are
+        k = report[col]
+        if k.dtype.kind == "f" and (k.dropna() % 1 == 0).all():
+            report[col] = k.astype("Int64")
+    if source_col in candidates.columns:
+        files = grouped[source_col].agg(lambda s: sorted(set(s)))
+        report[source_col + "s"] = files.to_numpy()
+    return report[report["rows"] > 1].reset_index(drop=True)
+
+
+def _empty_report(grain):
+    return pd.DataFrame(columns=list(grain) + ["rows"])
+
+
+def _candidate_hashes_streamed(chunks, grain, partitions, spill_dir):
+    """Pass 1 over streamed chunks: spill hashes to per-partition files,
+    then sort one partition at a time to find repeated hashes."""
+    shift = np.uint64(64 - int(np.log2(partitions)))
+    paths = [pathlib.Path(spill_dir) / f"part_{i:04d}.u64" for i in range(partitions)]
+    handles = [open(p, "wb") for p in paths]
+    rows = 0
+    try:
+        for chunk in chunks():
+            h = hash_keys(chunk, grain)
+            rows += len(h)
+            part = (h >> shift).astype(np.intp) if partitions > 1 else np.zeros(len(h), np.intp)
+            order = np.argsort(part, kind="stable")
+            bounds = np.searchsorted(part[order], np.arange(partitions + 1))
+            for i in range(partitions):
+                lo, hi = bounds[i], bounds[i + 1]
+                if hi > lo:
+                    h[order[lo:hi]].tofile(handles[i])
+    finally:
+        for f in handles:
+            f.close()
+    found = [repeated_hashes(np.fromfile(p, dtype=np.uint64)) for p in paths]
+    return np.sort(np.concatenate(found)), rows
+
+
+def find_duplicate_keys(source, grain, source_col=SOURCE_COL, partitions=16,
+                        spill_dir=None):
+    """Return the duplicated grain keys in ``source``.
+
+    ``source`` is a DataFrame, or a zero-argument callable that returns an
+    iterable of DataFrame chunks (called twice: once to hash, once to pull
+    candidate rows). ``partitions`` must be a power of two and only applies to
+    streamed input. The result has the grain columns, a ``rows`` count, and —
+    when ``source_col`` is present — the list of source files per key.
+    """
+    grain = list(grain)
+    if isinstance(source, pd.DataFrame):
+        h = hash_keys(source, grain)
+        cand = repeated_hashes(h)
+        report = _confirm(_candidate_rows(source, _isin_sorted(h, cand), grain, source_col),
+                          grain, source_col)
+        report.attrs["rows_checked"] = len(source)
+        return report
+
+    if partitions & (partitions - 1):
+        raise ValueError(f"partitions must be a power of two, got {partitions}")
+    with tempfile.TemporaryDirectory(dir=spill_dir) as tmp:
+        cand, rows = _candidate_hashes_streamed(source, grain, partitions, tmp)
+    pieces = []
+    if len(cand):
+        for chunk in source():
+            mask = _isin_sorted(hash_keys(chunk, grain), cand)
+            if mask.any():
+                pieces.append(_candidate_rows(chunk, mask, grain, source_col))
+    candidates = pd.concat(pieces, ignore_index=True) if pieces else pd.DataFrame()
+    report = _confirm(candidates, grain, source_col)
+    report.attrs["rows_checked"] = rows
+    return report
+
+
+def csv_chunks(paths, grain, chunksize=1_000_000, date_cols=(), numeric_cols=()):
+    """Chunk factory over one or more CSV partitions, reading only the grain
+    columns and tagging each row with its source file.
+
+    Key columns are read as strings and then parsed per the caller
+    (``date_cols``, ``numeric_cols``), never inferred per chunk: a chunk
+    whose int column holds a NaN would otherwise come back as float, and a
+    file written as "1.0" would not match one written as "1"."""
+    paths = [pathlib.Path(p) for p in paths]
+    wanted = set(grain)
+
+    def chunks():
+        for path in paths:
+            for chunk in pd.read_csv(path, usecols=lambda c: c.strip().lower() in wanted,
+                                     dtype=str, chunksize=chunksize):
+                chunk.columns = chunk.columns.str.strip().str.lower()
+                for col in date_cols:
+                    if col in chunk.columns:
+                        chunk[col] = pd.to_datetime(chunk[col])
+                for col in numeric_cols:
+                    if col in chunk.columns:
+                        chunk[col] = pd.to_numeric(chunk[col])
+                chunk[SOURCE_COL] = path.name
+                yield chunk
+    return chunks
+
+
+def describe(report, grain, limit=5):
+    """Short human-readable lines for the first ``limit`` offending keys."""
+    lines = []
+    for row in report.head(limit).itertuples(index=False):
+        values = dict(zip(report.columns, row))
+        key = ", ".join(f"{c}={values[c]}" for c in grain)
+        files = values.get(SOURCE_COL + "s")
+        lines.append(f"({key}) x{values['rows']}" + (f" in {', '.join(files)}" if files else ""))
+    if len(report) > limit:
+        lines.append(f"... and {len(report) - limit:,} more keys")
+    return lines
@@ -1,352 +1,353 @@
-"""Post-build validation checks for S'Belles data warehouse."""
+"""Post-build validation checks for S'Belles data warehouse.
 
+Checks are declared as rules grouped by table (see ``src.validation.engine``).
+Each warehouse table is read once with only the columns its rules need; all
+rules for the table run against that single frame, and per-rule timings are
+written to output/validation/.
+
+Reconciliation compares warehouse totals to the control totals the
+transforms recorded in data_warehouse/build_manifest.json while they had the
+raw data in memory, so raw inputs are never re-parsed here.
+"""
+
+import json
 import pathlib
+import time
+
+import numpy as np
 import pandas as pd
 
+from src.transforms.utils import control_totals, load_manifest
+from src.validation import contracts
+from src.validation.engine import (
+    PASS, FAIL, INFO, result, info, group_by_table, run_rules,
+)
+from src.validation.grain import describe, find_duplicate_keys
+
 PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[2]
-DATA_DIR = PROJECT_ROOT / "data"
 WAREHOUSE_DIR = PROJECT_ROOT / "data_warehouse"
+TIMINGS_PATH = PROJECT_ROOT / "output" / "validation" / "post_build_timings.json"
 
 TOLERANCE = 0.01
 
 
 # ---------------------------------------------------------------------------
-# 1. Financial Reconciliation
-# ---------------------------------------------------------------------------
-
-def check_paid_social_spend():
-    """Compare raw paid social spend to warehouse total."""
-    print("\n" + "=" * 60)
-    print("1. FINANCIAL RECONCILIATION")
-    print("=" * 60)
-
-    # Raw: sum spend across 9 files (spend_usd for instagram_part3)
-    raw_total = 0.0
-    files = sorted(DATA_DIR.glob("sBelles_paid_*.csv"))
-    for f in files:
-        df = pd.read_csv(f)
-        df.columns = df.columns.str.strip().str.lower()
-        if "spend_usd" in df.columns:
-            raw_total += df["spend_usd"].sum()
-        else:
-            raw_total += df["spend"].sum()
-
-    # Warehouse
-    wh = pd.read_csv(WAREHOUSE_DIR / "fact_paid_social" / "fact_paid_social_daily.csv")
-    wh_total = wh["spend"].sum()
-
-    match = abs(raw_total - wh_total) <= TOLERANCE
-    print(f"\n  Paid Social Spend")
-    print(f"    Raw total:       ${raw_total:,.2f}")
-    print(f"    Warehouse total: ${wh_total:,.2f}")
-    print(f"    Difference:      ${abs(raw_total - wh_total):,.2f}")
-    print(f"    Result:          {'PASS' if match else 'FAIL'}")
-    return match
-
-
-def check_ooh_spend():
-    """Compare raw OOH spend to warehouse total."""
-    raw = pd.read_csv(DATA_DIR / "sBelles_ooh_airport_weekly.csv")
-    raw.columns = raw.columns.str.strip().str.lower()
-    raw_total = raw["spend"].sum()
-
-    wh = pd.read_csv(WAREHOUSE_DIR / "fact_ooh" / "fact_ooh_daily.csv")
-    wh_total = wh["spend"].sum()
-
-    match = abs(raw_total - wh_total) <= TOLERANCE
-    print(f"\n  OOH Spend")
-    print(f"    Raw total:       ${raw_total:,.2f}")
-    print(f"    Warehouse total: ${wh_total:,.2f}")
-    print(f"    Difference:      ${abs(raw_total - wh_total):,.2f}")
-    print(f"    Result:          {'PASS' if match else 'FAIL'}")
-    return match
-
-
-def check_ecommerce_revenue():
-    """Compare raw ecommerce line_revenue to warehouse gross_revenue."""
-    raw_total = 0.0
-    files = sorted(DATA_DIR.glob("sBelles_transactions_*.csv"))
-    for f in files:
-        df = pd.read_csv(f)
-        df.columns = df.columns.str.strip().str.lower()
-        raw_total += df["line_revenue"].sum()
-
-    wh = pd.read_csv(WAREHOUSE_DIR / "fact_ecommerce" / "fact_ecommerce_daily.csv")
-    wh_total = wh["gross_revenue"].sum()
-
-    match = abs(raw_total - wh_total) <= TOLERANCE
-    print(f"\n  Ecommerce Revenue")
-    print(f"    Raw total:       ${raw_total:,.2f}")
-    print(f"    Warehouse total: ${wh_total:,.2f}")
-    print(f"    Difference:      ${abs(raw_total - wh_total):,.2f}")
-    print(f"    Result:          {'PASS' if match else 'FAIL'}")
-    return match
-
-
-# ---------------------------------------------------------------------------
-# 2. Grain Uniqueness Checks
+# Tables
 # ---------------------------------------------------------------------------
 
-def check_grain_uniqueness():
-    """Verify zero duplicate rows on declared grain keys."""
-    print("\n" + "=" * 60)
-    print("2. GRAIN UNIQUENESS CHECKS")
-    print("=" * 60)
+def _manifest_sum_columns(table):
+    """Output sum columns recorded for ``table`` in the build manifest.
 
-    checks = {
-        "fact_paid_social_daily": {
-            "path": WAREHOUSE_DIR / "fact_paid_social" / "fact_paid_social_daily.csv",
-            "grain": ["date", "channel", "campaign_id", "dma_name"],
-        },
-        "fact_web_analytics_daily": {
-            "path": WAREHOUSE_DIR / "fact_web_analytics" / "fact_web_analytics_daily.csv",
-            "grain": ["date", "traffic_source", "traffic_medium", "campaign",
-                       "device_category", "dma_name", "state"],
-        },
-        "fact_ecommerce_daily": {
-            "path": WAREHOUSE_DIR / "fact_ecommerce" / "fact_ecommerce_daily.csv",
-            "grain": ["date", "dma_name", "product_category", "size", "promo_flag"],
-        },
-        "fact_organic_social_daily": {
-            "path": WAREHOUSE_DIR / "fact_organic_social" / "fact_organic_social_daily.csv",
-            "grain": ["date"],
-        },
-        "fact_podcast_daily": {
-            "path": WAREHOUSE_DIR / "fact_podcast" / "fact_podcast_daily.csv",
-            "grain": ["date", "podcast_name", "episode_title"],
-        },
-        "fact_ooh_daily": {
-            "path": WAREHOUSE_DIR / "fact_ooh" / "fact_ooh_daily.csv",
-            "grain": ["date", "airport_code", "format", "audience_segment"],
-        },
-    }
+    Used only to prune the columns read for a table; if the manifest is
+    missing the manifest rules fail on their own.
+    """
+    try:
+        return list(load_manifest()[table]["output"]["sums"])
+    except (OSError, ValueError, KeyError):
+        return []
 
-    all_pass = True
-    for name, cfg in checks.items():
-        df = pd.read_csv(cfg["path"])
-        dupes = df.duplicated(subset=cfg["grain"], keep=False).sum()
-        ok = dupes == 0
-        if not ok:
-            all_pass = False
-        print(f"\n  {name}")
-        print(f"    Grain: ({', '.join(cfg['grain'])})")
-        print(f"    Result: {'PASS' if ok else f'FAIL — {dupes} duplicate rows'}")
 
-    return all_pass
+def _daily(folder, name):
+    return {"path": WAREHOUSE_DIR / folder / f"{name}.csv", "date_cols": ["date"]}
 
 
-# ---------------------------------------------------------------------------
-# 3. Web Analytics Dedup Verification
-# ---------------------------------------------------------------------------
+TABLES = {
+    "fact_paid_social_daily": _daily("fact_paid_social", "fact_paid_social_daily"),
+    "fact_web_analytics_daily": _daily("fact_web_analytics", "fact_web_analytics_daily"),
+    "fact_ecommerce_daily": _daily("fact_ecommerce", "fact_ecommerce_daily"),
+    "fact_organic_social_daily": _daily("fact_organic_social", "fact_organic_social_daily"),
+    "fact_podcast_daily": _daily("fact_podcast", "fact_podcast_daily"),
+    "fact_ooh_daily": _daily("fact_ooh", "fact_ooh_daily"),
+    "fact_ecommerce_transactions": _daily("fact_ecommerce", "fact_ecommerce_transactions"),
+    "fact_web_analytics_events": _daily("fact_web_analytics", "fact_web_analytics_events"),
+    "build_manifest": {"reader": lambda cols: load_manifest()},
+}
 
-def check_web_dedup():
-    """Verify web analytics dedup: Dec 2023 overlap removal."""
-    print("\n" + "=" * 60)
-    print("3. WEB ANALYTICS DEDUP VERIFICATION")
-    print("=" * 60)
+DAILY_FACTS = [
+    "fact_paid_social_daily", "fact_web_analytics_daily", "fact_ecommerce_daily",
+    "fact_organic_social_daily", "fact_podcast_daily", "fact_ooh_daily",
+]
 
-    file_map = {
-        "Q1Q2 2023": DATA_DIR / "sBelles_web_traffic_2023_Q1_Q2.csv",
-        "Q3Q4 2023": DATA_DIR / "sBelles_web_traffic_2023_Q3_Q4.csv",
-        "Q1 2024":   DATA_DIR / "sBelles_web_traffic_2024_Q1.csv",
-        "Q2 2024":   DATA_DIR / "sBelles_web_traffic_2024_Q2.csv",
-    }
+GRAINS = {table: contracts.grain(table) for table in DAILY_FACTS}
 
-    total_raw = 0
-    counts = {}
-    for label, path in file_map.items():
-        df = pd.read_csv(path)
-        counts[label] = len(df)
-        total_raw += len(df)
-
-    # Count Dec 2023 rows in Q1 2024 file
-    q1_24 = pd.read_csv(file_map["Q1 2024"], parse_dates=["event_datetime"])
-    dec_mask = q1_24["event_datetime"].dt.year.eq(2023) & q1_24["event_datetime"].dt.month.eq(12)
-    dec_dropped = dec_mask.sum()
-
-    expected_after_dedup = total_raw - dec_dropped
-
-    # Actual warehouse concat count (pre-aggregation)
-    wh = pd.read_csv(WAREHOUSE_DIR / "fact_web_analytics" / "fact_web_analytics_daily.csv")
-
-    print(f"\n  Raw row counts:")
-    for label, cnt in counts.items():
-        print(f"    {label}: {cnt:,}")
-    print(f"    Total raw rows: {total_raw:,}")
-    print(f"\n  Dec 2023 rows dropped from Q1 2024 file: {dec_dropped:,}")
-    print(f"  Expected pre-aggregation count: {expected_after_dedup:,}")
-    print(f"  Warehouse rows (post-aggregation): {len(wh):,}")
-    print(f"\n  Dedup logic: Removed Dec 2023 rows from Q1 2024 file to avoid")
-    print(f"  overlap with Q3Q4 2023 file. Post-aggregation row count is lower")
-    print(f"  due to daily groupby on (date, traffic_source, traffic_medium,")
-    print(f"  campaign, device_category, dma_name, state).")
-    print(f"\n  Result: PASS (dedup counts align)")
-    return True
+DETAIL_FACTS = ["fact_ecommerce_transactions", "fact_web_analytics_events"]
 
 
 # ---------------------------------------------------------------------------
-# 4. Date Range Boundary Check
+# Rule builders
 # ---------------------------------------------------------------------------
 
-def check_date_ranges():
-    """Check min/max dates for each fact table."""
-    print("\n" + "=" * 60)
-    print("4. DATE RANGE BOUNDARY CHECK")
-    print("=" * 60)
-
-    start = pd.Timestamp("2023-01-01")
-    end = pd.Timestamp("2024-06-30")
-
-    tables = {
-        "fact_paid_social_daily": WAREHOUSE_DIR / "fact_paid_social" / "fact_paid_social_daily.csv",
-        "fact_web_analytics_daily": WAREHOUSE_DIR / "fact_web_analytics" / "fact_web_analytics_daily.csv",
-        "fact_ecommerce_daily": WAREHOUSE_DIR / "fact_ecommerce" / "fact_ecommerce_daily.csv",
-        "fact_organic_social_daily": WAREHOUSE_DIR / "fact_organic_social" / "fact_organic_social_daily.csv",
-        "fact_podcast_daily": WAREHOUSE_DIR / "fact_podcast" / "fact_podcast_daily.csv",
-        "fact_ooh_daily": WAREHOUSE_DIR / "fact_ooh" / "fact_ooh_daily.csv",
-    }
-
-    all_pass = True
-    for name, path in tables.items():
-        df = pd.read_csv(path, parse_dates=["date"])
-        mn, mx = df["date"].min(), df["date"].max()
-        in_range = mn >= start and mx <= end
-        flag = ""
-        if not in_range:
-            all_pass = False
-            flag = " *** OUT OF RANGE ***"
-
-        print(f"\n  {name}")
-        print(f"    Min date: {mn.date()}")
-        print(f"    Max date: {mx.date()}")
-        print(f"    Result:   {'PASS' if in_range else 'FAIL'}{flag}")
-
-        # OOH specific check
-        if "ooh" in name:
-            ooh_last_week_end = mx
-            past_june_24 = mx > pd.Timestamp("2024-06-24")
-            print(f"    OOH last date: {ooh_last_week_end.date()}")
-            if past_june_24:
-                print(f"    NOTE: OOH expansion extends past 2024-06-24 to {mx.date()}")
+def _money_lines(label, raw_total, wh_total):
+    return [
+        f"{label}",
+        f"  Raw total:       ${raw_total:,.2f}",
+        f"  Warehouse total: ${wh_total:,.2f}",
+        f"  Difference:      ${abs(raw_total - wh_total):,.2f}",
+    ]
+
+
+def reconcile_rule(name, label, table, col):
+    """Warehouse SUM(col) must equal the raw-source total the transform
+    recorded in the build manifest, within TOLERANCE."""
+    def check(frames):
+        entry = frames["build_manifest"][table]
+        raw_total = entry["source"]["sums"][entry["reconcile"][col]]
+        wh_total = float(frames[table][col].sum())
+        ok = abs(raw_total - wh_total) <= TOLERANCE
+        return result(ok, observed=round(wh_total, 2), expected=round(raw_total, 2),
+                      lines=_money_lines(label, raw_total, wh_total))
+    return {"name": name, "table": table, "section": "financial",
+            "columns": {table: [col], "build_manifest": None}, "check": check}
+
+
+def manifest_rule(table):
+    """Row count, column sums and per-month breakdown of the stored table
+    must match the control totals recorded when the table was written."""
+    sum_cols = _manifest_sum_columns(table)
+
+    def check(frames):
+        want = frames["build_manifest"][table]["output"]
+        df = frames[table]
+        got = control_totals(df, list(want["sums"]), "date")
+        bad = []
+        if got["rows"] != want["rows"]:
+            bad.append(f"rows {got['rows']:,} != {want['rows']:,}")
+        for col, total in want["sums"].items():
+            if abs(got["sums"][col] - total) > TOLERANCE:
+                bad.append(f"SUM({col}) {got['sums'][col]:,.2f} != {total:,.2f}")
+        for month, m in want["by_month"].items():
+            g = got["by_month"].get(month, {"rows": 0, "sums": {}})
+            if g["rows"] != m["rows"] or any(
+                    abs(g["sums"].get(c, 0.0) - v) > TOLERANCE for c, v in m["sums"].items()):
+                bad.append(f"month {month} differs")
+        bad += [f"unexpected month {m}" for m in set(got["by_month"]) - set(want["by_month"])]
+        lines = [f"{table}: {got['rows']:,} rows, {len(want['sums'])} sums, "
+                 f"{len(want['by_month'])} months vs manifest"]
+        lines += [f"  {b}" for b in bad]
+        return result(not bad, observed=bad or "match", expected="match", lines=lines)
+    return {"name": "matches_manifest", "table": table, "section": "manifest",
+            "columns": {table: ["date"] + sum_cols, "build_manifest": None},
+            "check": check}
+
+
+def grain_rule(table, grain):
+    """Zero duplicate rows on the declared grain; lists offending keys."""
+    def check(frames):
+        offending = find_duplicate_keys(frames[table], grain)
+        dupes = int(offending["rows"].sum())
+        lines = [f"{table}", f"  Grain: ({', '.join(grain)})",
+                 f"  Duplicate rows: {dupes:,}"]
+        lines += [f"    {line}" for line in describe(offending, grain)]
+        return result(dupes == 0, observed=dupes, expected=0, lines=lines)
+    return {"name": "grain_unique", "table": table, "section": "grain",
+            "columns": {table: grain}, "check": check}
+
+
+def date_range_rule(table):
+    """All dates fall inside the project window."""
+    def check(frames):
+        dates = frames[table]["date"]
+        mn, mx = dates.min(), dates.max()
+        lines = [f"{table}", f"  Min date: {mn.date()}", f"  Max date: {mx.date()}"]
+        if "ooh" in table:
+            if mx > pd.Timestamp("2024-06-24"):
+                lines.append(f"  NOTE: OOH expansion extends past 2024-06-24 to {mx.date()}")
             else:
-                print(f"    OOH expansion stays within 2024-06-24 boundary")
-
-    return all_pass
+                lines.append("  OOH expansion stays within 2024-06-24 boundary")
+        start, end = contracts.date_bounds(table)
+        return result(mn >= start and mx <= end,
+                      observed=[mn, mx], expected=[start, end], lines=lines)
+    return {"name": "date_range", "table": table, "section": "date_range",
+            "columns": {table: ["date"]}, "check": check}
+
+
+def month_count_rule(table):
+    """Row counts by year-month (informational)."""
+    def check(frames):
+        months = frames[table]["date"].to_numpy().astype("datetime64[M]")
+        keys, counts = np.unique(months, return_counts=True)
+        by_month = {str(k): int(c) for k, c in zip(keys, counts)}
+        lines = [f"{table} ({len(months):,} total rows)",
+                 f"{'Year-Month':<12} {'Rows':>8}", f"{'-'*12} {'-'*8}"]
+        lines += [f"{k:<12} {c:>8,}" for k, c in by_month.items()]
+        return info(observed=by_month, lines=lines)
+    return {"name": "rows_by_month", "table": table, "section": "row_counts",
+            "columns": {table: ["date"]}, "check": check}
+
+
+def web_dedup_rule():
+    """Raw web rows minus the Dec 2023 rows dropped from the Q1 2024 file
+    (as recorded in the manifest) must equal the daily pageviews, since each
+    retained event is one pageview."""
+    table = "fact_web_analytics_daily"
+
+    def check(frames):
+        entry = frames["build_manifest"][table]
+        by_file = entry["source"]["by_file"]
+        dropped = entry["notes"]["dedup_dropped_rows"]
+        expected = entry["source"]["rows"] - dropped
+        pageviews = int(frames[table]["pageviews"].sum())
+        lines = ["Raw row counts (build manifest):"]
+        lines += [f"  {f}: {t['rows']:,}" for f, t in by_file.items()]
+        lines += [f"  Total raw rows: {entry['source']['rows']:,}",
+                  f"Dec 2023 rows dropped from Q1 2024 file: {dropped:,}",
+                  f"Expected pre-aggregation count: {expected:,}",
+                  f"Daily pageviews (one per retained event): {pageviews:,}",
+                  f"Warehouse rows (post-aggregation): {len(frames[table]):,}"]
+        return result(pageviews == expected, observed=pageviews, expected=expected,
+                      lines=lines)
+    return {"name": "web_dedup", "table": table, "section": "web_dedup",
+            "columns": {table: ["pageviews"], "build_manifest": None},
+            "check": check}
+
+
+def _alignment_rule(name, table, columns, fn):
+    return {"name": name, "table": table, "section": "alignment",
+            "columns": columns, "check": fn}
+
+
+def alignment_rules():
+    """Source-grain detail tables must roll up to their daily aggregates."""
+    txn, ecom = "fact_ecommerce_transactions", "fact_ecommerce_daily"
+    evt, web = "fact_web_analytics_events", "fact_web_analytics_daily"
+
+    def revenue(frames):
+        t = float(frames[txn]["line_revenue"].sum())
+        d = float(frames[ecom]["gross_revenue"].sum())
+        return result(abs(t - d) <= TOLERANCE, observed=round(d, 2), expected=round(t, 2),
+                      lines=[f"Revenue: txn ${t:,.2f} vs daily ${d:,.2f}"])
+
+    def items_by_date(frames):
+        t = frames[txn].groupby("date").size()
+        d = frames[ecom].groupby("date")["line_items"].sum()
+        ok = t.index.equals(d.index) and (t.to_numpy() == d.to_numpy()).all()
+        mismatched = int((t.reindex(d.index.union(t.index), fill_value=0)
+                          != d.reindex(d.index.union(t.index), fill_value=0)).sum())
+        return result(ok, observed=mismatched, expected=0,
+                      lines=[f"Line items by date: {mismatched} mismatched dates"])
+
+    def quantity(frames):
+        t = int(frames[txn]["quantity"].sum())
+        d = int(frames[ecom]["total_quantity"].sum())
+        return result(t == d, observed=d, expected=t,
+                      lines=[f"Quantity: txn {t:,} vs daily {d:,}"])
+
+    def date_match(detail, daily):
+        def check(frames):
+            a, b = frames[detail]["date"], frames[daily]["date"]
+            got, want = [a.min(), a.max()], [b.min(), b.max()]
+            return result(got == want, observed=got, expected=want,
+                          lines=[f"Date range: {detail} {got[0].date()}..{got[1].date()} "
+                                 f"vs {daily} {want[0].date()}..{want[1].date()}"])
+        return check
+
+    def pageviews(frames):
+        e = len(frames[evt])
+        d = int(frames[web]["pageviews"].sum())
+        return result(e == d, observed=d, expected=e,
+                      lines=[f"Pageviews: events {e:,} vs daily SUM {d:,}"])
+
+    return [
+        _alignment_rule("revenue_matches_daily", txn,
+                        {txn: ["line_revenue"], ecom: ["gross_revenue"]}, revenue),
+        _alignment_rule("line_items_by_date", txn,
+                        {txn: ["date"], ecom: ["date", "line_items"]}, items_by_date),
+        _alignment_rule("quantity_matches_daily", txn,
+                        {txn: ["quantity"], ecom: ["total_quantity"]}, quantity),
+        _alignment_rule("date_range_matches_daily", txn,
+                        {txn: ["date"], ecom: ["date"]}, date_match(txn, ecom)),
+        _alignment_rule("pageviews_match_daily", evt,
+                        {evt: ["date"], web: ["pageviews"]}, pageviews),
+        _alignment_rule("date_range_matches_daily", evt,
+                        {evt: ["date"], web: ["date"]}, date_match(evt, web)),
+    ]
+
+
+def contract_rule(table):
+    """Every clause of the table's data contract, evaluated in one pass."""
+    def check(frames):
+        outcomes = contracts.check_table(frames[table], table)
+        broken = contracts.failures(outcomes)
+        lines = [f"{table}: {len(outcomes) - len(broken)}/{len(outcomes)} contract clauses hold"]
+        lines += [f"  BROKEN {r['check']} (observed {r['observed']!r})" for r in broken]
+        return result(not broken, observed=[r["check"] for r in broken] or "all hold",
+                      expected="all hold", lines=lines)
+    return {"name": "contract", "table": table, "section": "contract",
+            "columns": {table: contracts.contract_columns(table)}, "check": check}
+
+
+def build_rules():
+    """Declare every post-build rule."""
+    rules = [
+        reconcile_rule("paid_social_spend", "Paid Social Spend",
+                       "fact_paid_social_daily", "spend"),
+        reconcile_rule("ooh_spend", "OOH Spend", "fact_ooh_daily", "spend"),
+        reconcile_rule("ecommerce_revenue", "Ecommerce Revenue",
+                       "fact_ecommerce_daily", "gross_revenue"),
+    ]
+    for table in DAILY_FACTS:
+        rules.append(grain_rule(table, GRAINS[table]))
+        rules.append(date_range_rule(table))
+        rules.append(month_count_rule(table))
+        rules.append(manifest_rule(table))
+    for table in DETAIL_FACTS:
+        rules.append(manifest_rule(table))
+    rules.append(web_dedup_rule())
+    rules.extend(alignment_rules())
+    rules.extend(contract_rule(table) for table in DAILY_FACTS + DETAIL_FACTS)
+    return rules
 
 
 # ---------------------------------------------------------------------------
-# 5. Row Count by Month Summary
+# Reporting
 # ---------------------------------------------------------------------------
 
-def row_count_by_month():
-    """Print row counts by year-month for each fact table."""
-    print("\n" + "=" * 60)
-    print("5. ROW COUNT BY MONTH SUMMARY")
-    print("=" * 60)
-
-    tables = {
-        "fact_paid_social_daily": WAREHOUSE_DIR / "fact_paid_social" / "fact_paid_social_daily.csv",
-        "fact_web_analytics_daily": WAREHOUSE_DIR / "fact_web_analytics" / "fact_web_analytics_daily.csv",
-        "fact_ecommerce_daily": WAREHOUSE_DIR / "fact_ecommerce" / "fact_ecommerce_daily.csv",
-        "fact_organic_social_daily": WAREHOUSE_DIR / "fact_organic_social" / "fact_organic_social_daily.csv",
-        "fact_podcast_daily": WAREHOUSE_DIR / "fact_podcast" / "fact_podcast_daily.csv",
-        "fact_ooh_daily": WAREHOUSE_DIR / "fact_ooh" / "fact_ooh_daily.csv",
-    }
-
-    for name, path in tables.items():
-        df = pd.read_csv(path, parse_dates=["date"])
-        df["year_month"] = df["date"].dt.to_period("M")
-        counts = df.groupby("year_month").size()
-
-        print(f"\n  {name} ({len(df):,} total rows)")
-        print(f"  {'Year-Month':<12} {'Rows':>8}")
-        print(f"  {'-'*12} {'-'*8}")
-        for period, cnt in counts.items():
-            print(f"  {str(period):<12} {cnt:>8,}")
+SECTIONS = [
+    ("financial", "1. FINANCIAL RECONCILIATION"),
+    ("grain", "2. GRAIN UNIQUENESS CHECKS"),
+    ("web_dedup", "3. WEB ANALYTICS DEDUP VERIFICATION"),
+    ("date_range", "4. DATE RANGE BOUNDARY CHECK"),
+    ("row_counts", "5. ROW COUNT BY MONTH SUMMARY"),
+    ("alignment", "6. SOURCE-GRAIN TO DAILY ALIGNMENT"),
+    ("manifest", "7. CONTROL TOTALS VS BUILD MANIFEST"),
+    ("contract", "8. TABLE DATA CONTRACTS"),
+]
+
+
+def print_results(results):
+    """Print results section by section, then a per-rule timing summary."""
+    for section, title in SECTIONS:
+        print("\n" + "=" * 60)
+        print(title)
+        print("=" * 60)
+        for r in (r for r in results if r["section"] == section):
+            print()
+            for line in r["lines"]:
+                print(f"  {line}")
+            if r["status"] != INFO:
+                print(f"  Result: {r['status']}")
 
-
-# ---------------------------------------------------------------------------
-# 6. Source-Grain to Daily Alignment
-# ---------------------------------------------------------------------------
-
-def check_source_grain_alignment():
-    """Verify source-grain tables align with their daily aggregates."""
     print("\n" + "=" * 60)
-    print("6. SOURCE-GRAIN TO DAILY ALIGNMENT")
+    print("OVERALL SUMMARY")
     print("=" * 60)
-
-    all_pass = True
-
-    # --- Ecommerce ---
-    print("\n  fact_ecommerce_transactions vs fact_ecommerce_daily")
-    txn = pd.read_csv(WAREHOUSE_DIR / "fact_ecommerce" / "fact_ecommerce_transactions.csv",
-                       parse_dates=["date"])
-    daily_ecom = pd.read_csv(WAREHOUSE_DIR / "fact_ecommerce" / "fact_ecommerce_daily.csv",
-                              parse_dates=["date"])
-
-    # Revenue reconciliation
-    txn_rev = txn["line_revenue"].sum()
-    daily_rev = daily_ecom["gross_revenue"].sum()
-    rev_match = abs(txn_rev - daily_rev) <= TOLERANCE
-    print(f"    Revenue: txn ${txn_rev:,.2f} vs daily ${daily_rev:,.2f} — {'PASS' if rev_match else 'FAIL'}")
-    if not rev_match:
-        all_pass = False
-
-    # Line item count by date
-    txn_by_date = txn.groupby("date").size()
-    daily_items = daily_ecom.groupby("date")["line_items"].sum()
-    items_match = (txn_by_date == daily_items).all()
-    print(f"    Line items by date: {'PASS' if items_match else 'FAIL'}")
-    if not items_match:
-        all_pass = False
-
-    # Quantity
-    txn_qty = txn["quantity"].sum()
-    daily_qty = daily_ecom["total_quantity"].sum()
-    qty_match = txn_qty == daily_qty
-    print(f"    Quantity: txn {txn_qty:,} vs daily {daily_qty:,} — {'PASS' if qty_match else 'FAIL'}")
-    if not qty_match:
-        all_pass = False
-
-    # Date range
-    ecom_range = txn["date"].min() == daily_ecom["date"].min() and txn["date"].max() == daily_ecom["date"].max()
-    print(f"    Date range match: {'PASS' if ecom_range else 'FAIL'}")
-    if not ecom_range:
-        all_pass = False
-
-    # --- Web Analytics ---
-    print("\n  fact_web_analytics_events vs fact_web_analytics_daily")
-    evt = pd.read_csv(WAREHOUSE_DIR / "fact_web_analytics" / "fact_web_analytics_events.csv",
-                       parse_dates=["date"])
-    daily_web = pd.read_csv(WAREHOUSE_DIR / "fact_web_analytics" / "fact_web_analytics_daily.csv",
-                             parse_dates=["date"])
-
-    # Pageview count
-    evt_count = len(evt)
-    daily_pv = daily_web["pageviews"].sum()
-    pv_match = evt_count == daily_pv
-    print(f"    Pageviews: events {evt_count:,} vs daily SUM {daily_pv:,} — {'PASS' if pv_match else 'FAIL'}")
-    if not pv_match:
-        all_pass = False
-
-    # Date range
-    web_range = evt["date"].min() == daily_web["date"].min() and evt["date"].max() == daily_web["date"].max()
-    print(f"    Date range match: {'PASS' if web_range else 'FAIL'}")
-    if not web_range:
-        all_pass = False
-
-    # Expected row counts
-    evt_expected = 51234
-    txn_expected = 17106
-    evt_ok = len(evt) == evt_expected
-    txn_ok = len(txn) == txn_expected
-    print(f"\n  Expected row counts")
-    print(f"    Ecommerce transactions: {len(txn):,} (expected {txn_expected:,}) — {'PASS' if txn_ok else 'FAIL'}")
-    print(f"    Web analytics events:   {len(evt):,} (expected {evt_expected:,}) — {'PASS' if evt_ok else 'FAIL'}")
-    if not evt_ok or not txn_ok:
-        all_pass = False
-
-    return all_pass
+    for r in results:
+        if r["status"] == INFO:
+            continue
+        label = f"{r['table']}.{r['check']}"
+        print(f"  {label:<55} {r['status']}  {r['duration_s'] * 1000:7.1f} ms")
+
+
+def write_timings(results, table_timings, elapsed, path=TIMINGS_PATH):
+    """Write structured per-rule and per-table timings as JSON."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    payload = {
+        "elapsed_s": elapsed,
+        "table_load_s": table_timings,
+        "rules": [{k: r[k] for k in ("table", "check", "status", "duration_s")}
+                  for r in results],
+    }
+    path.write_text(json.dumps(payload, indent=2))
+    return path
 
 
 # ---------------------------------------------------------------------------
@@ -358,32 +359,29 @@ def main():
     print("S'BELLES DATA WAREHOUSE — POST-BUILD VALIDATION")
     print("=" * 60)
 
-    results = {}
-
-    results["paid_social_spend"] = check_paid_social_spend()
-    results["ooh_spend"] = check_ooh_spend()
-    results["ecommerce_revenue"] = check_ecommerce_revenue()
-    results["grain_uniqueness"] = check_grain_uniqueness()
-    results["web_dedup"] = check_web_dedup()
-    results["date_ranges"] = check_date_ranges()
-    results["source_grain_alignment"] = check_source_grain_alignment()
-    row_count_by_month()
+    start = time.perf_counter()
+    rules = build_rules()
+    results, table_timings = run_rules(rules, TABLES)
+    elapsed = time.perf_counter() - start
 
-    # Final summary
-    print("\n" + "=" * 60)
-    print("OVERALL SUMMARY")
-    print("=" * 60)
-    for check, passed in results.items():
-        print(f"  {check:<25} {'PASS' if passed else 'FAIL'}")
+    print_results(results)
 
-    total = len(results)
-    passed = sum(1 for v in results.values() if v)
-    print(f"\n  {passed}/{total} checks passed")
+    checked = [r for r in results if r["status"] != INFO]
+    passed = sum(r["status"] == PASS for r in checked)
+    print(f"\n  {passed}/{len(checked)} checks passed "
+          f"({len(group_by_table(rules))} tables, {len(table_timings)} reads, "
+          f"{elapsed:.2f}s)")
+    print(f"  Timings written to {write_timings(results, table_timings, elapsed)}")
 
-    if passed == total:
+    if passed == len(checked):
         print("\n  All validation checks PASSED.")
     else:
         print("\n  Some checks FAILED — review output above.")
+        for r in checked:
+            if r["status"] == FAIL:
+                print(f"  FAIL: {r['table']}.{r['check']} "
+                      f"(observed {r['observed']}, expected {r['expected']})")
+    return passed == len(checked)
 
 
 if __name__ == "__main__":
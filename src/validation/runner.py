@@ -0,0 +1,157 @@
+"""Parallel validation runner with machine-readable results.
+
+Collects the rule suites declared by ``src.run_all`` (warehouse outputs),
+``src.validation.post_build_checks`` and ``src.validation.submission_check``,
+splits them into one job per (suite, table), and runs the jobs concurrently
+in a process pool. Each job reads its table once and evaluates every rule
+for it, so wall time tracks the slowest table rather than the sum.
+
+Results are written as JSON and JUnit XML (check, table, status, observed,
+expected, duration). The process exits non-zero if any check fails.
+
+Usage:
+    python -m src.validation.runner
+    python -m src.validation.runner --suites post_build --workers 4
+"""
+
+import argparse
+import importlib
+import json
+import os
+import pathlib
+import sys
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+from src.validation.engine import FAIL, INFO, group_by_table, run_table
+
+PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[2]
+REPORT_DIR = PROJECT_ROOT / "output" / "validation"
+
+# Suite name -> module exposing TABLES and build_rules()
+SUITES = {
+    "warehouse": "src.run_all",
+    "post_build": "src.validation.post_build_checks",
+    "submission": "src.validation.submission_check",
+}
+
+REPORT_FIELDS = ["suite", "table", "check", "status", "observed", "expected",
+                 "duration_s", "load_s"]
+
+
+def _suite(name):
+    return importlib.import_module(SUITES[name])
+
+
+def plan_jobs(suites):
+    """One job per (suite, primary table), in declaration order."""
+    jobs = []
+    for suite in suites:
+        for table in group_by_table(_suite(suite).build_rules()):
+            jobs.append((suite, table))
+    return jobs
+
+
+def run_job(suite, table):
+    """Worker entry point: rebuild the suite's rules and run one table group.
+
+    Rules hold closures, which do not pickle, so workers receive only names
+    and rebuild the (cheap) rule declarations locally.
+    """
+    module = _suite(suite)
+    rules = group_by_table(module.build_rules())[table]
+    t0 = time.perf_counter()
+    results = run_table(table, rules, module.TABLES)
+    wall = time.perf_counter() - t0
+    for r in results:
+        r["suite"] = suite
+        r.pop("lines", None)
+    return suite, table, wall, results
+
+
+def run_all_jobs(jobs, workers=None):
+    """Run jobs in a process pool; fall back to in-process for one worker."""
+    workers = workers or min(len(jobs), os.cpu_count() or 1)
+    if workers <= 1:
+        return [run_job(*job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_job, *job) for job in jobs]
+        return [f.result() for f in futures]
+
+
+# ---------------------------------------------------------------------------
+# Reports
+# ---------------------------------------------------------------------------
+
+def write_json(results, elapsed, path):
+    checked = [r for r in results if r["status"] != INFO]
+    payload = {
+        "elapsed_s": elapsed,
+        "total": len(checked),
+        "passed": sum(r["status"] != FAIL for r in checked),
+        "failed": sum(r["status"] == FAIL for r in checked),
+        "results": [{k: r.get(k) for k in REPORT_FIELDS} for r in results],
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(payload, indent=2, default=str))
+    return path
+
+
+def write_junit(results, elapsed, path):
+    """One <testsuite> per suite, one <testcase> per rule (classname = table)."""
+    root = ET.Element("testsuites", name="sbelles-validation", time=f"{elapsed:.3f}")
+    for suite in dict.fromkeys(r["suite"] for r in results):
+        cases = [r for r in results if r["suite"] == suite]
+        node = ET.SubElement(
+            root, "testsuite", name=suite, tests=str(len(cases)),
+            failures=str(sum(r["status"] == FAIL for r in cases)),
+            skipped=str(sum(r["status"] == INFO for r in cases)),
+            time=f"{sum(r['duration_s'] for r in cases):.3f}",
+        )
+        for r in cases:
+            case = ET.SubElement(node, "testcase", classname=f"{suite}.{r['table']}",
+                                 name=r["check"], time=f"{r['duration_s']:.4f}")
+            message = f"observed={r['observed']!r} expected={r['expected']!r}"
+            if r["status"] == FAIL:
+                ET.SubElement(case, "failure", message=message)
+            elif r["status"] == INFO:
+                ET.SubElement(case, "skipped", message="informational")
+            ET.SubElement(case, "system-out").text = message
+    path.parent.mkdir(parents=True, exist_ok=True)
+    ET.ElementTree(root).write(path, encoding="utf-8", xml_declaration=True)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--suites", nargs="+", choices=list(SUITES), default=list(SUITES))
+    parser.add_argument("--workers", type=int, default=None,
+                        help="process pool size (default: one per table, capped at CPUs)")
+    parser.add_argument("--json", type=pathlib.Path, default=REPORT_DIR / "validation_report.json")
+    parser.add_argument("--junit", type=pathlib.Path, default=REPORT_DIR / "validation_report.xml")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    jobs = plan_jobs(args.suites)
+    outcomes = run_all_jobs(jobs, args.workers)
+    elapsed = time.perf_counter() - start
+
+    results = [r for _, _, _, group in outcomes for r in group]
+    failed = [r for r in results if r["status"] == FAIL]
+    slowest = max(outcomes, key=lambda o: o[2])
+
+    print(f"Validation: {len(results) - len(failed)}/{len(results)} checks OK across "
+          f"{len(jobs)} table jobs in {elapsed:.2f}s "
+          f"(slowest: {slowest[0]}/{slowest[1]} {slowest[2]:.2f}s)")
+    for r in failed:
+        print(f"  FAIL {r['suite']}/{r['table']}/{r['check']}: "
+              f"observed={r['observed']!r} expected={r['expected']!r}")
+    print(f"  JSON:  {write_json(results, elapsed, args.json)}")
+    print(f"  JUnit: {write_junit(results, elapsed, args.junit)}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
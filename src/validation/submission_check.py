@@ -1,135 +1,298 @@
-"""Final submission validation for SBelles_Assessment_Final/ directory."""
+"""Final submission validation for SBelles_Assessment_Final/ directory.
 
+Full mode parses every CSV. ``--fast`` first checks each CSV against the
+fingerprint (SHA-256, size) the transforms recorded in the build manifest;
+files that match are checked from the manifest's row counts, column sums and
+date bounds without being parsed, and only mismatched files are parsed.
+Hashing runs in a thread pool, and a local stat cache (size + mtime) lets an
+unchanged file skip hashing altogether.
+
+Usage:
+    python -m src.validation.submission_check
+    python -m src.validation.submission_check --fast
+"""
+
+import argparse
+import json
+import os
 import pathlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import pandas as pd
 
+from src.transforms.utils import load_manifest, sha256_file
+from src.validation.contracts import CONTRACTS, date_bounds, row_bounds, rows_clause
+from src.validation.engine import PASS, FAIL, result, run_rules
+
 PROJECT_ROOT = pathlib.Path(__file__).resolve().parents[2]
 SUBMISSION_DIR = PROJECT_ROOT / "SBelles_Assessment_Final"
 
-# Expected row counts for every CSV
-EXPECTED_ROWS = {
-    "paid_social/fact_paid_social_daily.csv": 24_615,
-    "web_analytics/fact_web_analytics_daily.csv": 46_818,
-    "web_analytics/fact_web_analytics_events.csv": 51_234,
-    "ecommerce/fact_ecommerce_daily.csv": 14_800,
-    "ecommerce/fact_ecommerce_transactions.csv": 17_106,
-    "organic_social/fact_organic_social_daily.csv": 441,
-    "podcast/fact_podcast_daily.csv": 85,
-    "ooh/fact_ooh_daily.csv": 10_920,
-    "dimensions/dim_date.csv": 547,
-    "dimensions/dim_geography.csv": 30,
-    "dimensions/dim_channel.csv": 7,
-    "dimensions/dim_campaign_initiative.csv": 6,
-    "dimensions/dim_podcast.csv": 5,
-}
+# Submission CSVs in report order; row counts and date bounds come from the
+# table contracts.
+SUBMITTED_TABLES = [
+    "fact_paid_social_daily", "fact_web_analytics_daily", "fact_web_analytics_events",
+    "fact_ecommerce_daily", "fact_ecommerce_transactions", "fact_organic_social_daily",
+    "fact_podcast_daily", "fact_ooh_daily", "dim_date", "dim_geography", "dim_channel",
+    "dim_campaign_initiative", "dim_podcast",
+]
+SUBMISSION_TABLE = {CONTRACTS[t]["submission"]: t for t in SUBMITTED_TABLES}
+EXPECTED_ROWS = {rel: row_bounds(t) for rel, t in SUBMISSION_TABLE.items()}
 
-# Financial reconciliation targets
+# Financial reconciliation: submission file -> (warehouse table, money column).
+# Expected totals are the raw-source control totals recorded in the build
+# manifest by each transform, not hand-maintained values.
 FINANCIAL_CHECKS = {
-    "paid_social/fact_paid_social_daily.csv": ("spend", 5_986_609.08),
-    "ooh/fact_ooh_daily.csv": ("spend", 29_519_757.25),
-    "ecommerce/fact_ecommerce_daily.csv": ("gross_revenue", 498_071.00),
+    "paid_social/fact_paid_social_daily.csv": ("fact_paid_social_daily", "spend"),
+    "ooh/fact_ooh_daily.csv": ("fact_ooh_daily", "spend"),
+    "ecommerce/fact_ecommerce_daily.csv": ("fact_ecommerce_daily", "gross_revenue"),
 }
 
 TOLERANCE = 0.01
 
-DATE_START = pd.Timestamp("2023-01-01")
-DATE_END = pd.Timestamp("2024-06-30")
 
+DOC_FILES = {
+    "documentation/schema_dictionary.md": True,   # must be non-empty
+    "documentation/transformation_notes.md": True,
+    "documentation/assumptions.md": True,
+    "documentation/final_data_model_diagram.png": False,  # just exists
+    "README.md": True,
+}
+
+DATED = {rel for rel, t in SUBMISSION_TABLE.items() if CONTRACTS[t].get("date_col")}
+
+TABLES = {
+    rel: {"path": SUBMISSION_DIR / rel, "date_cols": ["date"] if rel in DATED else []}
+    for rel in EXPECTED_ROWS
+}
+TABLES["build_manifest"] = {"reader": lambda cols: load_manifest()}
+
+# Local cache of path -> {size, mtime_ns, ctime_ns, ino, sha256}; never committed
+FINGERPRINT_CACHE = PROJECT_ROOT / "output" / "validation" / "fingerprint_cache.json"
+
+
+# ---------------------------------------------------------------------------
+# Fast mode: verify files against the build manifest
+# ---------------------------------------------------------------------------
+
+def _load_cache(path=FINGERPRINT_CACHE):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+
+
+def _stat_key(st):
+    """(size, mtime, ctime, inode) of an ``os.stat_result`` or a cache entry."""
+    if isinstance(st, dict):
+        return st["size"], st["mtime_ns"], st.get("ctime_ns"), st.get("ino")
+    return st.st_size, st.st_mtime_ns, st.st_ctime_ns, st.st_ino
+
+
+def verify_files(manifest, workers=None, rehash=False, cache_path=FINGERPRINT_CACHE):
+    """Match every submission CSV against its manifest fingerprint.
+
+    Returns ``{rel_path: how}`` for files whose content is verified, where
+    ``how`` is ``"cached"`` (file unchanged since a previous hash that
+    matched the manifest) or ``"hashed"``. Files missing from the result
+    must be fully parsed.
+
+    A cache entry only stands while size, mtime, ctime and inode are all
+    unchanged: ``shutil.copy2`` (rebuild_all) preserves mtime, but any write
+    updates ctime and a replaced file gets a new inode. A file whose cached
+    digest no longer matches the manifest is hashed again.
+    """
+    cache = {} if rehash else _load_cache(cache_path)
+    verified, to_hash = {}, []
+    for rel, table in SUBMISSION_TABLE.items():
+        want = manifest.get(table, {}).get("output", {}).get("file")
+        path = SUBMISSION_DIR / rel
+        if want is None or not path.exists():
+            continue
+        st = path.stat()
+        if st.st_size != want["size"]:
+            continue  # cannot match; no need to hash
+        hit = cache.get(str(path))
+        if hit and _stat_key(hit) == _stat_key(st) and hit["sha256"] == want["sha256"]:
+            verified[rel] = "cached"
+            continue
+        to_hash.append((rel, path, st, want["sha256"]))
+
+    if to_hash:
+        with ThreadPoolExecutor(max_workers=workers or min(len(to_hash), os.cpu_count() or 1)) as pool:
+            digests = list(pool.map(lambda job: sha256_file(job[1]), to_hash))
+        for (rel, path, st, want), digest in zip(to_hash, digests):
+            cache[str(path)] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                                "ctime_ns": st.st_ctime_ns, "ino": st.st_ino, "sha256": digest}
+            if digest == want:
+                verified[rel] = "hashed"
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        cache_path.write_text(json.dumps(cache, indent=2, sort_keys=True))
+    return verified
+
+
+def _manifest_output(frames, rel_path):
+    return frames["build_manifest"][SUBMISSION_TABLE[rel_path]]["output"]
+
+
+def expected_total(manifest, table, col):
+    """Raw-source total the transform recorded for ``table``.``col``."""
+    entry = manifest[table]
+    return entry["source"]["sums"][entry["reconcile"][col]]
 
-def run_checks():
-    """Run all submission checks. Returns (passed, total) counts."""
-    results = []  # list of (description, pass/fail bool)
 
+def build_rules(verified=()):
+    """Declare every submission check as a rule keyed by submission file.
+
+    For files in ``verified`` (see ``verify_files``) row counts, date bounds
+    and money sums are taken from the build manifest instead of the CSV, so
+    those files are never read.
+    """
+    rules = []
+    for rel_path, expected_rows in EXPECTED_ROWS.items():
+        full_path = SUBMISSION_DIR / rel_path
+        fast = rel_path in verified
+        reads = {"build_manifest": None} if fast else {rel_path: None}
+
+        def exists(frames, full_path=full_path):
+            ok = full_path.exists() and full_path.stat().st_size > 0
+            return result(ok, observed=ok, expected=True)
+
+        def row_count(frames, rel_path=rel_path, expected_rows=expected_rows, fast=fast):
+            if fast:
+                out = _manifest_output(frames, rel_path)
+                rows, cols = out["rows"], out["file"]["columns"]
+            else:
+                rows, cols = frames[rel_path].shape
+            lo, hi = expected_rows
+            ok = rows >= lo and (hi is None or rows <= hi)
+            expected = rows_clause(lo, hi)
+            return result(ok, observed=rows, expected=lo if lo == hi else expected,
+                          lines=[f"{rel_path}: {rows:,} rows x {cols} cols  "
+                                 + ("PASS" if ok else f"FAIL (expected {expected})")])
+
+        rules += [
+            {"name": "exists & non-empty", "table": rel_path, "section": "csv",
+             "columns": {}, "check": exists},
+            {"name": f"row count ({rows_clause(*expected_rows)})", "table": rel_path,
+             "section": "csv",
+             "columns": reads, "check": row_count},
+        ]
+
+        if rel_path in DATED:
+            def date_range(frames, rel_path=rel_path, fast=fast):
+                if fast:
+                    out = _manifest_output(frames, rel_path)
+                    mn, mx = pd.Timestamp(out["date_min"]), pd.Timestamp(out["date_max"])
+                else:
+                    dates = frames[rel_path]["date"]
+                    mn, mx = dates.min(), dates.max()
+                start, end = date_bounds(SUBMISSION_TABLE[rel_path])
+                ok = mn >= start and mx <= end
+                lines = [] if ok else [f"       date range FAIL: {mn.date()} to {mx.date()}"]
+                return result(ok, observed=[mn, mx], expected=[start, end],
+                              lines=lines)
+            rules.append({"name": "date range", "table": rel_path, "section": "csv",
+                          "columns": reads, "check": date_range})
+
+    for rel_path, check_content in DOC_FILES.items():
+        full_path = SUBMISSION_DIR / rel_path
+
+        def doc(frames, full_path=full_path, check_content=check_content):
+            ok = full_path.exists() and (not check_content or full_path.stat().st_size > 0)
+            return result(ok, observed=ok, expected=True)
+
+        rules.append({"name": "exists & non-empty" if check_content else "exists",
+                      "table": rel_path, "section": "docs", "columns": {}, "check": doc})
+
+    for rel_path, (table, col) in FINANCIAL_CHECKS.items():
+        fast = rel_path in verified
+
+        def financial(frames, rel_path=rel_path, table=table, col=col, fast=fast):
+            expected = round(expected_total(frames["build_manifest"], table, col), 2)
+            if fast:
+                actual = float(_manifest_output(frames, rel_path)["sums"][col])
+            else:
+                actual = float(frames[rel_path][col].sum())
+            ok = abs(actual - expected) <= TOLERANCE
+            return result(ok, observed=round(actual, 2), expected=expected, lines=[
+                f"{'PASS' if ok else 'FAIL'}  {col} in {rel_path}",
+                f"       expected ${expected:,.2f}  actual ${actual:,.2f}  "
+                f"diff ${abs(actual - expected):,.2f}",
+            ])
+        rules.append({"name": f"{col} reconciliation", "table": rel_path,
+                      "section": "financial",
+                      "columns": {"build_manifest": None} if fast
+                      else {rel_path: [col], "build_manifest": None},
+                      "check": financial})
+    return rules
+
+
+def run_checks(fast=False, workers=None, rehash=False):
+    """Run all submission checks. Returns (passed, total) counts."""
     print("=" * 60)
     print("SUBMISSION VALIDATION — SBelles_Assessment_Final/")
     print("=" * 60)
 
+    start = time.perf_counter()
+    verified = {}
+    if fast:
+        try:
+            verified = verify_files(load_manifest(), workers=workers, rehash=rehash)
+        except (OSError, ValueError):
+            verified = {}  # no usable manifest: every file is parsed
+        counts = {how: sum(v == how for v in verified.values()) for how in ("cached", "hashed")}
+        print(f"\n  Fast mode: {len(verified)}/{len(EXPECTED_ROWS)} CSVs verified against the "
+              f"build manifest ({counts['cached']} by stat cache, {counts['hashed']} by hash); "
+              f"{len(EXPECTED_ROWS) - len(verified)} parsed in full")
+
+    results, _ = run_rules(build_rules(verified), TABLES)
+    by_section = lambda section: [r for r in results if r["section"] == section]  # noqa: E731
+
     # ------------------------------------------------------------------
     # 1. CSV file checks: existence, non-empty, row count, date range
     # ------------------------------------------------------------------
     print("\n--- CSV File Checks ---\n")
 
-    for rel_path, expected_rows in EXPECTED_ROWS.items():
-        full_path = SUBMISSION_DIR / rel_path
-        label = rel_path
-
-        # Exists and not empty
-        exists = full_path.exists() and full_path.stat().st_size > 0
-        results.append((f"{label} exists & non-empty", exists))
-        if not exists:
-            print(f"  FAIL  {label} — file missing or empty")
-            continue
-
-        df = pd.read_csv(full_path)
-        rows, cols = df.shape
-        print(f"  {label}: {rows:,} rows x {cols} cols", end="")
-
-        # Row count
-        row_ok = rows == expected_rows
-        results.append((f"{label} row count ({expected_rows:,})", row_ok))
-        if not row_ok:
-            print(f"  FAIL (expected {expected_rows:,})")
-        else:
-            print(f"  PASS")
-
-        # Date range (if 'date' column present)
-        if "date" in df.columns:
-            dates = pd.to_datetime(df["date"])
-            mn, mx = dates.min(), dates.max()
-            in_range = mn >= DATE_START and mx <= DATE_END
-            results.append((f"{label} date range", in_range))
-            if not in_range:
-                print(f"         date range FAIL: {mn.date()} to {mx.date()}")
+    checks = []
+    missing = set()
+    for r in by_section("csv"):
+        if r["table"] in missing:
+            continue  # follow-on checks are skipped for a missing file
+        checks.append(r)
+        if r["check"] == "exists & non-empty" and r["status"] == FAIL:
+            missing.add(r["table"])
+            print(f"  FAIL  {r['table']} — file missing or empty")
+        for line in r["lines"]:
+            print(f"  {line}")
 
     # ------------------------------------------------------------------
     # 2. Documentation file checks
     # ------------------------------------------------------------------
     print("\n--- Documentation Checks ---\n")
 
-    doc_files = {
-        "documentation/schema_dictionary.md": True,   # must be non-empty
-        "documentation/transformation_notes.md": True,
-        "documentation/assumptions.md": True,
-        "documentation/final_data_model_diagram.png": False,  # just exists
-        "README.md": True,
-    }
-
-    for rel_path, check_content in doc_files.items():
-        full_path = SUBMISSION_DIR / rel_path
-        exists = full_path.exists()
-        if check_content:
-            ok = exists and full_path.stat().st_size > 0
-            desc = f"{rel_path} exists & non-empty"
-        else:
-            ok = exists
-            desc = f"{rel_path} exists"
-        results.append((desc, ok))
-        print(f"  {'PASS' if ok else 'FAIL'}  {desc}")
+    for r in by_section("docs"):
+        checks.append(r)
+        print(f"  {r['status']}  {r['table']} {r['check']}")
 
     # ------------------------------------------------------------------
     # 3. Financial reconciliation
     # ------------------------------------------------------------------
     print("\n--- Financial Reconciliation ---\n")
 
-    for rel_path, (col, expected) in FINANCIAL_CHECKS.items():
-        full_path = SUBMISSION_DIR / rel_path
-        if not full_path.exists():
-            results.append((f"{rel_path} {col} reconciliation", False))
-            print(f"  FAIL  {rel_path} — file missing")
+    for r in by_section("financial"):
+        checks.append(r)
+        if r["table"] in missing:
+            print(f"  FAIL  {r['table']} — file missing")
             continue
-
-        df = pd.read_csv(full_path)
-        actual = df[col].sum()
-        match = abs(actual - expected) <= TOLERANCE
-        results.append((f"{rel_path} {col} = ${expected:,.2f}", match))
-        print(f"  {'PASS' if match else 'FAIL'}  {col} in {rel_path}")
-        print(f"         expected ${expected:,.2f}  actual ${actual:,.2f}  diff ${abs(actual - expected):,.2f}")
+        for line in r["lines"]:
+            print(f"  {line}")
 
     # ------------------------------------------------------------------
     # Summary
     # ------------------------------------------------------------------
-    passed = sum(1 for _, ok in results if ok)
-    total = len(results)
+    passed = sum(1 for r in checks if r["status"] == PASS)
+    total = len(checks)
     failed = total - passed
 
     print("\n" + "=" * 60)
@@ -138,17 +301,25 @@ def run_checks():
 
     if failed:
         print("\nFailed checks:")
-        for desc, ok in results:
-            if not ok:
-                print(f"  FAIL: {desc}")
+        for r in checks:
+            if r["status"] != PASS:
+                print(f"  FAIL: {r['table']} {r['check']}")
     else:
         print("\nAll checks PASSED.")
+    print(f"Elapsed: {time.perf_counter() - start:.2f}s")
 
     return passed, total
 
 
-def main():
-    run_checks()
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validate SBelles_Assessment_Final/.")
+    parser.add_argument("--fast", action="store_true",
+                        help="verify files against the build manifest; parse only mismatches")
+    parser.add_argument("--workers", type=int, default=None, help="hashing threads")
+    parser.add_argument("--rehash", action="store_true",
+                        help="ignore the stat cache and hash every file")
+    args = parser.parse_args(argv)
+    run_checks(fast=args.fast, workers=args.workers, rehash=args.rehash)
 
 
 if __name__ == "__main__":